@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Compare the query plans and timings of the hot video queries with and without
+the indexes from migration 0013, on a seeded test database::
+
+    python benchmarks/query_plans.py --videos 200000
+
+This uses the test settings, with SQLite in memory, unless
+``DJANGO_SETTINGS_MODULE`` is set. Point it at settings for PostgreSQL to see
+that planner, which is given ``EXPLAIN ANALYZE``. A test database is created
+and destroyed, as when running the tests.
+"""
+import argparse
+import datetime
+import importlib
+import os
+import random
+import sys
+import time
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.app.settings')
+
+EXPLAIN = {
+    'postgresql': 'EXPLAIN ANALYZE ',
+    'sqlite': 'EXPLAIN QUERY PLAN ',
+    'mysql': 'EXPLAIN ',
+}
+
+
+def seed(count, collection_count, tag_count, batch_size=5000):
+    from django.contrib.contenttypes.models import ContentType
+    from django.utils import timezone
+    from taggit.models import Tag, TaggedItem
+    from wagtail.core.models import Collection
+
+    from wagtailvideos.models import (
+        MediaFormats, Video, VideoQuality, VideoTranscode)
+
+    rng = random.Random(0)
+    root = Collection.get_first_root_node()
+    collections = [root.add_child(name='Collection {0}'.format(i)) for i in range(collection_count)]
+    Tag.objects.bulk_create([
+        Tag(name='tag-{0}'.format(i), slug='tag-{0}'.format(i)) for i in range(tag_count)])
+    tag_ids = list(Tag.objects.values_list('pk', flat=True))
+    content_type = ContentType.objects.get_for_model(Video)
+
+    # Spread the videos over a year, rather than all being created now
+    created_at = Video._meta.get_field('created_at')
+    created_at.auto_now_add = False
+    now = timezone.now()
+    try:
+        for start in range(0, count, batch_size):
+            Video.objects.bulk_create([
+                Video(
+                    title='Video {0}'.format(i),
+                    file='original_videos/video-{0}.mp4'.format(i),
+                    collection=rng.choice(collections),
+                    created_at=now - datetime.timedelta(seconds=rng.randint(0, 365 * 24 * 3600)))
+                for i in range(start, min(start + batch_size, count))])
+    finally:
+        created_at.auto_now_add = True
+
+    video_ids = list(Video.objects.values_list('pk', flat=True))
+    for start in range(0, len(video_ids), batch_size):
+        transcodes = []
+        tagged_items = []
+        for video_id in video_ids[start:start + batch_size]:
+            for media_format in [MediaFormats.mp4, MediaFormats.webm]:
+                outcome = rng.random()
+                transcodes.append(VideoTranscode(
+                    video_id=video_id, media_format=media_format,
+                    quality=VideoQuality.default,
+                    file='video_transcodes/video-{0}.{1}'.format(video_id, media_format.name),
+                    processing=outcome < 0.05,
+                    error_message='Failed' if 0.05 <= outcome < 0.1 else ''))
+            for tag_id in rng.sample(tag_ids, rng.randint(0, 3)):
+                tagged_items.append(TaggedItem(
+                    tag_id=tag_id, content_type=content_type, object_id=video_id))
+        VideoTranscode.objects.bulk_create(transcodes)
+        TaggedItem.objects.bulk_create(tagged_items)
+    return collections
+
+
+def get_queries(collection):
+    from django.db.models import Q
+
+    from wagtailvideos.models import Video, VideoTranscode
+
+    newest = Video.objects.filter(collection=collection).order_by('-created_at', '-id')
+    cursor = newest[1000]
+    after_cursor = Q(created_at__lt=cursor.created_at)
+    after_cursor |= Q(created_at=cursor.created_at, id__lt=cursor.id)
+    page = list(Video.objects.values_list('pk', flat=True)[:20])
+    return [
+        ("Collection, newest first", newest[:20]),
+        ("Collection, 50 pages in", newest.filter(after_cursor)[:20]),
+        ("Tagged, newest first",
+         Video.objects.filter(tags__name='tag-1').order_by('-created_at', '-id')[:20]),
+        ("Ready transcodes for a page of videos",
+         VideoTranscode.objects.filter(video__in=page, processing=False, error_message='')),
+    ]
+
+
+def explain(connection, queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(EXPLAIN[connection.vendor] + sql, params)
+        rows = cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        return [row[-1] for row in rows]
+    if connection.vendor == 'postgresql':
+        return [row[0] for row in rows]
+    return [' '.join(str(column) for column in row) for row in rows]
+
+
+def best_time(queryset, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(queryset.all())
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def set_indexes(connection, enabled):
+    """
+    Add or remove the indexes of migration 0013. Migrating back to before it
+    would remove the columns added since, which the queries need.
+    """
+    from django.apps import apps
+
+    from wagtailvideos.models import Video
+
+    migration = importlib.import_module('wagtailvideos.migrations.0013_indexes')
+    index = next(index for index in Video._meta.indexes if index.name == 'wagtailvideos_coll_created')
+    with connection.schema_editor() as schema_editor:
+        if enabled:
+            schema_editor.add_index(Video, index)
+            migration.add_ready_transcodes_index(apps, schema_editor)
+        else:
+            schema_editor.remove_index(Video, index)
+            migration.remove_ready_transcodes_index(apps, schema_editor)
+
+
+def run(options):
+    from django.db import connection
+
+    print("Seeding {0} videos on {1}".format(options.videos, connection.vendor))
+    collections = seed(options.videos, options.collections, options.tags)
+    collection = collections[0]
+
+    for label, enabled in [("Without indexes", False), ("With indexes", True)]:
+        set_indexes(connection, enabled)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        print()
+        print(label)
+        print('=' * len(label))
+        for name, queryset in get_queries(collection):
+            print()
+            print("{0}: {1:.2f}ms".format(name, best_time(queryset, options.repeat) * 1000))
+            for line in explain(connection, queryset):
+                print('    ' + line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--videos', type=int, default=100000, help="Number of videos to create")
+    parser.add_argument('--collections', type=int, default=20, help="Number of collections")
+    parser.add_argument('--tags', type=int, default=50, help="Number of tags")
+    parser.add_argument('--repeat', type=int, default=5, help="Times to run each query")
+    options = parser.parse_args()
+
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        run(options)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+# Generated by Django 2.0.13 on 2026-10-19 05:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import wagtail.core.blocks
+import wagtail.core.fields
+import wagtailvideos.blocks
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailvideos', '0014_video_references'),
+        ('app', '0002_testpagerelatedvideo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestSnippet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255)),
+                ('video', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='wagtailvideos.Video')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='testpage',
+            name='body',
+            field=wagtail.core.fields.StreamField([('video', wagtailvideos.blocks.VideoChooserBlock()), ('playlist', wagtail.core.blocks.ListBlock(wagtailvideos.blocks.VideoChooserBlock())), ('feature', wagtail.core.blocks.StructBlock([('heading', wagtail.core.blocks.CharBlock()), ('video', wagtailvideos.blocks.VideoChooserBlock())]))], blank=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.0.13 on 2026-10-19 06:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_testpage_body_testsnippet'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestSubPage',
+            fields=[
+                ('testpage_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='app.TestPage')),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'abstract': False,
+            },
+            bases=('app.testpage',),
+        ),
+    ]
@@ -1,14 +1,54 @@
 from __future__ import unicode_literals
 
 from django.db import models
-from wagtail.core.models import Page
+from django.utils.encoding import python_2_unicode_compatible
+from modelcluster.fields import ParentalKey
+from wagtail.admin.edit_handlers import InlinePanel, StreamFieldPanel
+from wagtail.core import blocks
+from wagtail.core.fields import StreamField
+from wagtail.core.models import Orderable, Page
+from wagtail.snippets.models import register_snippet
 
+from wagtailvideos.blocks import VideoChooserBlock
 from wagtailvideos.edit_handlers import VideoChooserPanel
 
 
 class TestPage(Page):
     video_field = models.ForeignKey('wagtailvideos.Video', related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+    body = StreamField([
+        ('video', VideoChooserBlock()),
+        ('playlist', blocks.ListBlock(VideoChooserBlock())),
+        ('feature', blocks.StructBlock([
+            ('heading', blocks.CharBlock()),
+            ('video', VideoChooserBlock()),
+        ])),
+    ], blank=True)
 
     content_panels = Page.content_panels + [
-        VideoChooserPanel('video_field')
+        VideoChooserPanel('video_field'),
+        StreamFieldPanel('body'),
+        InlinePanel('related_videos'),
     ]
+
+
+class TestSubPage(TestPage):
+    subtitle = models.CharField(max_length=255, blank=True)
+
+
+class TestPageRelatedVideo(Orderable):
+    page = ParentalKey(TestPage, related_name='related_videos', on_delete=models.CASCADE)
+    video = models.ForeignKey('wagtailvideos.Video', related_name='+', on_delete=models.CASCADE)
+
+    panels = [
+        VideoChooserPanel('video'),
+    ]
+
+
+@register_snippet
+@python_2_unicode_compatible
+class TestSnippet(models.Model):
+    title = models.CharField(max_length=255)
+    video = models.ForeignKey('wagtailvideos.Video', related_name='+', null=True, blank=True, on_delete=models.SET_NULL)
+
+    def __str__(self):
+        return self.title
@@ -79,3 +79,6 @@ STATIC_URL = '/static/'
 
 MEDIA_ROOT = os.path.join(os.path.dirname(__file__), 'media')
 MEDIA_URL = '/media/'
+
+# Tests delete files by calling wagtailvideos.deletion themselves
+WAGTAILVIDEOS_DELETE_FILES_IN_BACKGROUND = False
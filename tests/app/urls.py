@@ -8,8 +8,11 @@ from django.views.static import serve
 from wagtail.admin import urls as wagtailadmin_urls
 from wagtail.core import urls as wagtail_urls
 
+from wagtailvideos import serve_urls as wagtailvideos_serve_urls
+
 urlpatterns = [
     url(r'^admin/', include(wagtailadmin_urls)),
+    url(r'^videos/', include(wagtailvideos_serve_urls)),
     url(r'', include(wagtail_urls)),
     #  For media serving
     url(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve, kwargs={'document_root': settings.MEDIA_ROOT})
@@ -1,19 +1,27 @@
 from __future__ import unicode_literals
 
+import datetime
 import json
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.files import locks
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import HttpRequest
 from django.template.defaultfilters import filesizeformat
 from django.test import TestCase, override_settings
 from django.urls import reverse
-from mock import patch
+from mock import Mock, patch
+from taggit.models import Tag
 from wagtail.core.models import Collection, GroupCollectionPermission
+from wagtail.search.backends import get_search_backend
 from wagtail.tests.utils import WagtailTestUtils
 
 from tests.utils import create_test_video_file
+from wagtailvideos.cache import get_popular_tags
 from wagtailvideos.models import Video
+from wagtailvideos.uploads import ChunkedUpload
 
 
 class TestVideoIndexView(WagtailTestUtils, TestCase):
@@ -47,6 +55,54 @@ class TestVideoIndexView(WagtailTestUtils, TestCase):
             self.assertEqual(response.status_code, 200)
 
 
+class TestAdminListingSidebar(WagtailTestUtils, TestCase):
+    def setUp(self):
+        self.login()
+        cache.clear()
+        self.video = Video.objects.create(title="Test video", file=create_test_video_file())
+        self.video.tags.add('cats', 'dogs')
+
+    def tag_names(self, response):
+        return sorted(tag.name for tag in response.context['popular_tags'])
+
+    def test_popular_tags_cached(self):
+        response = self.client.get(reverse('wagtailvideos:chooser'))
+        self.assertEqual(self.tag_names(response), ['cats', 'dogs'])
+
+        # Popular tags are not counted again
+        with self.assertNumQueries(0):
+            get_popular_tags(Video)
+        response = self.client.get(reverse('wagtailvideos:index'))
+        self.assertEqual(self.tag_names(response), ['cats', 'dogs'])
+
+    def test_popular_tags_cleared_when_tags_change(self):
+        get_popular_tags(Video)
+
+        self.video.tags.add('fish')
+        self.assertEqual(sorted(tag.name for tag in get_popular_tags(Video)), ['cats', 'dogs', 'fish'])
+
+        self.video.tags.remove('cats')
+        self.assertEqual(sorted(tag.name for tag in get_popular_tags(Video)), ['dogs', 'fish'])
+
+        Tag.objects.filter(name='dogs').get().delete()
+        self.assertEqual(sorted(tag.name for tag in get_popular_tags(Video)), ['fish'])
+
+        self.video.delete()
+        self.assertEqual(get_popular_tags(Video), [])
+
+    def test_collections(self):
+        response = self.client.get(reverse('wagtailvideos:index'))
+        self.assertIsNone(response.context['collections'])
+
+        Collection.get_first_root_node().add_child(name="Archive")
+        response = self.client.get(reverse('wagtailvideos:index'))
+        self.assertEqual(len(response.context['collections']), 2)
+        self.assertContains(response, 'Archive')
+
+        response = self.client.get(reverse('wagtailvideos:chooser'))
+        self.assertEqual(len(response.context['collections']), 2)
+
+
 class TestVideoAddView(TestCase, WagtailTestUtils):
     def setUp(self):
         self.login()
@@ -223,6 +279,39 @@ class TestVideoEditView(TestCase, WagtailTestUtils):
         # Ensure the form supports file uploads
         self.assertContains(response, 'enctype="multipart/form-data"')
 
+    def test_file_info_cached(self):
+        self.assertIsNotNone(self.video.file_checked_at)
+        with patch.object(self.video.file.storage, 'exists') as exists:
+            response = self.get()
+        self.assertFalse(exists.called)
+        self.assertContains(response, filesizeformat(self.video.file_size))
+
+    def test_refresh_file_info(self):
+        self.video.file.storage.delete(self.video.file.name)
+        response = self.get()
+        self.assertNotContains(response, "The source video file could not be found")
+
+        response = self.client.post(reverse('wagtailvideos:refresh_file_info', args=(self.video.id,)))
+        self.assertRedirects(response, reverse('wagtailvideos:edit', args=(self.video.id,)))
+        video = Video.objects.get(pk=self.video.pk)
+        self.assertTrue(video.file_missing)
+        self.assertIsNone(video.file_size)
+
+        response = self.get()
+        self.assertContains(response, "The source video file could not be found")
+        self.assertContains(response, "File not found")
+
+    def test_file_info_checked_once(self):
+        Video.objects.filter(pk=self.video.pk).update(file_checked_at=None, file_size=None)
+        self.get()
+        video = Video.objects.get(pk=self.video.pk)
+        self.assertIsNotNone(video.file_checked_at)
+        self.assertEqual(video.file_size, self.video.file_size)
+
+    def test_refresh_file_info_post_only(self):
+        response = self.client.get(reverse('wagtailvideos:refresh_file_info', args=(self.video.id,)))
+        self.assertEqual(response.status_code, 405)
+
     @override_settings(WAGTAIL_USAGE_COUNT_ENABLED=True)
     def test_with_usage_count(self):
         response = self.get()
@@ -265,6 +354,8 @@ class TestVideoEditView(TestCase, WagtailTestUtils):
 
     def test_with_missing_video_file(self):
         self.video.file.delete(False)
+        # Storage is only asked about the file when told to
+        self.video.refresh_file_info()
 
         response = self.get()
         self.assertEqual(response.status_code, 200)
@@ -348,6 +439,109 @@ class TestVideoChooserView(TestCase, WagtailTestUtils):
         self.assertNotContains(response, "Test video 3 is even better")
 
 
+class TestVideoChooserApiView(TestCase, WagtailTestUtils):
+    def setUp(self):
+        self.login()
+        for i in range(15):
+            Video.objects.create(title="Video {0}".format(i), file=create_test_video_file())
+        self.rabbit = Video.objects.create(
+            title="Rabbit ears", file=create_test_video_file(),
+            duration=datetime.timedelta(seconds=90))
+
+    def get(self, params={}, **extra):
+        return self.client.get(reverse('wagtailvideos:chooser_api'), params, **extra)
+
+    def test_browse(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = json.loads(response.content.decode('utf-8'))
+
+        self.assertEqual(len(data['items']), 12)
+        self.assertEqual(data['items'][0], {
+            'id': self.rabbit.pk,
+            'title': "Rabbit ears",
+            'thumbnail': None,
+            'duration': 90.0,
+        })
+        self.assertIsNone(data['previous'])
+
+        response = self.client.get(data['next'])
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(len(data['items']), 4)
+        self.assertIsNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+
+    def test_search(self):
+        response = self.get({'q': 'rabb'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([item['title'] for item in data['items']], ["Rabbit ears"])
+
+        response = self.get({'q': 'video'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(len(data['items']), 12)
+        self.assertIn('p=2', data['next'])
+
+        response = self.client.get(data['next'])
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(len(data['items']), 3)
+        self.assertIn('p=1', data['previous'])
+
+    def test_filter_by_tag(self):
+        self.rabbit.tags.add('ears')
+        response = self.get({'tag': 'ears'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([item['id'] for item in data['items']], [self.rabbit.pk])
+
+    def test_search_without_autocomplete(self):
+        backend = get_search_backend()
+        with patch('wagtailvideos.views.chooser.get_search_backend', return_value=Mock(
+                spec=['search'], search=backend.search)):
+            response = self.get({'q': 'rabb'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([item['title'] for item in data['items']], ["Rabbit ears"])
+
+    def test_autocomplete_error(self):
+        backend = Mock(spec=['autocomplete', 'search'])
+        backend.autocomplete.side_effect = AttributeError("Broken")
+        with patch('wagtailvideos.views.chooser.get_search_backend', return_value=backend), \
+                self.assertRaises(AttributeError):
+            self.get({'q': 'rabb'})
+        self.assertFalse(backend.search.called)
+
+    def test_search_with_tag(self):
+        self.rabbit.tags.add('ears')
+        Video.objects.get(title="Video 1").tags.add('ears')
+        response = self.get({'q': 'rabb', 'tag': 'ears'})
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual([item['id'] for item in data['items']], [self.rabbit.pk])
+
+        response = self.get({'q': 'rabb', 'tag': 'other'})
+        data = json.loads(response.content.decode('utf-8'))
+        self.assertEqual(data['items'], [])
+
+    def test_etag(self):
+        response = self.get()
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.rabbit.title = "Rabbit"
+        self.rabbit.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_not_allowed(self):
+        response = self.client.post(reverse('wagtailvideos:chooser_api'))
+        self.assertEqual(response.status_code, 405)
+
+
 class TestVideoChooserChosenView(TestCase, WagtailTestUtils):
     def setUp(self):
         self.login()
@@ -420,7 +614,7 @@ class TestVideoChooserUploadView(TestCase, WagtailTestUtils):
         self.assertTemplateUsed(response, 'wagtailvideos/chooser/chooser.html')
 
         # The re-rendered video chooser listing should be paginated
-        self.assertContains(response, "Page 1 of ")
+        self.assertContains(response, 'data-after=')
         self.assertEqual(12, len(response.context['videos']))
 
 
@@ -679,3 +873,226 @@ class TestMultipleVideoUploader(TestCase, WagtailTestUtils):
 
         # Check response
         self.assertEqual(response.status_code, 400)
+
+
+class TestChunkedMultipleVideoUploader(TestCase, WagtailTestUtils):
+    """
+    This tests uploading videos in chunks through the multiple upload view
+    """
+    def setUp(self):
+        self.user = self.login()
+        self.content = create_test_video_file().read()[:100]
+
+    def tearDown(self):
+        ChunkedUpload(self.user, 'upload').delete()
+
+    def post_chunk(self, start, end, name='small.mp4', content_type='video/mp4', upload_id='upload'):
+        return self.client.post(reverse('wagtailvideos:add_multiple'), {
+            'files[]': SimpleUploadedFile(name, self.content[start:end + 1], content_type),
+            'upload_id': upload_id,
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+            HTTP_CONTENT_RANGE='bytes {0}-{1}/{2}'.format(start, end, len(self.content)))
+
+    def get_offset(self, upload_id='upload'):
+        response = self.client.get(reverse('wagtailvideos:add_multiple_offset'), {'upload_id': upload_id})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content.decode())['offset']
+
+    def test_add_shows_chunk_size(self):
+        with override_settings(WAGTAILVIDEOS_UPLOAD_CHUNK_SIZE=1024):
+            response = self.client.get(reverse('wagtailvideos:add_multiple'))
+        self.assertContains(response, 'chunk_size: 1024,')
+
+    def test_chunks_are_appended(self):
+        response = self.post_chunk(0, 49)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content.decode()), {'success': True, 'offset': 50})
+        self.assertEqual(self.get_offset(), 50)
+        self.assertFalse(Video.objects.exists())
+
+    def test_offset_of_unknown_upload(self):
+        self.assertEqual(self.get_offset('unknown'), 0)
+
+    def test_offset_requires_upload_id(self):
+        response = self.client.get(reverse('wagtailvideos:add_multiple_offset'))
+        self.assertEqual(response.status_code, 400)
+
+    def test_chunk_at_wrong_offset(self):
+        self.post_chunk(0, 49)
+        response = self.post_chunk(60, 99)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.content.decode())['offset'], 50)
+        self.assertEqual(self.get_offset(), 50)
+
+    def test_resume_after_repeated_chunk(self):
+        self.post_chunk(0, 49)
+        self.assertEqual(self.post_chunk(0, 49).status_code, 409)
+        response = self.post_chunk(50, 89)
+        self.assertEqual(json.loads(response.content.decode())['offset'], 90)
+
+    def test_first_chunk_is_identified(self):
+        self.content = b'Not a video' * 10
+        response = self.post_chunk(0, 49)
+
+        # A file that isn't a video is refused before the rest is sent
+        self.assertEqual(response.status_code, 200)
+        response_json = json.loads(response.content.decode())
+        self.assertFalse(response_json['success'])
+        self.assertIn("Not a valid video", response_json['error_message'])
+        self.assertEqual(self.get_offset(), 0)
+
+    def test_last_chunk_validates_assembled_file(self):
+        self.post_chunk(0, 49)
+        with patch('wagtailvideos.uploads.sniff_video_type', return_value=None):
+            response = self.post_chunk(50, 99)
+
+        # The assembled file goes through the same validation as a plain upload
+        self.assertEqual(response.status_code, 200)
+        response_json = json.loads(response.content.decode())
+        self.assertFalse(response_json['success'])
+        self.assertIn("Not a valid video", response_json['error_message'])
+
+        # The partial upload is removed once it has been handled
+        self.assertEqual(self.get_offset(), 0)
+
+    def test_last_chunk_saves_video(self):
+        self.content = create_test_video_file().read()
+        middle = len(self.content) // 2
+        self.post_chunk(0, middle - 1)
+        response = self.post_chunk(middle, len(self.content) - 1)
+
+        response_json = json.loads(response.content.decode())
+        self.assertTrue(response_json['success'])
+        video = Video.objects.get(id=response_json['video_id'])
+        self.assertEqual(video.title, 'small.mp4')
+        with video.file as f:
+            f.open('rb')
+            self.assertEqual(f.read(), self.content)
+
+    @override_settings(WAGTAILVIDEOS_MAX_UPLOAD_SIZE=10)
+    def test_too_large_upload_is_rejected_before_storing(self):
+        response = self.post_chunk(0, 49)
+
+        response_json = json.loads(response.content.decode())
+        self.assertFalse(response_json['success'])
+        self.assertIn("This file is too big", response_json['error_message'])
+        self.assertEqual(self.get_offset(), 0)
+
+    def test_invalid_content_range(self):
+        response = self.client.post(reverse('wagtailvideos:add_multiple'), {
+            'files[]': SimpleUploadedFile('test.txt', self.content, "text/plain"),
+            'upload_id': 'upload',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest', HTTP_CONTENT_RANGE='bytes 10-0/100')
+        self.assertEqual(response.status_code, 400)
+
+    def test_truncated_chunk(self):
+        response = self.client.post(reverse('wagtailvideos:add_multiple'), {
+            'files[]': SimpleUploadedFile('small.mp4', self.content[:40], 'video/mp4'),
+            'upload_id': 'upload',
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest', HTTP_CONTENT_RANGE='bytes 0-49/100')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get_offset(), 0)
+
+    def test_last_chunk_checks_total(self):
+        self.post_chunk(0, 49)
+
+        def short_append(chunked_upload, chunk, start):
+            # As when the disk fills up part way through
+            with open(chunked_upload.path, 'ab') as f:
+                f.write(chunk.read()[:10])
+
+        with patch.object(ChunkedUpload, 'append', short_append):
+            response = self.post_chunk(50, 99)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Video.objects.exists())
+        self.assertEqual(self.get_offset(), 0)
+
+    def test_retried_chunk_waiting_for_lock(self):
+        self.post_chunk(0, 49)
+        lock = locks.lock
+
+        def lock_after_first_try(f, flags):
+            # The first try of the chunk finishes while the retry waits
+            with open(ChunkedUpload(self.user, 'upload').path, 'ab') as first_try:
+                first_try.write(self.content[50:])
+            return lock(f, flags)
+
+        with patch('wagtailvideos.uploads.locks.lock', lock_after_first_try):
+            response = self.post_chunk(50, 99)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.get_offset(), 100)
+
+    def test_uploads_are_separate_per_user(self):
+        self.post_chunk(0, 49)
+        other_user = get_user_model().objects.create_superuser('other', 'other@example.com', 'password')
+        self.assertEqual(ChunkedUpload(other_user, 'upload').offset, 0)
+
+
+class TestMultipleVideoUploaderConcurrency(TestCase, WagtailTestUtils):
+    """
+    This tests the limit on concurrent uploads from one user
+    """
+    def setUp(self):
+        self.user = self.login()
+        self.key = 'wagtailvideos:uploads:{0}'.format(self.user.pk)
+
+    def tearDown(self):
+        cache.delete(self.key)
+
+    def post(self):
+        return self.client.post(reverse('wagtailvideos:add_multiple'), {
+            'files[]': SimpleUploadedFile('test.txt', b'Not a video', "text/plain"),
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_add_shows_concurrent_uploads(self):
+        with override_settings(WAGTAILVIDEOS_CONCURRENT_UPLOADS=5):
+            response = self.client.get(reverse('wagtailvideos:add_multiple'))
+        self.assertContains(response, 'concurrent_uploads: 5,')
+
+    @override_settings(WAGTAILVIDEOS_MAX_UPLOADS_PER_USER=2)
+    def test_upload_within_limit(self):
+        cache.set(self.key, 1)
+        response = self.post()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('error_message', json.loads(response.content.decode()))
+
+        # The slot is given back afterwards
+        self.assertEqual(cache.get(self.key), 1)
+
+    @override_settings(WAGTAILVIDEOS_MAX_UPLOADS_PER_USER=2)
+    def test_upload_over_limit(self):
+        cache.set(self.key, 2)
+        response = self.post()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '5')
+        self.assertFalse(json.loads(response.content.decode())['success'])
+        self.assertEqual(cache.get(self.key), 2)
+
+    @override_settings(WAGTAILVIDEOS_MAX_UPLOADS_PER_USER=2)
+    def test_upload_over_limit_is_not_received(self):
+        cache.set(self.key, 2)
+        # The CSRF check would be the first thing to read the body
+        self.client.handler.enforce_csrf_checks = True
+        with patch.object(HttpRequest, '_load_post_and_files') as load_post_and_files:
+            response = self.post()
+
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(load_post_and_files.called)
+
+    @override_settings(WAGTAILVIDEOS_MAX_UPLOADS_PER_USER=2)
+    def test_limit_is_per_user(self):
+        other_user = get_user_model().objects.create_superuser('other', 'other@example.com', 'password')
+        cache.set('wagtailvideos:uploads:{0}'.format(other_user.pk), 2)
+        self.assertEqual(self.post().status_code, 200)
+
+    @override_settings(WAGTAILVIDEOS_MAX_UPLOADS_PER_USER=None)
+    def test_no_limit(self):
+        cache.set(self.key, 100)
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(cache.get(self.key), 100)
@@ -0,0 +1,157 @@
+from __future__ import unicode_literals
+
+import datetime
+
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+from django.utils.six import StringIO
+from mock import patch
+from wagtail.core.models import Collection
+
+from wagtailvideos.models import (
+    MediaFormats, Video, VideoQuality, VideoTranscode)
+
+
+def fake_transcode(transcode):
+    transcode.file = ContentFile(b'transcode', 'transcode.' + transcode.media_format.name)
+    transcode.processing = False
+    transcode.save()
+
+
+class TestBackfillCommand(TestCase):
+    def setUp(self):
+        root_collection = Collection.get_first_root_node()
+        self.collection = root_collection.add_child(name="Archive")
+        self.old = Video.objects.create(title="Old", file=ContentFile(b'old', 'old.mp4'))
+        self.new = Video.objects.create(
+            title="New", file=ContentFile(b'new', 'new.mp4'), collection=self.collection)
+        Video.objects.filter(pk=self.old.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=30))
+
+    def run_command(self, *args, **options):
+        stdout = StringIO()
+        stderr = StringIO()
+        options.setdefault('workers', 1)
+        call_command('wagtailvideos_backfill', *args, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_nothing_to_do(self):
+        with self.assertRaises(CommandError):
+            self.run_command()
+
+    @patch('wagtailvideos.ffmpeg.installed', return_value=False)
+    def test_transcode_needs_ffmpeg(self, installed):
+        with self.assertRaises(CommandError):
+            self.run_command('--transcode', 'mp4')
+
+    @patch('wagtailvideos.ffmpeg.installed', return_value=False)
+    def test_metadata(self, installed):
+        Video.objects.update(file_size=None)
+
+        stdout, stderr = self.run_command(metadata=True)
+
+        self.assertIn("2 tasks done, 0 failed, for 2 videos", stdout)
+        self.assertEqual(Video.objects.get(pk=self.old.pk).file_size, 3)
+        self.assertEqual(Video.objects.get(pk=self.new.pk).file_size, 3)
+
+        # Nothing left to do
+        stdout, stderr = self.run_command(metadata=True)
+        self.assertIn("0 tasks done, 0 failed, for 0 videos", stdout)
+
+    @patch('wagtailvideos.ffmpeg.installed', return_value=False)
+    def test_dry_run(self, installed):
+        Video.objects.update(file_size=None)
+
+        stdout, stderr = self.run_command('--transcode', 'mp4', 'webm', metadata=True, dry_run=True)
+
+        self.assertIn("Would fill in metadata for Old", stdout)
+        self.assertIn("Would transcode to webm for New", stdout)
+        self.assertIn("6 tasks for 2 videos", stdout)
+        self.assertFalse(VideoTranscode.objects.exists())
+        self.assertFalse(Video.objects.filter(file_size__isnull=False).exists())
+
+    @patch('wagtailvideos.management.commands.wagtailvideos_backfill.transcode_video', side_effect=fake_transcode)
+    @patch('wagtailvideos.ffmpeg.installed', return_value=True)
+    def test_transcode(self, installed, transcode_video):
+        # Already has a usable mp4 transcode
+        VideoTranscode.objects.create(
+            video=self.old, media_format=MediaFormats.mp4, quality=VideoQuality.default)
+        # Has a webm transcode that failed
+        VideoTranscode.objects.create(
+            video=self.old, media_format=MediaFormats.webm, error_message="Failed")
+
+        stdout, stderr = self.run_command('--transcode', 'mp4', 'webm')
+
+        self.assertIn("3 tasks done, 0 failed, for 2 videos", stdout)
+        self.assertEqual(transcode_video.call_count, 3)
+        self.assertEqual(
+            set(VideoTranscode.objects.filter(error_message='').values_list('video__title', 'media_format')),
+            {('Old', MediaFormats.mp4), ('Old', MediaFormats.webm),
+             ('New', MediaFormats.mp4), ('New', MediaFormats.webm)})
+
+    @patch('wagtailvideos.management.commands.wagtailvideos_backfill.transcode_video')
+    @patch('wagtailvideos.ffmpeg.installed', return_value=True)
+    def test_unexpected_error(self, installed, transcode_video):
+        def fail_old(transcode):
+            if transcode.video.pk == self.old.pk:
+                raise ValueError("Unexpected")
+            fake_transcode(transcode)
+        transcode_video.side_effect = fail_old
+
+        with self.assertLogs('wagtailvideos', 'ERROR'):
+            stdout, stderr = self.run_command('--transcode', 'mp4')
+
+        self.assertIn("1 tasks done, 1 failed, for 2 videos", stdout)
+        self.assertIn("Could not transcode to mp4 for Old", stderr)
+
+    @patch('wagtailvideos.management.commands.wagtailvideos_backfill.transcode_video',
+           side_effect=IOError("No such file"))
+    @patch('wagtailvideos.ffmpeg.installed', return_value=True)
+    def test_unreadable_file(self, installed, transcode_video):
+        with self.assertLogs('wagtailvideos', 'ERROR') as logs:
+            stdout, stderr = self.run_command('--transcode', 'mp4')
+
+        self.assertIn("0 tasks done, 2 failed, for 2 videos", stdout)
+        self.assertIn("Could not transcode to mp4 for video {0}".format(self.old.pk), logs.output[0])
+        self.assertIn("No such file", logs.output[0])
+
+    @patch('wagtailvideos.management.commands.wagtailvideos_backfill.fill_metadata')
+    @patch('wagtailvideos.management.commands.wagtailvideos_backfill.transcode_video', side_effect=fake_transcode)
+    @patch('wagtailvideos.ffmpeg.installed', return_value=True)
+    def test_tasks_have_own_instances(self, installed, transcode_video, fill_metadata):
+        Video.objects.filter(pk=self.new.pk).update(file_size=None)
+        self.run_command('--transcode', 'mp4', metadata=True, collection='Archive')
+
+        metadata_video = fill_metadata.call_args[0][0]
+        transcode = transcode_video.call_args[0][0]
+        self.assertEqual(metadata_video.pk, transcode.video.pk)
+        self.assertIsNot(metadata_video, transcode.video)
+
+    @patch('wagtailvideos.ffmpeg.installed', return_value=True)
+    def test_different_quality_is_missing(self, installed):
+        VideoTranscode.objects.create(
+            video=self.old, media_format=MediaFormats.mp4, quality=VideoQuality.lowest)
+
+        stdout, stderr = self.run_command('--transcode', 'mp4', dry_run=True)
+        self.assertIn("Would transcode to mp4 for Old", stdout)
+
+        stdout, stderr = self.run_command('--transcode', 'mp4', quality='lowest', dry_run=True)
+        self.assertNotIn("for Old", stdout)
+
+    @patch('wagtailvideos.ffmpeg.installed', return_value=False)
+    def test_filters(self, installed):
+        Video.objects.update(file_size=None)
+
+        stdout, stderr = self.run_command(metadata=True, collection='Archive', dry_run=True)
+        self.assertIn("1 tasks for 1 videos", stdout)
+        self.assertIn("for New", stdout)
+
+        since = (timezone.now() - datetime.timedelta(days=1)).date().isoformat()
+        stdout, stderr = self.run_command(metadata=True, since=since, dry_run=True)
+        self.assertIn("1 tasks for 1 videos", stdout)
+        self.assertIn("for New", stdout)
+
+        with self.assertRaises(CommandError):
+            self.run_command(metadata=True, since='yesterday')
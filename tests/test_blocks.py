@@ -0,0 +1,56 @@
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from wagtail.core.blocks import StreamBlock, StreamValue
+
+from tests.utils import create_test_video_file
+from wagtailvideos.blocks import VideoChooserBlock
+from wagtailvideos.models import Video
+
+
+class TestVideoChooserBlock(TestCase):
+    def setUp(self):
+        self.videos = [
+            Video.objects.create(title="Test video %d" % i, file=create_test_video_file())
+            for i in range(3)
+        ]
+        self.stream_block = StreamBlock([('video', VideoChooserBlock())])
+
+    def get_stream_value(self):
+        return self.stream_block.to_python([
+            {'type': 'video', 'value': video.pk} for video in self.videos * 2
+        ] + [{'type': 'video', 'value': None}])
+
+    def test_bulk_to_python(self):
+        value = self.get_stream_value()
+        with self.assertNumQueries(1):
+            chosen = [child.value for child in value]
+        self.assertEqual(chosen, self.videos * 2 + [None])
+
+    def test_bulk_to_python_missing_video(self):
+        block = VideoChooserBlock()
+        self.assertEqual(block.bulk_to_python([self.videos[0].pk, 9999]), [self.videos[0], None])
+
+    def test_render(self):
+        value = self.get_stream_value()
+        with self.assertNumQueries(1):
+            html = value.render_as_block()
+        self.assertEqual(html.count('<video'), 6)
+
+    def test_render_form(self):
+        value = self.get_stream_value()
+        list(value)
+        with self.assertNumQueries(0):
+            html = self.stream_block.render_form(value, prefix='body')
+        for video in self.videos:
+            self.assertIn('value="%d"' % video.pk, html)
+
+    def test_render_form_from_id(self):
+        block = VideoChooserBlock()
+        with self.assertNumQueries(1):
+            html = block.render_form(self.videos[0].pk, prefix='video')
+        self.assertIn('value="%d"' % self.videos[0].pk, html)
+
+    def test_get_prep_value(self):
+        value = StreamValue(self.stream_block, [('video', self.videos[0])])
+        self.assertEqual(self.stream_block.get_prep_value(value)[0]['value'], self.videos[0].pk)
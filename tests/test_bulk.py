@@ -0,0 +1,179 @@
+from __future__ import unicode_literals
+
+import json
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.test import TestCase
+from django.urls import reverse
+from mock import patch
+from taggit.models import Tag
+from wagtail.core.models import Collection, GroupCollectionPermission
+from wagtail.tests.utils import WagtailTestUtils
+
+from tests.utils import create_test_video_file
+from wagtailvideos import bulk
+from wagtailvideos.models import (
+    MediaFormats, Video, VideoBulkJob, VideoFileDeletion, VideoQuality,
+    VideoTranscode)
+
+
+class BulkTestCase(TestCase, WagtailTestUtils):
+    def setUp(self):
+        self.login()
+        self.videos = [
+            Video.objects.create(title="Video {0}".format(i), file=create_test_video_file())
+            for i in range(3)]
+
+    def post(self, action, videos, confirm=False, **data):
+        data = dict(('bulk-' + key, value) for key, value in data.items())
+        if confirm:
+            data['confirm'] = '1'
+        data['bulk-action'] = action
+        data['bulk-videos'] = [video.pk for video in videos]
+        return self.client.post(reverse('wagtailvideos:bulk_action'), data)
+
+
+class TestBulkActions(BulkTestCase):
+    def test_index_has_bulk_actions(self):
+        response = self.client.get(reverse('wagtailvideos:index'))
+        self.assertContains(response, 'id="video-bulk-actions"')
+        self.assertContains(response, 'name="bulk-videos" value="{0}"'.format(self.videos[0].pk))
+
+    def test_nothing_selected(self):
+        response = self.post('add_tags', [], tags="one")
+        self.assertRedirects(response, reverse('wagtailvideos:index'))
+        self.assertEqual(Video.objects.filter(tags__name="one").count(), 0)
+
+    def test_move(self):
+        collection = Collection.get_first_root_node().add_child(name="Moved")
+        response = self.post('move', self.videos[:2], collection=collection.pk)
+        self.assertRedirects(response, reverse('wagtailvideos:index'))
+        self.assertEqual(
+            sorted(Video.objects.filter(collection=collection).values_list('title', flat=True)),
+            ["Video 0", "Video 1"])
+
+    def test_move_needs_collection(self):
+        response = self.post('move', self.videos)
+        self.assertRedirects(response, reverse('wagtailvideos:index'))
+        self.assertFalse(Video.objects.exclude(collection=self.videos[0].collection).exists())
+
+    def test_add_tags(self):
+        self.videos[0].tags.add("one")
+        response = self.post('add_tags', self.videos[:2], tags="one, two")
+        self.assertRedirects(response, reverse('wagtailvideos:index'))
+        self.assertEqual(sorted(self.videos[0].tags.names()), ["one", "two"])
+        self.assertEqual(sorted(self.videos[1].tags.names()), ["one", "two"])
+        self.assertEqual(list(self.videos[2].tags.names()), [])
+
+    def test_add_tags_queries(self):
+        Tag.objects.create(name="one")
+        Tag.objects.create(name="two")
+        with self.assertNumQueries(7):
+            bulk.add_tags(Video.objects.all(), ["one", "two"])
+
+    def test_delete_confirm(self):
+        response = self.post('delete', self.videos[:2])
+        self.assertTemplateUsed(response, 'wagtailvideos/videos/confirm_bulk_delete.html')
+        self.assertContains(response, "delete these 2 videos")
+        self.assertEqual(Video.objects.count(), 3)
+
+    def test_delete(self):
+        video = self.videos[0]
+        VideoTranscode.objects.create(video=video, media_format=MediaFormats.webm, file=create_test_video_file())
+        names = [video.file.name, video.transcodes.get().file.name]
+        storage = video.file.storage
+
+        response = self.post('delete', self.videos[:2], confirm=True)
+        self.assertRedirects(response, reverse('wagtailvideos:index'))
+        self.assertEqual(Video.objects.count(), 1)
+        self.assertFalse(VideoTranscode.objects.exists())
+
+        # Files are left to be deleted in the background
+        self.assertTrue(all(storage.exists(name) for name in names))
+        self.assertEqual(VideoFileDeletion.objects.count(), 3)
+
+    def test_delete_queries(self):
+        with self.assertNumQueries(12):
+            bulk.delete_videos(Video.objects.all())
+
+    def test_job_failures_counted(self):
+        job = VideoBulkJob.objects.create(
+            action=VideoBulkJob.TRANSCODE, items=json.dumps([1]), total=1)
+        with patch('wagtailvideos.bulk.transcode_video', side_effect=IOError), \
+                self.assertLogs('wagtailvideos', 'ERROR'):
+            bulk.run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.done, job.failed), (0, 1))
+
+    @patch('wagtailvideos.ffmpeg.installed', return_value=True)
+    def test_transcode(self, ffmpeg_installed):
+        VideoTranscode.objects.create(video=self.videos[0], media_format=MediaFormats.webm)
+        VideoTranscode.objects.create(video=self.videos[1], media_format=MediaFormats.webm, processing=True)
+
+        response = self.post('transcode', self.videos, media_format='webm', quality='lowest')
+        job = VideoBulkJob.objects.get()
+        self.assertRedirects(response, reverse('wagtailvideos:bulk_job', args=(job.pk,)))
+
+        # The transcode already being processed is left alone
+        transcodes = VideoTranscode.objects.filter(pk__in=job.get_items())
+        self.assertEqual(
+            sorted(transcodes.values_list('video__title', flat=True)), ["Video 0", "Video 2"])
+        self.assertTrue(all(t.processing and t.quality is VideoQuality.lowest for t in transcodes))
+
+        with patch('wagtailvideos.bulk.transcode_video') as transcode_video:
+            bulk.run_job(job)
+        self.assertEqual(transcode_video.call_count, 2)
+
+    def test_transcode_again_updates_sources(self):
+        video = self.videos[0]
+        VideoTranscode.objects.create(
+            video=video, media_format=MediaFormats.webm, file=create_test_video_file())
+        video.refresh_from_db()
+        self.assertEqual(len(video.get_sources()), 2)
+
+        with patch('wagtailvideos.bulk.start_job'):
+            bulk.request_transcodes(Video.objects.filter(pk=video.pk), MediaFormats.webm, VideoQuality.lowest)
+        video.refresh_from_db()
+        self.assertEqual([source['url'] for source in video.get_sources()], [video.url])
+
+    @patch('wagtailvideos.ffmpeg.installed', return_value=False)
+    def test_transcode_needs_ffmpeg(self, ffmpeg_installed):
+        self.post('transcode', self.videos, media_format='webm', quality='lowest')
+        self.assertFalse(VideoBulkJob.objects.exists())
+
+    def test_job_progress(self):
+        job = VideoBulkJob.objects.create(action=VideoBulkJob.TRANSCODE, items='[]', total=4, done=1)
+        response = self.client.get(reverse('wagtailvideos:bulk_job', args=(job.pk,)))
+        self.assertContains(response, "<span data-done>1</span> of 4 done")
+
+        response = self.client.get(
+            reverse('wagtailvideos:bulk_job', args=(job.pk,)), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(json.loads(response.content.decode()), {
+            'total': 4, 'done': 1, 'failed': 0, 'finished': False})
+
+
+class TestBulkActionsWithLimitedPermissions(BulkTestCase):
+    def setUp(self):
+        super(TestBulkActionsWithLimitedPermissions, self).setUp()
+        group = Group.objects.create(name="Uploaders")
+        group.permissions.add(Permission.objects.get(
+            content_type__app_label='wagtailadmin', codename='access_admin'))
+        GroupCollectionPermission.objects.create(
+            group=group, collection=Collection.get_first_root_node(),
+            permission=Permission.objects.get(content_type__app_label='wagtailvideos', codename='add_video'))
+        self.user = get_user_model().objects.create_user(
+            username='uploader', email='uploader@example.com', password='password')
+        self.user.groups.add(group)
+        self.client.login(username='uploader', password='password')
+
+        self.own_video = Video.objects.create(
+            title="Own video", file=create_test_video_file(), uploaded_by_user=self.user)
+
+    def test_own_videos(self):
+        self.post('add_tags', [self.own_video], tags="mine")
+        self.assertEqual(list(self.own_video.tags.names()), ["mine"])
+
+    def test_other_videos(self):
+        self.post('add_tags', [self.own_video, self.videos[0]], tags="mine")
+        self.assertFalse(Video.objects.filter(tags__name="mine").exists())
@@ -0,0 +1,124 @@
+from __future__ import unicode_literals
+
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils.six import StringIO
+from mock import Mock
+
+from tests.utils import create_test_video_file
+from wagtailvideos import cleanup
+from wagtailvideos.models import (
+    MediaFormats, Video, VideoFileDeletion, VideoTranscode)
+
+
+class TestFindOrphans(TestCase):
+    def setUp(self):
+        self.video = Video.objects.create(title="Test", file=create_test_video_file())
+        self.video.thumbnail.save('thumbnail.jpg', ContentFile(b'jpeg'))
+        self.transcode = VideoTranscode.objects.create(
+            video=self.video, media_format=MediaFormats.webm, file=create_test_video_file())
+
+        self.orphans = [
+            default_storage.save('original_videos/orphan.mp4', ContentFile(b'orphan')),
+            default_storage.save('video_transcodes/orphan.webm', ContentFile(b'orphan')),
+            default_storage.save('original_videos/nested/orphan.mp4', ContentFile(b'orphan')),
+        ]
+        self.addCleanup(lambda: [default_storage.delete(name) for name in self.orphans])
+
+    def find_orphans(self, **kwargs):
+        # Files left behind by other tests are orphans too
+        return [orphan.name for orphan in cleanup.find_orphans(**kwargs)]
+
+    def test_find_orphans(self):
+        orphans = self.find_orphans(min_age=datetime.timedelta(0))
+        for name in self.orphans:
+            self.assertIn(name, orphans)
+        for name in [self.video.file.name, self.video.thumbnail.name, self.transcode.file.name]:
+            self.assertNotIn(name, orphans)
+
+    def test_queued_for_deletion(self):
+        VideoFileDeletion.objects.create(model='wagtailvideos.Video', field='file', name=self.orphans[0])
+        self.assertNotIn(self.orphans[0], self.find_orphans(min_age=datetime.timedelta(0)))
+
+    def test_min_age(self):
+        # The test storage can't tell how old its files are, so they may be new
+        self.assertNotIn(self.orphans[0], self.find_orphans())
+
+    def test_command_lists(self):
+        stdout = StringIO()
+        call_command('wagtailvideos_clean_up', min_age=0, stdout=stdout)
+        output = stdout.getvalue()
+        for name in self.orphans:
+            self.assertIn(name, output)
+        self.assertIn("unused files in storage", output)
+        self.assertFalse(VideoFileDeletion.objects.exists())
+
+    def test_command_deletes(self):
+        call_command('wagtailvideos_clean_up', min_age=0, delete=True, stdout=StringIO())
+        queued = set(VideoFileDeletion.objects.values_list('name', flat=True))
+        self.assertTrue(set(self.orphans) <= queued)
+        self.assertNotIn(self.video.file.name, queued)
+        self.assertEqual(
+            VideoFileDeletion.objects.get(name=self.orphans[1]).model, 'wagtailvideos.VideoTranscode')
+
+
+class TestWalkStorage(TestCase):
+    def test_s3(self):
+        storage = Mock(spec=['bucket', '_normalize_name', 'listdir'])
+        storage._normalize_name.side_effect = lambda name: 'media/' + name
+        storage.bucket.objects.filter.return_value = [
+            Mock(key='media/original_videos/a.mp4'), Mock(key='media/original_videos/b/c.mp4')]
+
+        self.assertEqual(
+            list(cleanup.walk_storage(storage, 'original_videos')),
+            ['original_videos/a.mp4', 'original_videos/b/c.mp4'])
+        storage.bucket.objects.filter.assert_called_once_with(Prefix='media/original_videos/')
+        self.assertFalse(storage.listdir.called)
+
+
+class TestTempFiles(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        self.stale = os.path.join(self.directory, 'wagtailvideo-upload-abc')
+        self.stale_dir = os.path.join(self.directory, 'wagtailvideo-xyz')
+        self.fresh = os.path.join(self.directory, 'wagtailvideo-fresh.mp4')
+        self.other = os.path.join(self.directory, 'other')
+        self.cache_dir = os.path.join(self.directory, 'wagtailvideo-cache')
+        os.mkdir(self.stale_dir)
+        os.mkdir(self.cache_dir)
+        for path in [self.stale, os.path.join(self.stale_dir, 'out.webm'), self.fresh, self.other]:
+            with open(path, 'wb') as f:
+                f.write(b'data')
+        day_ago = time.time() - 25 * 60 * 60
+        for path in [self.stale, self.stale_dir, self.other, self.cache_dir]:
+            os.utime(path, (day_ago, day_ago))
+
+        settings = override_settings(
+            WAGTAILVIDEOS_CHUNKED_UPLOAD_DIR=self.directory,
+            WAGTAILVIDEOS_LOCAL_CACHE_DIR=self.cache_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_find_temp_files(self):
+        found = list(cleanup.find_temp_files())
+        self.assertIn(self.stale, found)
+        self.assertIn(self.stale_dir, found)
+        self.assertNotIn(self.fresh, found)
+        self.assertNotIn(self.other, found)
+        self.assertNotIn(self.cache_dir, found)
+
+    def test_command_deletes(self):
+        call_command('wagtailvideos_clean_up', delete=True, stdout=StringIO())
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            ['other', 'wagtailvideo-cache', 'wagtailvideo-fresh.mp4'])
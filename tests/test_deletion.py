@@ -0,0 +1,156 @@
+from __future__ import unicode_literals
+
+import datetime
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.utils.six import StringIO
+from mock import Mock, patch
+
+from tests.storage import RemoteStorage
+from tests.utils import create_test_video_file
+from wagtailvideos import deletion
+from wagtailvideos.models import (
+    MediaFormats, Video, VideoFileDeletion, VideoTranscode, transcode_video)
+
+
+class TestFileDeletion(TestCase):
+    def setUp(self):
+        self.video = Video.objects.create(title="Test", file=create_test_video_file())
+        self.video.thumbnail.save('thumbnail.jpg', ContentFile(b'jpeg'))
+        VideoTranscode.objects.create(
+            video=self.video, media_format=MediaFormats.webm, file=create_test_video_file())
+        self.storage = self.video.file.storage
+        self.names = [
+            self.video.file.name, self.video.thumbnail.name, self.video.transcodes.get().file.name]
+
+    @override_settings(WAGTAILVIDEOS_DELETE_FILES_IN_BACKGROUND=True)
+    def test_delete_queues_files(self):
+        with patch('wagtailvideos.deletion.transaction.on_commit') as on_commit:
+            self.video.delete()
+        on_commit.assert_called_with(deletion.start_worker)
+
+        self.assertEqual(
+            sorted(VideoFileDeletion.objects.values_list('name', flat=True)), sorted(self.names))
+        self.assertTrue(all(self.storage.exists(name) for name in self.names))
+
+    def test_rolled_back(self):
+        try:
+            with transaction.atomic():
+                self.video.delete()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(VideoFileDeletion.objects.exists())
+        self.assertTrue(all(self.storage.exists(name) for name in self.names))
+
+    def test_no_background_worker(self):
+        with patch('wagtailvideos.deletion.transaction.on_commit') as on_commit:
+            self.video.delete()
+        self.assertFalse(on_commit.called)
+        self.assertEqual(VideoFileDeletion.objects.count(), 3)
+
+    def test_worker(self):
+        self.video.delete()
+        # Run it in this thread, inside the test transaction
+        with patch.object(connection, 'close'):
+            deletion.DeletionThread().run()
+        self.assertIsNone(deletion._worker)
+        self.assertFalse(VideoFileDeletion.objects.exists())
+        self.assertFalse(any(self.storage.exists(name) for name in self.names))
+
+    def test_delete_files(self):
+        self.video.delete()
+        self.assertEqual(deletion.delete_files(), (3, 0))
+        self.assertFalse(VideoFileDeletion.objects.exists())
+        self.assertFalse(any(self.storage.exists(name) for name in self.names))
+
+    def test_name_in_use(self):
+        self.video.delete()
+        # The thumbnail name is given to another video before it is deleted
+        Video.objects.create(
+            title="Other", file=create_test_video_file(), thumbnail=self.names[1])
+
+        with self.assertLogs('wagtailvideos', 'INFO'):
+            self.assertEqual(deletion.delete_files(), (2, 0))
+        self.assertFalse(VideoFileDeletion.objects.exists())
+        self.assertFalse(self.storage.exists(self.names[0]))
+        self.assertTrue(self.storage.exists(self.names[1]))
+        self.assertFalse(self.storage.exists(self.names[2]))
+
+    def test_command(self):
+        self.video.delete()
+        stdout = StringIO()
+        call_command('wagtailvideos_delete_files', stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), "Deleted 3 files, 0 to be tried again later")
+
+    def test_retried(self):
+        self.video.delete()
+        failing = self.video.file.name
+        delete = RemoteStorage.delete
+
+        def flaky_delete(storage, name):
+            if name == failing:
+                raise IOError("Storage unavailable")
+            delete(storage, name)
+
+        with patch.object(RemoteStorage, 'delete', flaky_delete), \
+                self.assertLogs('wagtailvideos', 'WARNING'):
+            self.assertEqual(deletion.delete_files(), (2, 1))
+
+        retry = VideoFileDeletion.objects.get()
+        self.assertEqual(retry.name, failing)
+        self.assertEqual(retry.attempts, 1)
+        self.assertEqual(retry.last_error, "Storage unavailable")
+        self.assertGreater(retry.next_attempt_at, timezone.now())
+
+        # Not tried again until it is due
+        self.assertEqual(deletion.delete_files(), (0, 0))
+        VideoFileDeletion.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deletion.delete_files(), (1, 0))
+        self.assertFalse(self.storage.exists(failing))
+
+    def test_retry_delay(self):
+        self.assertEqual(deletion.get_retry_delay(1), datetime.timedelta(minutes=1))
+        self.assertEqual(deletion.get_retry_delay(3), datetime.timedelta(minutes=4))
+        self.assertEqual(deletion.get_retry_delay(20), datetime.timedelta(days=1))
+
+    def test_claimed_files_left_alone(self):
+        self.video.delete()
+        self.assertEqual(len(deletion.claim_deletions()), 3)
+        self.assertEqual(deletion.claim_deletions(), [])
+
+    def test_transcoded_again(self):
+        transcode = self.video.transcodes.get()
+        with patch('wagtailvideos.models.subprocess.check_output'), \
+                patch('wagtailvideos.models.ffmpeg.get_video_info', return_value={
+                    'width': 1, 'height': 1, 'bitrate': 1}), \
+                patch('wagtailvideos.models.open', create=True) as mock_open:
+            mock_open.return_value.read.return_value = b'webm'
+            transcode_video(transcode)
+        self.assertEqual(list(VideoFileDeletion.objects.values_list('name', flat=True)), [self.names[2]])
+
+
+class TestDeleteFromStorage(TestCase):
+    def test_delete_many(self):
+        storage = Mock(spec=['delete', 'delete_many'])
+        storage.delete_many.return_value = {'b': "Nope"}
+        self.assertEqual(deletion.delete_from_storage(storage, ['a', 'b']), {'b': "Nope"})
+        storage.delete_many.assert_called_once_with(['a', 'b'])
+        self.assertFalse(storage.delete.called)
+
+    def test_s3(self):
+        storage = Mock(spec=['delete', 'bucket', '_normalize_name'])
+        storage._normalize_name.side_effect = lambda name: 'media/' + name
+        storage.bucket.delete_objects.return_value = {
+            'Errors': [{'Key': 'media/b', 'Code': 'AccessDenied', 'Message': "Access Denied"}]}
+
+        self.assertEqual(deletion.delete_from_storage(storage, ['a', 'b']), {'b': "Access Denied"})
+        storage.bucket.delete_objects.assert_called_once_with(Delete={
+            'Objects': [{'Key': 'media/a'}, {'Key': 'media/b'}],
+            'Quiet': True,
+        })
+        self.assertFalse(storage.delete.called)
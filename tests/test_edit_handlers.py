@@ -0,0 +1,34 @@
+from __future__ import unicode_literals
+
+from django.test import RequestFactory, TestCase
+from wagtail.core.models import Page
+
+from tests.app.models import TestPage
+from tests.utils import create_test_video_file
+from wagtailvideos.models import Video
+
+
+class TestVideoChooserPanel(TestCase):
+    def setUp(self):
+        self.video = Video.objects.create(title="Test video", file=create_test_video_file())
+        root_page = Page.objects.get(depth=1)
+        self.page = root_page.add_child(instance=TestPage(
+            title="Test page", video_field=self.video))
+
+    def get_bound_panel(self, page):
+        edit_handler = TestPage.get_edit_handler()
+        form = edit_handler.get_form_class()(instance=page)
+        edit_handler = edit_handler.bind_to_instance(
+            instance=page, form=form, request=RequestFactory().get('/'))
+        for panel in edit_handler.children[0].children:
+            if getattr(panel, 'field_name', None) == 'video_field':
+                return panel
+
+    def test_render_as_field(self):
+        page = TestPage.objects.get(pk=self.page.pk)
+        panel = self.get_bound_panel(page)
+        # One query for the chosen video, none for the widget
+        with self.assertNumQueries(1):
+            html = panel.render_as_field()
+        self.assertIn('value="%d"' % self.video.pk, html)
+        self.assertIn('video-thumb', html)
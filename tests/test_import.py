@@ -0,0 +1,170 @@
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from mock import patch
+from wagtail.core.models import Collection
+
+from tests.utils import create_test_video_file
+from wagtailvideos.cleanup import walk_storage
+from wagtailvideos.models import Video
+
+
+class TestImportCommand(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.content = create_test_video_file().read()
+        self.root_collection = Collection.get_first_root_node()
+        self.collection = self.root_collection.add_child(name="Archive")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content=None):
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            # Each file gets different content, unless told otherwise
+            f.write(content if content is not None else self.content + name.encode('utf-8'))
+        return path
+
+    def run_import(self, source, **options):
+        stdout = StringIO()
+        stderr = StringIO()
+        options.setdefault('workers', 1)
+        call_command('wagtailvideos_import', source, stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_directory(self):
+        self.write('one.mp4')
+        self.write('nested/two.mp4')
+        self.write('.hidden.mp4')
+        self.write('notes.txt', b'Not a video')
+
+        stdout, stderr = self.run_import(self.directory, tags='archive, imported')
+
+        self.assertIn("2 imported, 0 already imported, 1 failed", stdout)
+        self.assertIn("Not a video", stderr)
+        self.assertEqual(sorted(Video.objects.values_list('title', flat=True)), ['one', 'two'])
+
+        video = Video.objects.get(title='one')
+        self.assertEqual(video.collection, self.root_collection)
+        self.assertEqual(sorted(video.tags.names()), ['archive', 'imported'])
+        self.assertEqual(video.file_size, len(self.content) + len(b'one.mp4'))
+        self.assertEqual(len(video.file_hash), 64)
+        with video.file as f:
+            f.open('rb')
+            self.assertEqual(f.read(), self.content + b'one.mp4')
+
+        # The files are copied
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'one.mp4')))
+
+    def test_import_is_idempotent(self):
+        self.write('one.mp4')
+        self.run_import(self.directory)
+
+        self.write('two.mp4')
+        self.write('copy of one.mp4', self.content + b'one.mp4')
+        stdout, stderr = self.run_import(self.directory)
+
+        self.assertIn("1 imported, 2 already imported, 0 failed", stdout)
+        self.assertEqual(Video.objects.count(), 2)
+
+    def test_import_csv_manifest(self):
+        self.write('videos/one.mp4')
+        self.write('videos/two.mp4')
+        manifest = os.path.join(self.directory, 'manifest.csv')
+        with open(manifest, 'w') as f:
+            f.write('path,title,collection,tags\n')
+            f.write('videos/one.mp4,First video,Archive,"a, b"\n')
+            f.write('videos/two.mp4,,,\n')
+
+        stdout, stderr = self.run_import(manifest, tags='default')
+
+        self.assertIn("2 imported", stdout)
+        first = Video.objects.get(title="First video")
+        self.assertEqual(first.collection, self.collection)
+        self.assertEqual(sorted(first.tags.names()), ['a', 'b'])
+
+        second = Video.objects.get(title="two")
+        self.assertEqual(second.collection, self.root_collection)
+        self.assertEqual(list(second.tags.names()), ['default'])
+
+    def test_import_json_manifest(self):
+        self.write('one.mp4')
+        manifest = os.path.join(self.directory, 'manifest.json')
+        with open(manifest, 'w') as f:
+            json.dump([
+                {'path': 'one.mp4', 'title': "First video", 'collection': self.collection.id, 'tags': ['a']},
+            ], f)
+
+        self.run_import(manifest)
+
+        video = Video.objects.get()
+        self.assertEqual(video.title, "First video")
+        self.assertEqual(video.collection, self.collection)
+        self.assertEqual(list(video.tags.names()), ['a'])
+
+    def test_import_unknown_collection(self):
+        self.write('one.mp4')
+        manifest = os.path.join(self.directory, 'manifest.json')
+        with open(manifest, 'w') as f:
+            json.dump([{'path': 'one.mp4', 'collection': 'Missing'}], f)
+
+        stdout, stderr = self.run_import(manifest)
+
+        self.assertIn("1 failed", stdout)
+        self.assertIn("Collection 'Missing' does not exist", stderr)
+        self.assertFalse(Video.objects.exists())
+
+    def test_move(self):
+        path = self.write('one.mp4')
+        self.run_import(self.directory, move=True)
+
+        self.assertFalse(os.path.exists(path))
+        video = Video.objects.get()
+        with video.file as f:
+            f.open('rb')
+            self.assertEqual(f.read(), self.content + b'one.mp4')
+
+    def test_failed_import_is_undone(self):
+        path = self.write('one.mp4')
+        self.write('two.mp4')
+        stored = set(walk_storage(default_storage, 'original_videos'))
+
+        with patch('taggit.managers._TaggableManager.set', side_effect=[ValueError("Tags failed"), None]):
+            stdout, stderr = self.run_import(self.directory, move=True)
+
+        # One bad file doesn't stop the rest
+        self.assertIn("1 imported, 0 already imported, 1 failed", stdout)
+        self.assertIn("Failed to import {0}: Tags failed".format(path), stderr)
+        video = Video.objects.get()
+        self.assertEqual(video.title, 'two')
+
+        # Nothing is left in storage, and the file is still there to try again
+        self.assertEqual(
+            set(walk_storage(default_storage, 'original_videos')) - stored, {video.file.name})
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(os.listdir(self.directory), ['one.mp4'])
+
+    def test_collection_option(self):
+        self.write('one.mp4')
+        self.run_import(self.directory, collection='Archive')
+        self.assertEqual(Video.objects.get().collection, self.collection)
+
+    def test_process_pool(self):
+        for i in range(4):
+            self.write('{0}.mp4'.format(i))
+
+        stdout, stderr = self.run_import(self.directory, workers=2)
+
+        self.assertIn("4 imported", stdout)
+        self.assertEqual(Video.objects.count(), 4)
@@ -0,0 +1,129 @@
+from __future__ import unicode_literals
+
+from django.test import TestCase
+from django.urls import reverse
+from mock import Mock, patch
+from wagtail.tests.utils import WagtailTestUtils
+
+from tests.utils import create_test_video_file
+from wagtailvideos import indexing
+from wagtailvideos.models import Video
+
+
+class IndexingTestCase(TestCase):
+    def setUp(self):
+        # Saves from other tests were rolled back without being indexed
+        indexing.get_state().pending.clear()
+
+        self.backend = Mock()
+        patcher = patch(
+            'wagtailvideos.indexing.get_search_backends_with_name',
+            return_value=[('default', self.backend)])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # Keep the callbacks to run when the test says the transaction commits
+        self.on_commit = []
+        patcher = patch('wagtailvideos.indexing.on_commit', side_effect=self.on_commit.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def commit(self):
+        for callback in self.on_commit:
+            callback()
+        self.on_commit[:] = []
+
+    def indexed(self):
+        return [
+            [video.title for video in call[0][1]]
+            for call in self.backend.add_bulk.call_args_list]
+
+
+class TestIndexing(IndexingTestCase):
+    def test_indexed_on_commit(self):
+        video = Video.objects.create(title="Test", file=create_test_video_file())
+        self.assertEqual(self.indexed(), [])
+
+        self.commit()
+        self.assertEqual(self.indexed(), [["Test"]])
+        self.backend.add_bulk.assert_called_once_with(Video, [video])
+
+    def test_saves_coalesced(self):
+        video = Video.objects.create(title="Test", file=create_test_video_file())
+        video.title = "Changed"
+        video.save()
+
+        self.commit()
+        self.assertEqual(self.indexed(), [["Changed"]])
+
+    def test_batch(self):
+        with indexing.batch_indexing():
+            Video.objects.create(title="One", file=create_test_video_file())
+            Video.objects.create(title="Two", file=create_test_video_file())
+            self.assertEqual(self.on_commit, [])
+
+        self.commit()
+        self.assertEqual(len(self.indexed()), 1)
+        self.assertEqual(sorted(self.indexed()[0]), ["One", "Two"])
+
+    @patch('wagtailvideos.indexing.BATCH_SIZE', 2)
+    def test_batch_size(self):
+        with indexing.batch_indexing():
+            for title in ["One", "Two", "Three"]:
+                Video.objects.create(title=title, file=create_test_video_file())
+                self.commit()
+
+        self.assertEqual(len(self.indexed()), 1)
+        self.commit()
+        self.assertEqual(self.indexed()[1], ["Three"])
+
+    def test_tags_saved_in_batch(self):
+        with indexing.batch_indexing():
+            video = Video.objects.create(title="Test", file=create_test_video_file())
+            video.tags.add("tag")
+
+        self.commit()
+        indexed_video = self.backend.add_bulk.call_args[0][1][0]
+        self.assertEqual([tag.name for tag in indexed_video.tags.all()], ["tag"])
+
+    def test_deleted_before_commit(self):
+        video = Video.objects.create(title="Test", file=create_test_video_file())
+        video.delete()
+
+        self.commit()
+        self.assertEqual(self.indexed(), [])
+
+    def test_backend_error(self):
+        self.backend.add_bulk.side_effect = ValueError
+        Video.objects.create(title="Test", file=create_test_video_file())
+        with self.assertLogs('wagtailvideos', 'ERROR'):
+            self.commit()
+
+    def test_not_indexed_by_wagtail_while_saving(self):
+        video = Video(title="Test", file=create_test_video_file())
+        self.assertIs(video.get_indexed_instance(), video)
+        with indexing.saving_video():
+            self.assertIsNone(video.get_indexed_instance())
+
+
+class TestEditViewIndexing(IndexingTestCase, WagtailTestUtils):
+    def setUp(self):
+        super(TestEditViewIndexing, self).setUp()
+        self.login()
+        self.video = Video.objects.create(title="Test", file=create_test_video_file())
+        self.commit()
+        self.backend.reset_mock()
+
+    def test_edit(self):
+        response = self.client.post(reverse('wagtailvideos:edit', args=(self.video.id,)), {
+            'title': "Edited",
+            'collection': self.video.collection_id,
+            'tags': "one, two",
+        })
+        self.assertRedirects(response, reverse('wagtailvideos:index'))
+        self.assertEqual(self.indexed(), [])
+
+        self.commit()
+        self.assertEqual(self.indexed(), [["Edited"]])
+        indexed_video = self.backend.add_bulk.call_args[0][1][0]
+        self.assertEqual(sorted(tag.name for tag in indexed_video.tags.all()), ["one", "two"])
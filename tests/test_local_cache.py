@@ -0,0 +1,91 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from mock import patch
+
+from tests.storage import RemoteStorage
+from tests.utils import create_test_video_file
+from wagtailvideos import local_cache
+from wagtailvideos.models import Video, get_local_file
+
+
+class TestLocalCache(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        settings = override_settings(WAGTAILVIDEOS_LOCAL_CACHE_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.video = Video.objects.create(title="Test", file=create_test_video_file())
+        self.content = create_test_video_file().read()
+
+    def cached_files(self):
+        return sorted(
+            name for root, directories, files in os.walk(self.directory) for name in files
+            if not name.endswith(local_cache.LOCK_SUFFIX))
+
+    def test_downloaded_once(self):
+        with patch.object(RemoteStorage, '_open', wraps=self.video.file.storage._open) as _open:
+            with get_local_file(self.video.file) as first:
+                with open(first, 'rb') as f:
+                    self.assertEqual(f.read(), self.content)
+            with get_local_file(Video.objects.get(pk=self.video.pk).file) as second:
+                self.assertEqual(first, second)
+        self.assertEqual(_open.call_count, 1)
+        self.assertEqual(self.cached_files(), [self.video.file_hash + '.mp4'])
+
+    def test_not_cacheable(self):
+        self.video.file_hash = ''
+        with get_local_file(self.video.file) as path:
+            self.assertFalse(path.startswith(self.directory))
+        self.assertEqual(self.cached_files(), [])
+
+    @override_settings(WAGTAILVIDEOS_LOCAL_CACHE_SIZE=None)
+    def test_disabled(self):
+        with get_local_file(self.video.file) as path:
+            self.assertFalse(path.startswith(self.directory))
+        self.assertEqual(self.cached_files(), [])
+
+    @override_settings(WAGTAILVIDEOS_LOCAL_CACHE_SIZE=10)
+    def test_too_big(self):
+        self.assertIsNone(local_cache.get_cache_key(self.video.file))
+
+    def test_evict_least_recently_used(self):
+        videos = [
+            Video.objects.create(title="Test", file=ContentFile(str(i).encode() * 100, 'video.mp4'))
+            for i in range(3)]
+        paths = []
+        for i, video in enumerate(videos):
+            with get_local_file(video.file) as path:
+                paths.append(path)
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+        # Using the oldest makes it the newest
+        with get_local_file(videos[0].file):
+            pass
+
+        local_cache.evict(200)
+        self.assertTrue(os.path.exists(paths[0]))
+        self.assertFalse(os.path.exists(paths[1]))
+        self.assertFalse(os.path.exists(paths[1] + local_cache.LOCK_SUFFIX))
+        self.assertTrue(os.path.exists(paths[2]))
+
+    def test_in_use_not_evicted(self):
+        with get_local_file(self.video.file) as path:
+            local_cache.evict(0)
+            self.assertTrue(os.path.exists(path))
+        local_cache.evict(0)
+        self.assertFalse(os.path.exists(path))
+
+    def test_failed_fill(self):
+        with patch.object(RemoteStorage, '_open', side_effect=IOError("Storage unavailable")):
+            with self.assertRaises(IOError):
+                with get_local_file(self.video.file):
+                    pass
+        self.assertEqual(self.cached_files(), [])
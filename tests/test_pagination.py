@@ -0,0 +1,135 @@
+from __future__ import unicode_literals
+
+import datetime
+
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from wagtail.tests.utils import WagtailTestUtils
+
+from wagtailvideos.models import Video
+from wagtailvideos.pagination import (
+    decode_cursor, encode_cursor, paginate_by_keyset)
+
+
+class KeysetTestMixin(object):
+    def setUp(self):
+        now = timezone.now()
+        for i in range(25):
+            video = Video.objects.create(
+                title="Video {0}".format(i), file=ContentFile(b'video', 'video.mp4'))
+            # Videos 10 and 11 were created at the same time
+            created_at = now - datetime.timedelta(minutes=min(i, 10) if i != 11 else 10)
+            Video.objects.filter(pk=video.pk).update(created_at=created_at)
+        self.expected = list(Video.objects.order_by('-created_at', '-pk'))
+
+
+class TestPaginateByKeyset(KeysetTestMixin, TestCase):
+    def paginate(self, params={}, per_page=10):
+        request = RequestFactory().get('/', params)
+        return paginate_by_keyset(request, Video.objects.all(), per_page=per_page)
+
+    def test_cursor_round_trip(self):
+        video = self.expected[0]
+        self.assertEqual(decode_cursor(encode_cursor(video)), (video.created_at, video.pk))
+
+    def test_invalid_cursors(self):
+        for cursor in ['', 'Not a cursor', '!!!', encode_cursor(self.expected[0])[:-4]]:
+            self.assertIsNone(decode_cursor(cursor))
+
+            # Falls back to the first page
+            page = self.paginate({'after': cursor})
+            self.assertEqual(list(page), self.expected[:10])
+            self.assertFalse(page.has_previous())
+
+    def test_forwards_and_backwards(self):
+        first = self.paginate()
+        self.assertEqual(list(first), self.expected[:10])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        self.assertEqual(first.count, 25)
+
+        second = self.paginate({'after': first.next_cursor})
+        self.assertEqual(list(second), self.expected[10:20])
+        self.assertTrue(second.has_previous())
+        self.assertTrue(second.has_next())
+
+        third = self.paginate({'after': second.next_cursor})
+        self.assertEqual(list(third), self.expected[20:])
+        self.assertFalse(third.has_next())
+        self.assertIsNone(third.next_cursor)
+
+        back = self.paginate({'before': third.previous_cursor})
+        self.assertEqual(list(back), self.expected[10:20])
+        self.assertTrue(back.has_previous())
+
+        back = self.paginate({'before': back.previous_cursor})
+        self.assertEqual(list(back), self.expected[:10])
+        self.assertFalse(back.has_previous())
+
+    def test_page_query_keeps_other_parameters(self):
+        page = self.paginate({'collection_id': '1', 'p': '3'})
+        self.assertEqual(
+            page.next_page_query,
+            'collection_id=1&after={0}'.format(page.next_cursor))
+
+    def test_deep_page_queries(self):
+        cursor = encode_cursor(self.expected[20])
+        # One query for the page, one for the count
+        with self.assertNumQueries(2):
+            page = self.paginate({'after': cursor})
+        self.assertEqual(list(page), self.expected[21:])
+
+    @override_settings(WAGTAILVIDEOS_COUNT_MODE=None)
+    def test_no_count(self):
+        with self.assertNumQueries(1):
+            page = self.paginate()
+        self.assertIsNone(page.count)
+
+    @override_settings(WAGTAILVIDEOS_COUNT_MODE='estimated')
+    def test_estimated_count_on_small_tables_is_exact(self):
+        page = self.paginate()
+        self.assertEqual(page.count, 25)
+        self.assertFalse(page.count_is_estimate)
+
+
+class TestKeysetViews(KeysetTestMixin, WagtailTestUtils, TestCase):
+    def setUp(self):
+        super(TestKeysetViews, self).setUp()
+        self.login()
+
+    def test_index(self):
+        response = self.client.get(reverse('wagtailvideos:index'))
+        self.assertEqual(response.status_code, 200)
+        page = response.context['videos']
+        self.assertEqual(list(page), self.expected[:20])
+        self.assertContains(response, '?after={0}'.format(page.next_cursor))
+        self.assertContains(response, '25 videos')
+
+        response = self.client.get(reverse('wagtailvideos:index'), {'after': page.next_cursor})
+        self.assertEqual(list(response.context['videos']), self.expected[20:])
+
+    def test_index_ajax(self):
+        response = self.client.get(
+            reverse('wagtailvideos:index'), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'wagtailvideos/videos/results.html')
+        self.assertContains(response, 'Video 0')
+
+    def test_index_defers_columns(self):
+        response = self.client.get(reverse('wagtailvideos:index'))
+        video = response.context['videos'][0]
+        self.assertIn('file_size', video.get_deferred_fields())
+
+    def test_chooser(self):
+        response = self.client.get(reverse('wagtailvideos:chooser'))
+        page = response.context['videos']
+        self.assertEqual(list(page), self.expected[:12])
+
+        response = self.client.get(reverse('wagtailvideos:chooser'), {'after': page.next_cursor})
+        self.assertTemplateUsed(response, 'wagtailvideos/chooser/results.html')
+        page = response.context['videos']
+        self.assertEqual(list(page), self.expected[12:24])
+        self.assertContains(response, 'data-before="{0}"'.format(page.previous_cursor))
+        self.assertContains(response, 'data-after="{0}"'.format(page.next_cursor))
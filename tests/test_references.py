@@ -0,0 +1,185 @@
+from __future__ import unicode_literals
+
+import json
+
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db.migrations import Migration
+from django.test import TestCase
+from django.urls import reverse
+from django.utils.six import StringIO
+from wagtail.core.models import Page
+from wagtail.tests.utils import WagtailTestUtils
+
+from tests.app.models import (
+    TestPage, TestPageRelatedVideo, TestSnippet, TestSubPage)
+from tests.utils import create_test_video_file
+from wagtailvideos.models import Video, VideoReference
+from wagtailvideos.references import (
+    REFERENCES_MIGRATION, build_references_after_upgrade, find_references)
+
+
+class TestVideoReferences(TestCase):
+    def setUp(self):
+        self.root = Page.get_first_root_node()
+        self.video = Video.objects.create(title="One", file=create_test_video_file())
+        self.other_video = Video.objects.create(title="Two", file=create_test_video_file())
+
+    def add_page(self, **kwargs):
+        return self.root.add_child(instance=TestPage(title="Test page", **kwargs))
+
+    def test_page_foreign_key(self):
+        page = self.add_page(video_field=self.video)
+        self.assertEqual(self.video.get_usage_count(), 1)
+
+        page.video_field = self.other_video
+        page.save()
+        self.assertEqual(self.video.get_usage_count(), 0)
+        self.assertEqual(self.other_video.get_usage_count(), 1)
+
+        page.delete()
+        self.assertEqual(self.other_video.get_usage_count(), 0)
+
+    def test_page_subclass(self):
+        page = self.root.add_child(instance=TestSubPage(title="Test page", video_field=self.video))
+        self.assertEqual(self.video.get_usage_count(), 1)
+
+        page.video_field = None
+        page.body = json.dumps([{'type': 'video', 'value': self.other_video.pk}])
+        page.save()
+        self.assertEqual(self.video.get_usage_count(), 0)
+        self.assertEqual(self.other_video.get_usage_count(), 1)
+
+        page.delete()
+        self.assertEqual(self.other_video.get_usage_count(), 0)
+
+    def test_inline_children(self):
+        page = self.add_page(video_field=self.video)
+        page.related_videos = [
+            TestPageRelatedVideo(video=self.video),
+            TestPageRelatedVideo(video=self.other_video),
+        ]
+        page.save()
+
+        # Used twice by the same page counts once
+        self.assertEqual(self.video.get_usage_count(), 1)
+        self.assertEqual(self.other_video.get_usage_count(), 1)
+
+        page.related_videos = []
+        page.save()
+        self.assertEqual(self.video.get_usage_count(), 1)
+        self.assertEqual(self.other_video.get_usage_count(), 0)
+
+    def test_usage_count_is_one_query(self):
+        self.add_page(video_field=self.video)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.video.get_usage_count(), 1)
+
+    def test_rebuild(self):
+        page = self.add_page(video_field=self.video)
+        TestPageRelatedVideo.objects.create(page=page, video=self.other_video)
+        # Changed without signals
+        TestPage.objects.filter(pk=page.pk).update(video_field=None)
+        VideoReference.objects.filter(video=self.other_video).delete()
+
+        stdout = StringIO()
+        call_command('wagtailvideos_rebuild_references', stdout=stdout)
+        self.assertIn("Added 1 and removed 1 video references", stdout.getvalue())
+        self.assertEqual(self.video.get_usage_count(), 0)
+        self.assertEqual(self.other_video.get_usage_count(), 1)
+
+        stdout = StringIO()
+        call_command('wagtailvideos_rebuild_references', stdout=stdout)
+        self.assertIn("Added 0 and removed 0 video references", stdout.getvalue())
+
+    def test_built_by_migrate(self):
+        self.add_page(video_field=self.video)
+        VideoReference.objects.all().delete()
+        app_config = apps.get_app_config('wagtailvideos')
+
+        # Only when the migration creating the index has just been applied
+        other = Migration('0013_indexes', 'wagtailvideos')
+        emit_post_migrate_signal(0, False, 'default', plan=[(other, False)])
+        self.assertEqual(self.video.get_usage_count(), 0)
+
+        migration = Migration(REFERENCES_MIGRATION, 'wagtailvideos')
+        build_references_after_upgrade(app_config, plan=[(migration, True)], using='default')
+        self.assertEqual(self.video.get_usage_count(), 0)
+
+        stdout = StringIO()
+        emit_post_migrate_signal(0, False, 'default', plan=[(migration, False)], stdout=stdout)
+        self.assertEqual(self.video.get_usage_count(), 1)
+        self.assertEqual(stdout.getvalue(), "")
+
+        VideoReference.objects.all().delete()
+        build_references_after_upgrade(
+            app_config, plan=[(migration, False)], using='default', verbosity=1, stdout=stdout)
+        self.assertEqual(stdout.getvalue(), "Added 1 video references for existing content\n")
+
+    def test_stream_field(self):
+        third_video = Video.objects.create(title="Three", file=create_test_video_file())
+        page = self.add_page(body=json.dumps([
+            {'type': 'video', 'value': self.video.pk},
+            {'type': 'playlist', 'value': [self.other_video.pk, None]},
+            {'type': 'feature', 'value': {'heading': "Feature", 'video': third_video.pk}},
+        ]))
+        self.assertEqual(self.video.get_usage_count(), 1)
+        self.assertEqual(self.other_video.get_usage_count(), 1)
+        self.assertEqual(third_video.get_usage_count(), 1)
+
+        page = TestPage.objects.get(pk=page.pk)
+        page.body = json.dumps([{'type': 'video', 'value': third_video.pk}])
+        page.save()
+        self.assertEqual(self.video.get_usage_count(), 0)
+        self.assertEqual(self.other_video.get_usage_count(), 0)
+        self.assertEqual(third_video.get_usage_count(), 1)
+
+    def test_stream_field_deleted_video(self):
+        page = self.add_page(body=json.dumps([{'type': 'video', 'value': self.video.pk}]))
+        self.video.delete()
+        page.save()
+        self.assertFalse(VideoReference.objects.exists())
+
+        stdout = StringIO()
+        call_command('wagtailvideos_rebuild_references', stdout=stdout)
+        self.assertIn("Added 0 and removed 0 video references", stdout.getvalue())
+
+    def test_stream_field_read_without_loading_videos(self):
+        page = self.add_page(body=json.dumps([
+            {'type': 'video', 'value': self.video.pk},
+            {'type': 'playlist', 'value': [self.other_video.pk]},
+        ]))
+        page = TestPage.objects.get(pk=page.pk)
+        # One query for each field that can use videos, and none for videos
+        with self.assertNumQueries(3):
+            self.assertEqual(
+                find_references(Page, page.pk), {self.video.pk, self.other_video.pk})
+
+    def test_snippet(self):
+        snippet = TestSnippet.objects.create(title="Snippet", video=self.video)
+        self.assertEqual(self.video.get_usage_count(), 1)
+        self.assertEqual(self.video.get_usage().count(), 0)
+
+        snippet.delete()
+        self.assertEqual(self.video.get_usage_count(), 0)
+
+
+class TestVideoUsageView(WagtailTestUtils, TestCase):
+    def setUp(self):
+        self.login()
+        self.video = Video.objects.create(title="One", file=create_test_video_file())
+
+    def test_usage(self):
+        root = Page.get_first_root_node()
+        page = root.add_child(instance=TestPage(title="Page with video", video_field=self.video))
+        snippet = TestSnippet.objects.create(title="Snippet with video", video=self.video)
+
+        response = self.client.get(reverse('wagtailvideos:video_usage', args=(self.video.pk,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Page with video")
+        self.assertContains(response, reverse('wagtailadmin_pages:edit', args=(page.pk,)))
+        self.assertContains(response, "Snippet with video")
+        self.assertContains(response, reverse(
+            'wagtailsnippets:edit', args=('app', 'testsnippet', snippet.pk)))
+        self.assertEqual(list(self.video.get_usage()), [page.page_ptr])
@@ -0,0 +1,129 @@
+from __future__ import unicode_literals
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from wagtail.core.models import Collection, CollectionViewRestriction
+from wagtail.tests.utils import WagtailTestUtils
+
+from tests.utils import create_test_video_file
+from wagtailvideos.models import MediaFormats, Video
+from wagtailvideos.views.serve import parse_range_header
+
+
+class TestParseRangeHeader(TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range_header('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range_header('bytes=500-', 1000), (500, 999))
+        self.assertEqual(parse_range_header('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range_header('bytes=900-2000', 1000), (900, 999))
+
+    def test_ignored(self):
+        self.assertIsNone(parse_range_header(None, 1000))
+        self.assertIsNone(parse_range_header('bytes=0-1,5-6', 1000))
+        self.assertIsNone(parse_range_header('items=0-1', 1000))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(ValueError):
+            parse_range_header('bytes=1000-', 1000)
+        with self.assertRaises(ValueError):
+            parse_range_header('bytes=-0', 1000)
+
+
+class TestServeView(TestCase, WagtailTestUtils):
+    def setUp(self):
+        self.video = Video.objects.create(title="Test video", file=create_test_video_file())
+        self.content = create_test_video_file().read()
+
+    def get(self, **extra):
+        return self.client.get(reverse('wagtailvideos_serve', args=(self.video.id,)), **extra)
+
+    def test_full(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertFalse(response['ETag'].startswith('W/'))
+
+    def test_missing_file(self):
+        self.video.file.storage.delete(self.video.file.name)
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_range(self):
+        response = self.get(HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/%d' % len(self.content))
+        self.assertEqual(response['Content-Length'], '100')
+
+    def test_suffix_range(self):
+        response = self.get(HTTP_RANGE='bytes=-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE='bytes=%d-' % len(self.content))
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */%d' % len(self.content))
+
+    def test_if_none_match(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_range_mismatch(self):
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_range_match(self):
+        etag = self.get()['ETag']
+        response = self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+    def test_transcode(self):
+        transcode = self.video.transcodes.create(media_format=MediaFormats.webm, file=self.video.file.name)
+        response = self.client.get(reverse('wagtailvideos_serve_transcode', args=(self.video.id, 'webm')))
+        self.assertEqual(response.status_code, 200)
+
+        transcode.processing = True
+        transcode.save()
+        response = self.client.get(reverse('wagtailvideos_serve_transcode', args=(self.video.id, 'webm')))
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(reverse('wagtailvideos_serve_transcode', args=(self.video.id, 'nope')))
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(WAGTAILVIDEOS_CONTENT_ADDRESSED_NAMES=True)
+    def test_immutable(self):
+        self.video.file = create_test_video_file()
+        self.video.save()
+        response = self.get()
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    @override_settings(WAGTAILVIDEOS_SERVE_METHOD='x-accel-redirect')
+    def test_x_accel_redirect(self):
+        response = self.get(HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.video.file.name)
+        self.assertEqual(response.content, b'')
+
+    def test_post_not_allowed(self):
+        response = self.client.post(reverse('wagtailvideos_serve', args=(self.video.id,)))
+        self.assertEqual(response.status_code, 405)
+
+    def test_login_restriction(self):
+        root_collection = Collection.get_first_root_node()
+        collection = root_collection.add_child(name="Private")
+        CollectionViewRestriction.objects.create(
+            collection=collection, restriction_type=CollectionViewRestriction.LOGIN)
+        self.video.collection = collection
+        self.video.save()
+
+        response = self.get()
+        self.assertEqual(response.status_code, 302)
+
+        self.login()
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private')
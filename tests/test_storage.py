@@ -0,0 +1,133 @@
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from mock import Mock, patch
+
+from tests.storage import RemoteStorage
+from tests.utils import create_test_video_file
+from wagtailvideos.models import MediaFormats, Video
+from wagtailvideos.storage import (
+    get_cache_control, is_content_addressed, is_sharded_name, save_file)
+
+
+@override_settings(WAGTAILVIDEOS_CONTENT_ADDRESSED_NAMES=True)
+class TestContentAddressedNames(TestCase):
+    def setUp(self):
+        self.content = create_test_video_file().read()
+        self.content_hash = hashlib.sha256(self.content).hexdigest()[:12]
+
+    def test_original(self):
+        video = Video.objects.create(title="Test video", file=ContentFile(b'original', 'original.mp4'))
+        self.assertEqual(
+            video.file.name,
+            'original_videos/original.%s.mp4' % hashlib.sha256(b'original').hexdigest()[:12])
+        self.assertTrue(is_content_addressed(video.file.name))
+
+    def test_thumbnail(self):
+        video = Video.objects.create(title="Test video", file=create_test_video_file())
+        video.thumbnail = ContentFile(b'thumbnail', 'small_thumb.jpg')
+        video.save()
+        self.assertEqual(
+            video.thumbnail.name,
+            'original_videos/small_thumb.%s.jpg' % hashlib.sha256(b'thumbnail').hexdigest()[:12])
+
+    def test_transcode(self):
+        video = Video.objects.create(title="Test video", file=create_test_video_file())
+        transcode = video.transcodes.create(
+            media_format=MediaFormats.webm, file=ContentFile(b'transcode', 'small.webm'))
+        self.assertEqual(
+            transcode.file.name,
+            'video_transcodes/small.%s.webm' % hashlib.sha256(b'transcode').hexdigest()[:12])
+
+    def test_truncated(self):
+        video = Video.objects.create(title="Test video", file=ContentFile(self.content, 'b' * 100 + '.mp4'))
+        self.assertEqual(len(video.file.name), 100)
+        self.assertTrue(video.file.name.endswith('.%s.mp4' % self.content_hash))
+
+    @override_settings(WAGTAILVIDEOS_CONTENT_ADDRESSED_NAMES=False)
+    def test_disabled(self):
+        video = Video.objects.create(title="Test video", file=create_test_video_file())
+        self.assertRegex(video.file.name, r'^original_videos/small(_\w+)?\.mp4$')
+        self.assertFalse(is_content_addressed(video.file.name))
+
+
+@override_settings(WAGTAILVIDEOS_SHARDED_PATHS=True)
+class TestShardedPaths(TestCase):
+    def test_original(self):
+        with patch.object(RemoteStorage, 'exists') as exists:
+            video = Video.objects.create(title="Test video", file=create_test_video_file())
+        self.assertFalse(exists.called)
+        self.assertRegex(
+            video.file.name, r'^original_videos/([0-9a-f]{2})/([0-9a-f]{2})/small\.\1\2[0-9a-f]{12}\.mp4$')
+        self.assertTrue(is_sharded_name(video.file.name))
+        self.assertFalse(is_content_addressed(video.file.name))
+        self.assertEqual(video.file.read(), create_test_video_file().read())
+
+    def test_unique(self):
+        first = Video.objects.create(title="Test video", file=create_test_video_file())
+        second = Video.objects.create(title="Test video", file=create_test_video_file())
+        self.assertNotEqual(first.file.name, second.file.name)
+
+    def test_thumbnail_and_transcode(self):
+        video = Video.objects.create(title="Test video", file=create_test_video_file())
+        video.thumbnail = ContentFile(b'thumbnail', 'small_thumb.jpg')
+        video.save()
+        transcode = video.transcodes.create(
+            media_format=MediaFormats.webm, file=ContentFile(b'transcode', 'small.webm'))
+        self.assertRegex(video.thumbnail.name, r'^original_videos/[0-9a-f]{2}/[0-9a-f]{2}/small_thumb\.')
+        self.assertRegex(transcode.file.name, r'^video_transcodes/[0-9a-f]{2}/[0-9a-f]{2}/small\.')
+        self.assertTrue(is_sharded_name(transcode.file.name))
+
+    @override_settings(WAGTAILVIDEOS_CONTENT_ADDRESSED_NAMES=True)
+    def test_content_addressed(self):
+        video = Video.objects.create(title="Test video", file=ContentFile(b'original', 'original.mp4'))
+        self.assertTrue(video.file.name.endswith(
+            '.%s.mp4' % hashlib.sha256(b'original').hexdigest()[:12]))
+        self.assertTrue(is_sharded_name(video.file.name))
+        self.assertTrue(is_content_addressed(video.file.name))
+
+    def test_truncated(self):
+        video = Video.objects.create(title="Test video", file=ContentFile(b'original', 'b' * 100 + '.mp4'))
+        self.assertEqual(len(video.file.name), 100)
+        self.assertTrue(is_sharded_name(video.file.name))
+
+    def test_other_storage(self):
+        storage = Mock(spec=['save', '_save'])
+        storage.save.return_value = 'original_videos/3f/a9/small.3fa9c01d22b87e61.mp4'
+        name = save_file(storage, storage.save.return_value, create_test_video_file())
+        self.assertEqual(name, storage.save.return_value)
+        self.assertFalse(storage._save.called)
+
+    def test_ready_transcodes_index_kept(self):
+        # Changing the file fields rebuilt the transcodes table on SQLite
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, 'wagtailvideos_videotranscode')
+        self.assertIn('wagtailvideos_ready_transcodes', indexes)
+
+    @override_settings(WAGTAILVIDEOS_SHARDED_PATHS=False)
+    def test_disabled(self):
+        video = Video.objects.create(title="Test video", file=create_test_video_file())
+        self.assertRegex(video.file.name, r'^original_videos/small(_\w+)?\.mp4$')
+        self.assertFalse(is_sharded_name(video.file.name))
+
+
+@override_settings(WAGTAILVIDEOS_CONTENT_ADDRESSED_NAMES=True)
+class TestGetCacheControl(TestCase):
+    def test_cache_control(self):
+        self.assertEqual(
+            get_cache_control('original_videos/small.0123456789ab.mp4'),
+            'public, max-age=31536000, immutable')
+        self.assertIsNone(get_cache_control('original_videos/small.mp4'))
+
+    @override_settings(WAGTAILVIDEOS_IMMUTABLE_CACHE_CONTROL='public, max-age=600')
+    def test_setting(self):
+        self.assertEqual(get_cache_control('original_videos/small.0123456789ab.mp4'), 'public, max-age=600')
+
+    @override_settings(WAGTAILVIDEOS_CONTENT_ADDRESSED_NAMES=False)
+    def test_disabled(self):
+        # Ordinary names can end in something that looks like a hash
+        self.assertIsNone(get_cache_control('original_videos/small.0123456789ab.mp4'))
@@ -1,10 +1,12 @@
 from __future__ import unicode_literals
 
+from django.core.cache import cache
 from django.template import Context, Template, TemplateSyntaxError
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from mock import patch
 
 from tests.utils import create_test_video_file
-from wagtailvideos.models import Video
+from wagtailvideos.models import MediaFormats, Video, VideoTranscode
 
 
 class TestVideoTag(TestCase):
@@ -28,8 +30,108 @@ class TestVideoTag(TestCase):
         self.assertTrue('controls' in tag)
         self.assertTrue('width="560"' in tag)
 
+    def test_lazy(self):
+        self.video.thumbnail = 'original_videos/small_thumb.jpg'
+        tag = self.render_video_tag(self.video, attrs='lazy controls width=560')
+        self.assertIn('data-wagtailvideos-lazy', tag)
+        self.assertIn("<template><video", tag)
+        self.assertIn("<img class='wagtailvideos-lazy-poster' src='/media/original_videos/small_thumb.jpg'", tag)
+        self.assertNotIn(' lazy', tag)
+
+    def test_lazy_value(self):
+        self.assertNotIn('data-wagtailvideos-lazy', self.render_video_tag(self.video, attrs='lazy=False'))
+        self.assertIn('data-wagtailvideos-lazy', self.render_video_tag(self.video, attrs='lazy=True'))
+
+        temp = Template('{% load wagtailvideos_tags %}{% video video_obj lazy=use_facade %}')
+        for use_facade in [True, False]:
+            tag = temp.render(Context({'video_obj': self.video, 'use_facade': use_facade}))
+            self.assertEqual('data-wagtailvideos-lazy' in tag, use_facade)
+
+    def test_preload(self):
+        self.assertIn('preload="auto"', self.video.video_tag({'preload': True}))
+        self.assertIn('preload="none"', self.video.video_tag({'preload': False}))
+        self.assertIn('preload="metadata"', self.video.video_tag({'preload': 'metadata'}))
+
     def test_bad_video(self):
         try:
             self.render_video_tag(None)
         except TemplateSyntaxError as e:
             self.assertEqual(str(e), 'video tag requires a Video object as the first parameter')
+
+
+class TestVideoTagQueries(TestCase):
+    def setUp(self):
+        for i in range(3):
+            video = Video.objects.create(
+                title="Test Video %d" % i,
+                file=create_test_video_file()
+            )
+            video.transcodes.create(media_format=MediaFormats.webm, file='video_transcodes/small.webm')
+            video.transcodes.create(media_format=MediaFormats.ogg, processing=True)
+
+    def render_video_tags(self, videos):
+        temp = Template('{% load wagtailvideos_tags %}{% for v in videos %}{% video v %}{% endfor %}')
+        return temp.render(Context({'videos': videos}))
+
+    def test_sources_snapshot(self):
+        with self.assertNumQueries(1):
+            html = self.render_video_tags(Video.objects.all())
+        self.assertEqual(html.count("type='video/webm; codecs=&quot;vp8, vorbis&quot;'"), 3)
+        self.assertNotIn("video/ogg", html)
+
+    def test_sources_snapshot_updated_on_delete(self):
+        VideoTranscode.objects.filter(media_format=MediaFormats.webm).delete()
+        html = self.render_video_tags(Video.objects.all())
+        self.assertNotIn("video/webm", html)
+
+    def test_with_sources(self):
+        Video.objects.update(sources=None)
+        with self.assertNumQueries(5):
+            html = self.render_video_tags(Video.objects.with_sources())
+        self.assertEqual(html.count("video/webm"), 3)
+        self.assertNotIn("video/ogg", html)
+
+        # The missing snapshots were filled in
+        with self.assertNumQueries(1):
+            self.render_video_tags(Video.objects.all())
+
+    def test_prefetch_related(self):
+        Video.objects.update(sources=None)
+        with self.assertNumQueries(5):
+            html = self.render_video_tags(Video.objects.prefetch_related('transcodes'))
+        self.assertEqual(html.count("video/webm"), 3)
+        self.assertNotIn("video/ogg", html)
+
+
+@override_settings(WAGTAILVIDEOS_VIDEO_TAG_CACHE='default')
+class TestVideoTagCache(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.video = Video.objects.create(
+            title="Test Video",
+            file=create_test_video_file()
+        )
+
+    def test_cached(self):
+        first = self.video.video_tag({'controls': ''})
+        with patch.object(Video, 'render_video_tag', return_value='<video></video>') as render_video_tag:
+            second = self.video.video_tag({'controls': ''})
+            self.assertEqual(first, second)
+            self.assertFalse(render_video_tag.called)
+
+            # Different attributes are cached separately
+            self.video.video_tag({'autoplay': ''})
+            self.assertTrue(render_video_tag.called)
+
+    def test_invalidated_by_transcode(self):
+        self.video.video_tag()
+        self.video.transcodes.create(media_format=MediaFormats.webm, file='video_transcodes/small.webm')
+        video = Video.objects.get(pk=self.video.pk)
+        self.assertIn('small.webm', video.video_tag())
+
+    def test_invalidated_by_thumbnail(self):
+        self.video.video_tag()
+        self.video.thumbnail = 'original_videos/small_thumb.jpg'
+        self.video.save()
+        video = Video.objects.get(pk=self.video.pk)
+        self.assertIn('small_thumb.jpg', video.video_tag())
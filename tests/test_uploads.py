@@ -0,0 +1,136 @@
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from wagtail.tests.utils import WagtailTestUtils
+
+from tests.utils import create_test_video_file
+from wagtailvideos.models import Video
+from wagtailvideos.uploads import (
+    SNIFF_LENGTH, VideoUploadHandler, sniff_video_type)
+
+
+class TestSniffVideoType(TestCase):
+    def test_containers(self):
+        self.assertEqual(sniff_video_type(b'\x00\x00\x00\x18ftypisom'), 'video/mp4')
+        self.assertEqual(sniff_video_type(b'\x00\x00\x00\x14ftypqt  '), 'video/quicktime')
+        self.assertEqual(sniff_video_type(b'\x00\x00\x00\x14ftyp3gp5'), 'video/3gpp')
+        self.assertEqual(sniff_video_type(b'\x00\x00\x00\x08wide'), 'video/quicktime')
+        self.assertEqual(sniff_video_type(b'\x1a\x45\xdf\xa3\x9f\x42\x82\x84webm'), 'video/webm')
+        self.assertEqual(sniff_video_type(b'\x1a\x45\xdf\xa3\xa3\x42\x82\x88matroska'), 'video/x-matroska')
+        self.assertEqual(sniff_video_type(b'OggS\x00\x02'), 'video/ogg')
+        self.assertEqual(sniff_video_type(b'RIFF\x00\x00\x00\x00AVI LIST'), 'video/x-msvideo')
+        self.assertEqual(sniff_video_type(b'FLV\x01'), 'video/x-flv')
+        self.assertEqual(sniff_video_type(b'\x00\x00\x01\xba\x44'), 'video/mpeg')
+        self.assertEqual(sniff_video_type((b'G' + b'\x00' * 187) * 2), 'video/mp2t')
+
+    def test_test_video(self):
+        self.assertEqual(sniff_video_type(create_test_video_file().read(SNIFF_LENGTH)), 'video/mp4')
+
+    def test_not_a_video(self):
+        self.assertIsNone(sniff_video_type(b''))
+        self.assertIsNone(sniff_video_type(b'Not a video'))
+        self.assertIsNone(sniff_video_type(b'RIFF\x00\x00\x00\x00WAVEfmt '))
+        self.assertIsNone(sniff_video_type(b'\x89PNG\r\n\x1a\n'))
+
+
+class TestVideoUploadHandler(TestCase):
+    def upload(self, content, field_name='file', chunk_size=1024, **extra):
+        handler = VideoUploadHandler(RequestFactory().post('/', **extra))
+        handler.new_file(field_name, 'small.mp4', 'video/mp4', len(content))
+        for start in range(0, len(content), chunk_size):
+            handler.receive_data_chunk(content[start:start + chunk_size], start)
+        return handler.file_complete(len(content))
+
+    def test_video(self):
+        content = create_test_video_file().read()
+        f = self.upload(content)
+
+        self.assertEqual(f.video_type, 'video/mp4')
+        self.assertEqual(f.size, len(content))
+        self.assertEqual(f.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual(f.read(), content)
+
+    def test_short_video(self):
+        f = self.upload(b'\x00\x00\x00\x18ftypisom')
+        self.assertEqual(f.video_type, 'video/mp4')
+
+    def test_not_a_video(self):
+        content = b'Not a video' * 1000
+        f = self.upload(content)
+
+        self.assertIsNone(f.video_type)
+        self.assertEqual(f.size, len(content))
+        self.assertFalse(hasattr(f, 'sha256'))
+
+        # Nothing after the point it was identified was stored
+        self.assertEqual(f.read(), b'')
+
+    @override_settings(WAGTAILVIDEOS_MAX_UPLOAD_SIZE=2048)
+    def test_too_large(self):
+        content = create_test_video_file().read()
+        f = self.upload(content)
+
+        self.assertEqual(f.size, len(content))
+        self.assertFalse(hasattr(f, 'sha256'))
+        self.assertEqual(f.read(), b'')
+
+    def test_other_fields(self):
+        f = self.upload(b'Not a video', field_name='thumbnail')
+
+        self.assertFalse(hasattr(f, 'video_type'))
+        self.assertEqual(f.read(), b'Not a video')
+
+    def test_first_chunk(self):
+        content = create_test_video_file().read()[:4096]
+        f = self.upload(content, HTTP_CONTENT_RANGE='bytes 0-4095/100000')
+
+        self.assertEqual(f.video_type, 'video/mp4')
+        self.assertFalse(hasattr(f, 'sha256'))
+
+    @override_settings(WAGTAILVIDEOS_MAX_UPLOAD_SIZE=2048)
+    def test_later_chunk(self):
+        # Later chunks aren't identified, and the size of the whole file is
+        # checked by the view
+        f = self.upload(b'Not a video' * 1000, HTTP_CONTENT_RANGE='bytes 4096-14095/100000')
+
+        self.assertFalse(hasattr(f, 'video_type'))
+        self.assertEqual(f.read(), b'Not a video' * 1000)
+
+
+class TestVideoUploadViews(TestCase, WagtailTestUtils):
+    def setUp(self):
+        self.login()
+
+    def test_add_checks_content(self):
+        response = self.client.post(reverse('wagtailvideos:add'), {
+            'title': "Test video",
+            'file': SimpleUploadedFile('small.mp4', b'Not a video', "video/mp4"),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'file', "Not a valid video. Content type was video/mp4.")
+        self.assertFalse(Video.objects.exists())
+
+    def test_add_ignores_claimed_content_type(self):
+        content = create_test_video_file().read()
+        response = self.client.post(reverse('wagtailvideos:add'), {
+            'title': "Test video",
+            'file': SimpleUploadedFile('small.mp4', content, "application/octet-stream"),
+        })
+
+        self.assertRedirects(response, reverse('wagtailvideos:index'))
+        video = Video.objects.get()
+        self.assertEqual(video.file_hash, hashlib.sha256(content).hexdigest())
+        self.assertEqual(video.file_size, len(content))
+
+    def test_csrf_is_checked(self):
+        self.client.handler.enforce_csrf_checks = True
+        response = self.client.post(reverse('wagtailvideos:add'), {
+            'title': "Test video",
+            'file': SimpleUploadedFile('small.mp4', create_test_video_file().read(), "video/mp4"),
+        })
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,151 @@
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils.six import StringIO
+from mock import patch
+
+from tests.utils import create_test_video_file
+from wagtailvideos.ingest import WatchedFolder
+from wagtailvideos.models import Video
+
+
+class WatchTestMixin(object):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.content = create_test_video_file().read()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content=None, mode='wb'):
+        path = os.path.join(self.directory, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, mode) as f:
+            f.write(content if content is not None else self.content + name.encode('utf-8'))
+        return path
+
+
+class TestWatchedFolder(WatchTestMixin, TestCase):
+    def test_complete_once_settled(self):
+        path = self.write('one.mp4')
+        folder = WatchedFolder(self.directory, settle_time=10)
+
+        self.assertEqual(folder.scan(now=100), [])
+        self.assertEqual(folder.scan(now=105), [])
+        self.assertEqual(folder.scan(now=110), [path])
+
+        # Only returned once
+        self.assertEqual(folder.scan(now=120), [])
+
+    def test_growing_file(self):
+        path = self.write('one.mp4', b'\x00' * 10)
+        folder = WatchedFolder(self.directory, settle_time=10)
+
+        self.assertEqual(folder.scan(now=100), [])
+        self.write('one.mp4', b'\x00' * 10, mode='ab')
+        self.assertEqual(folder.scan(now=110), [])
+        self.assertEqual(folder.scan(now=115), [])
+        self.assertEqual(folder.scan(now=120), [path])
+
+    def test_ignored_until_changed(self):
+        path = self.write('one.mp4', b'\x00' * 10)
+        folder = WatchedFolder(self.directory, settle_time=0)
+        folder.scan(now=100)
+        self.assertEqual(folder.scan(now=100), [path])
+        folder.ignore(path)
+
+        self.assertEqual(folder.scan(now=200), [])
+        self.assertEqual(folder.scan(now=200), [])
+
+        self.write('one.mp4', b'\x00' * 10, mode='ab')
+        folder.scan(now=300)
+        self.assertEqual(folder.scan(now=300), [path])
+
+    def test_hidden_files(self):
+        self.write('.one.mp4.part')
+        self.write('.partial/two.mp4')
+        folder = WatchedFolder(self.directory, settle_time=0)
+        folder.scan(now=100)
+        self.assertEqual(folder.scan(now=100), [])
+
+
+class TestWatchCommand(WatchTestMixin, TestCase):
+    def run_watch(self, *args, **options):
+        stdout = StringIO()
+        stderr = StringIO()
+        options.setdefault('settle', 0)
+        options.setdefault('polling', True)
+        call_command(
+            'wagtailvideos_watch', self.directory, *args, once=True,
+            stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_moves_files(self):
+        path = self.write('nested/one.mp4')
+        self.write('notes.txt', b'Not a video')
+
+        stdout, stderr = self.run_watch(tags='dropbox')
+
+        self.assertIn("Imported {0}".format(path), stdout)
+        self.assertIn("Not a video", stderr)
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'notes.txt')))
+
+        video = Video.objects.get()
+        self.assertEqual(video.title, 'one')
+        self.assertEqual(list(video.tags.names()), ['dropbox'])
+        with video.file as f:
+            f.open('rb')
+            self.assertEqual(f.read(), self.content + b'nested/one.mp4')
+
+    def test_copy(self):
+        path = self.write('one.mp4')
+        self.run_watch(copy=True)
+
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(Video.objects.count(), 1)
+
+        # Running again doesn't import it twice
+        stdout, stderr = self.run_watch(copy=True)
+        self.assertIn("Already imported", stdout)
+        self.assertEqual(Video.objects.count(), 1)
+
+    @patch('wagtailvideos.management.commands.wagtailvideos_watch.transcode_video')
+    @patch('wagtailvideos.management.commands.wagtailvideos_watch.probe_file')
+    @patch('wagtailvideos.ffmpeg.installed', return_value=True)
+    def test_queues_transcodes(self, installed, probe_file, transcode_video):
+        path = self.write('one.mp4')
+        probe_file.return_value = {
+            'path': path, 'video_type': 'video/mp4', 'sha256': 'a' * 64,
+            'size': len(self.content), 'duration': 1.5, 'thumbnail': None,
+        }
+
+        self.run_watch('--transcode', 'mp4', 'webm')
+
+        video = Video.objects.get()
+        self.assertEqual(video.duration.total_seconds(), 1.5)
+        transcodes = list(video.transcodes.all())
+        self.assertEqual(
+            sorted(t.media_format.name for t in transcodes), ['mp4', 'webm'])
+        self.assertTrue(all(t.processing for t in transcodes))
+        self.assertEqual(
+            sorted(call[0][0].media_format.name for call in transcode_video.call_args_list),
+            ['mp4', 'webm'])
+
+    @patch('wagtailvideos.management.commands.wagtailvideos_watch.close_old_connections')
+    def test_closes_old_connections(self, close_old_connections):
+        self.write('one.mp4')
+        with patch('wagtailvideos.management.commands.wagtailvideos_watch.Command.wait',
+                   side_effect=[None, KeyboardInterrupt]):
+            call_command(
+                'wagtailvideos_watch', self.directory, settle=0, polling=True,
+                stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(close_old_connections.call_count, 2)
+        self.assertEqual(Video.objects.count(), 1)
@@ -1,5 +1,6 @@
 from django.apps import AppConfig
 from django.core.checks import Warning, register
+from django.db.models.signals import post_migrate
 
 from wagtailvideos import ffmpeg
 
@@ -24,3 +25,7 @@ class WagtailVideosApp(AppConfig):
 
     def ready(self):
         register(ffmpeg_check)
+
+        from wagtailvideos.references import build_references_after_upgrade, connect_signals
+        connect_signals()
+        post_migrate.connect(build_references_after_upgrade, sender=self)
@@ -0,0 +1,48 @@
+from django.forms import ModelChoiceField
+from django.utils.functional import cached_property
+from wagtail.core.blocks import ChooserBlock
+
+
+class VideoChoiceField(ModelChoiceField):
+    def prepare_value(self, value):
+        # Hand chosen videos to the widget as they are, rather than as an ID
+        # that the widget would have to look up again
+        if isinstance(value, self.queryset.model):
+            return value
+        return super(VideoChoiceField, self).prepare_value(value)
+
+
+class VideoChooserBlock(ChooserBlock):
+    @cached_property
+    def target_model(self):
+        from wagtailvideos.models import Video
+        return Video
+
+    @cached_property
+    def widget(self):
+        from wagtailvideos.widgets import AdminVideoChooser
+        return AdminVideoChooser
+
+    @cached_property
+    def field(self):
+        return VideoChoiceField(
+            queryset=self.target_model.objects.all(), widget=self.widget, required=self._required,
+            help_text=self._help_text)
+
+    def bulk_to_python(self, values):
+        """
+        Fetch the videos for all blocks of this type in a StreamField with a
+        single query. Missing videos become ``None``, like ``to_python``.
+        """
+        values = list(values)
+        videos = self.target_model.objects.in_bulk({pk for pk in values if pk is not None})
+        return [videos.get(pk) for pk in values]
+
+    def render_basic(self, value, context=None):
+        if value:
+            return value.video_tag({'controls': ''})
+        else:
+            return ''
+
+    class Meta:
+        icon = "media"
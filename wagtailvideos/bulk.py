@@ -0,0 +1,170 @@
+"""
+Actions on many videos at once, from the admin listing.
+
+Moving, tagging and deleting videos are done straight away, with a few
+queries however many videos are selected. The files of deleted videos are
+deleted in the background by ``wagtailvideos.deletion``. Requesting
+transcodes changes the database the same way, but leaves ffmpeg to run.
+That is recorded as a ``VideoBulkJob`` and done in the background, one
+transcode at a time, so the admin can follow its progress.
+"""
+import json
+import logging
+import threading
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from wagtailvideos.cache import clear_popular_tags
+from wagtailvideos.deletion import queue_file_deletions
+from wagtailvideos.indexing import index_ids_on_commit
+from wagtailvideos.models import (
+    Video, VideoBulkJob, VideoTranscode, collect_deleted_files,
+    transcode_video)
+
+logger = logging.getLogger('wagtailvideos')
+
+BATCH_SIZE = 500
+
+# Seconds between saving the progress of a job
+PROGRESS_INTERVAL = 1
+
+
+def get_ids(videos):
+    return list(videos.order_by().values_list('pk', flat=True))
+
+
+def batches(ids):
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def move_videos(videos, collection):
+    """Move ``videos`` into ``collection``. Returns how many were moved"""
+    video_ids = get_ids(videos)
+    with transaction.atomic():
+        for batch in batches(video_ids):
+            Video.objects.filter(pk__in=batch).update(collection=collection)
+        index_ids_on_commit(Video, video_ids)
+    return len(video_ids)
+
+
+def add_tags(videos, tag_names):
+    """Add the tags named ``tag_names`` to ``videos``. Returns how many videos there were"""
+    video_ids = get_ids(videos)
+    content_type = ContentType.objects.get_for_model(Video)
+    with transaction.atomic():
+        tags = [Tag.objects.get_or_create(name=name)[0] for name in tag_names]
+        tagged = TaggedItem.objects.filter(content_type=content_type, tag__in=tags)
+        for batch in batches(video_ids):
+            existing = set(tagged.filter(object_id__in=batch).values_list('object_id', 'tag_id'))
+            TaggedItem.objects.bulk_create([
+                TaggedItem(content_type=content_type, object_id=video_id, tag=tag)
+                for video_id in batch for tag in tags
+                if (video_id, tag.pk) not in existing])
+        index_ids_on_commit(Video, video_ids)
+    # Bulk creating tagged items doesn't send the signals that do this
+    clear_popular_tags(Video)
+    return len(video_ids)
+
+
+def delete_videos(videos):
+    """
+    Delete ``videos`` and their transcodes, queueing all of their files for
+    deletion together. Returns how many videos were deleted.
+    """
+    video_ids = get_ids(videos)
+    with transaction.atomic():
+        with collect_deleted_files() as files:
+            for batch in batches(video_ids):
+                Video.objects.filter(pk__in=batch).delete()
+        queue_file_deletions(files)
+    return len(video_ids)
+
+
+def request_transcodes(videos, media_format, quality, user=None):
+    """
+    Lock a transcode in ``media_format`` of each of ``videos``, to be
+    processed by a job. Transcodes already being processed are left alone.
+    Returns the job, or ``None`` if there was nothing to transcode.
+    """
+    video_ids = get_ids(videos)
+    transcode_ids = []
+    with transaction.atomic():
+        for batch in batches(video_ids):
+            transcodes = VideoTranscode.objects.filter(video_id__in=batch, media_format=media_format)
+            existing = dict(transcodes.values_list('video_id', 'processing'))
+            # Start again on transcodes that are done or failed
+            ready = transcodes.filter(processing=False)
+            ready_ids = list(ready.values_list('pk', flat=True))
+            ready.update(processing=True, error_message='', quality=quality)
+            # Updating doesn't send post_save, so take them out of the
+            # sources of their videos here
+            for video_id, processing in existing.items():
+                if not processing:
+                    Video(pk=video_id).update_sources()
+            VideoTranscode.objects.bulk_create([
+                VideoTranscode(video_id=video_id, media_format=media_format, quality=quality, processing=True)
+                for video_id in batch if video_id not in existing])
+            new = transcodes.exclude(video_id__in=list(existing))
+            transcode_ids.extend(ready_ids)
+            transcode_ids.extend(new.values_list('pk', flat=True))
+
+        if not transcode_ids:
+            return None
+        job = VideoBulkJob.objects.create(
+            action=VideoBulkJob.TRANSCODE, items=json.dumps(transcode_ids),
+            total=len(transcode_ids), created_by=user)
+        start_job(job)
+    return job
+
+
+def process_transcode(transcode_id):
+    transcode = VideoTranscode.objects.select_related('video').get(pk=transcode_id)
+    transcode_video(transcode)
+    return not transcode.error_message
+
+
+def run_job(job):
+    """Do the work of ``job``, saving its progress as it goes"""
+    done = failed = 0
+    last_saved = time.time()
+    for item in job.get_items():
+        try:
+            succeeded = process_transcode(item)
+        except Exception:
+            logger.exception("Could not %s %r in bulk job %d", job.action, item, job.pk)
+            succeeded = False
+
+        if succeeded:
+            done += 1
+        else:
+            failed += 1
+        if time.time() - last_saved >= PROGRESS_INTERVAL:
+            VideoBulkJob.objects.filter(pk=job.pk).update(done=F('done') + done, failed=F('failed') + failed)
+            done = failed = 0
+            last_saved = time.time()
+
+    VideoBulkJob.objects.filter(pk=job.pk).update(
+        done=F('done') + done, failed=F('failed') + failed, finished_at=timezone.now())
+
+
+class BulkJobThread(threading.Thread):
+    def __init__(self, job_id, **kwargs):
+        super(BulkJobThread, self).__init__(**kwargs)
+        self.job_id = job_id
+
+    def run(self):
+        try:
+            run_job(VideoBulkJob.objects.get(pk=self.job_id))
+        finally:
+            connection.close()
+
+
+def start_job(job):
+    """Run ``job`` in the background, once the transaction creating it commits"""
+    transaction.on_commit(lambda: BulkJobThread(job.pk).start())
@@ -0,0 +1,74 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+def get_video_tag_cache():
+    """
+    The cache used for rendered ``video_tag`` fragments, or ``None`` if
+    fragment caching is disabled. Enable it by setting
+    ``WAGTAILVIDEOS_VIDEO_TAG_CACHE`` to the alias of a configured cache.
+    """
+    alias = getattr(settings, 'WAGTAILVIDEOS_VIDEO_TAG_CACHE', None)
+    if alias is None:
+        return None
+    return caches[alias]
+
+
+def get_video_tag_cache_timeout():
+    return getattr(settings, 'WAGTAILVIDEOS_VIDEO_TAG_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def get_video_tag_cache_key(video, attrs, lazy=False):
+    # Everything the rendered fragment depends on is part of the key, so a
+    # changed file, thumbnail or set of transcodes never hits a stale entry
+    version = json.dumps([
+        video.file.name,
+        video.thumbnail.name if video.thumbnail else None,
+        video.sources,
+        sorted(attrs.items()),
+        lazy,
+    ], default=str)
+    digest = hashlib.md5(version.encode('utf-8')).hexdigest()
+    return 'wagtailvideos:video_tag:{0}:{1}'.format(video.pk, digest)
+
+
+# Tag changes clear the entry, so this only bounds how long a change made
+# without signals (such as a raw SQL update) can go unnoticed
+POPULAR_TAGS_TIMEOUT = 60 * 60
+
+
+def get_admin_cache():
+    """
+    The cache for data shown on the admin listing pages, named by
+    ``WAGTAILVIDEOS_ADMIN_CACHE`` (``'default'`` by default).
+    """
+    return caches[getattr(settings, 'WAGTAILVIDEOS_ADMIN_CACHE', 'default')]
+
+
+def get_popular_tags_cache_key(model):
+    return 'wagtailvideos:popular_tags:{0}'.format(model._meta.label_lower)
+
+
+def get_popular_tags(model):
+    """
+    The most used tags on ``model``, as a list. Counting tags means
+    aggregating the whole tagged items table, so the result is cached until
+    the tags change.
+    """
+    from wagtail.admin.utils import popular_tags_for_model
+
+    cache = get_admin_cache()
+    key = get_popular_tags_cache_key(model)
+    tags = cache.get(key)
+    if tags is None:
+        tags = list(popular_tags_for_model(model))
+        cache.set(key, tags, POPULAR_TAGS_TIMEOUT)
+    return tags
+
+
+def clear_popular_tags(model):
+    get_admin_cache().delete(get_popular_tags_cache_key(model))
@@ -0,0 +1,169 @@
+"""
+Finding files that nothing uses any more, so they can be reclaimed.
+
+Files are left behind in storage when a transcode crashes part way through,
+or by deletions from before deleted files were queued. Temporary files and
+directories named ``wagtailvideo-*`` are left behind when transcoding or
+probing is killed, and ``wagtailvideo-upload-*`` files by uploads that are
+never finished. The local cache of originals is left to its own eviction.
+
+Storage is listed a directory at a time (or a page at a time from S3), and
+checked against the database a batch of names at a time, so neither the
+listing nor the database is ever held in memory in full.
+"""
+import datetime
+import itertools
+import os
+import posixpath
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from wagtailvideos import local_cache
+from wagtailvideos.ffmpeg import TEMP_PREFIX
+from wagtailvideos.models import Video, VideoFileDeletion, VideoTranscode
+from wagtailvideos.uploads import get_chunked_upload_dir
+
+BATCH_SIZE = 500
+
+# Files this recent may belong to a video that is still being saved
+DEFAULT_MIN_AGE = datetime.timedelta(hours=24)
+
+# The folders that files are uploaded to, and the fields of the models
+# whose files are stored there
+UPLOAD_FOLDERS = [
+    ('original_videos', Video, ['file', 'thumbnail']),
+    ('video_transcodes', VideoTranscode, ['file']),
+]
+
+# A file in storage that nothing uses. ``model`` and ``field`` are where it
+# was stored from, for queueing it for deletion
+Orphan = namedtuple('Orphan', ['model', 'field', 'name'])
+
+
+def walk_storage(storage, path):
+    """The name of every file under ``path`` in ``storage``"""
+    bucket = getattr(storage, 'bucket', None)
+    if hasattr(bucket, 'objects') and hasattr(storage, '_normalize_name'):
+        # Listing S3 a directory at a time takes a request per directory,
+        # and listdir() collects the whole listing first
+        path = path.rstrip('/') + '/'
+        prefix = storage._normalize_name(path)
+        location = prefix[:len(prefix) - len(path)]
+        for obj in bucket.objects.filter(Prefix=prefix):
+            yield obj.key[len(location):]
+        return
+
+    try:
+        directories, files = storage.listdir(path)
+    except (IOError, OSError):
+        # Nothing has been uploaded there yet
+        return
+    for name in sorted(files):
+        yield posixpath.join(path, name)
+    for directory in sorted(directories):
+        for name in walk_storage(storage, posixpath.join(path, directory)):
+            yield name
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def is_older_than(storage, name, cutoff):
+    try:
+        return storage.get_modified_time(name) < cutoff
+    except (NotImplementedError, IOError, OSError):
+        # Can't tell, so it may be new
+        return False
+
+
+def find_orphans(min_age=DEFAULT_MIN_AGE):
+    """
+    Every file in the upload folders that no video or transcode uses, and
+    that is older than ``min_age``, as ``Orphan``\\s.
+    """
+    cutoff = timezone.now() - min_age
+    for folder, model, fields in UPLOAD_FOLDERS:
+        storage = model._meta.get_field(fields[0]).storage
+        for batch in batched(walk_storage(storage, folder)):
+            used = set(VideoFileDeletion.objects.filter(name__in=batch).values_list('name', flat=True))
+            for field in fields:
+                used.update(model._base_manager.filter(
+                    **{field + '__in': batch}).values_list(field, flat=True))
+            for name in batch:
+                if name in used:
+                    continue
+                if min_age and not is_older_than(storage, name, cutoff):
+                    continue
+                yield Orphan(model, fields[0], name)
+
+
+def get_orphan_size(orphan):
+    try:
+        return orphan.model._meta.get_field(orphan.field).storage.size(orphan.name)
+    except (NotImplementedError, IOError, OSError):
+        return 0
+
+
+def get_temp_dirs():
+    dirs = [tempfile.gettempdir(), get_chunked_upload_dir(), settings.FILE_UPLOAD_TEMP_DIR]
+    seen = set()
+    for directory in dirs:
+        if directory and os.path.isdir(directory) and os.path.realpath(directory) not in seen:
+            seen.add(os.path.realpath(directory))
+            yield directory
+
+
+def find_temp_files(min_age=DEFAULT_MIN_AGE):
+    """
+    The paths of the ``wagtailvideo-*`` temporary files and directories not
+    changed for ``min_age``.
+    """
+    cutoff = time.time() - min_age.total_seconds()
+    cache_dir = os.path.realpath(local_cache.get_cache_dir())
+    for directory in get_temp_dirs():
+        for entry in os.listdir(directory):
+            if not entry.startswith(TEMP_PREFIX):
+                continue
+            path = os.path.join(directory, entry)
+            if os.path.realpath(path) == cache_dir:
+                continue
+            try:
+                if not min_age or os.path.getmtime(path) < cutoff:
+                    yield path
+            except OSError:
+                # Removed in the meantime
+                pass
+
+
+def get_temp_file_size(path):
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        size = 0
+        for root, directories, files in os.walk(path):
+            for name in files:
+                size += os.path.getsize(os.path.join(root, name))
+        return size
+    except OSError:
+        return 0
+
+
+def remove_temp_file(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,237 @@
+"""
+Deleting the files of deleted videos and transcodes in the background.
+
+Deleting a video used to delete its file, thumbnail and every transcode
+from storage one after the other while the request waited, a round trip
+each on remote storage. Instead, the files are recorded as
+``VideoFileDeletion``\\s in the same transaction as the deletion, so they
+are only deleted if it commits and are never forgotten if it does. Once
+it commits, a worker thread deletes them in batches, with one call for a
+whole batch where the storage supports it. Files that can't be deleted
+are tried again later, waiting longer after each failure. Files whose name
+has been taken by another video or transcode meanwhile are left alone.
+
+``./manage.py wagtailvideos_delete_files`` does the same work, for sites
+that run it from cron rather than in a thread of the web server, which is
+set by ``WAGTAILVIDEOS_DELETE_FILES_IN_BACKGROUND``. Running it regularly
+also picks up files that are due to be tried again.
+"""
+import datetime
+import logging
+import threading
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from wagtailvideos.models import Video, VideoFileDeletion, VideoTranscode
+
+logger = logging.getLogger('wagtailvideos')
+
+BATCH_SIZE = 100
+
+# S3 deletes at most this many objects in one request
+S3_MAX_KEYS = 1000
+
+# How long a worker has to delete the files it has claimed, before they
+# can be claimed again by another worker
+CLAIM_TIMEOUT = datetime.timedelta(minutes=10)
+
+RETRY_DELAY = datetime.timedelta(minutes=1)
+MAX_RETRY_DELAY = datetime.timedelta(days=1)
+
+_worker = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def delete_files_in_background():
+    return getattr(settings, 'WAGTAILVIDEOS_DELETE_FILES_IN_BACKGROUND', True)
+
+
+def queue_file_deletions(files):
+    """
+    Delete ``files``, as ``(model label, field name, file name)``, from
+    storage once the transaction commits.
+    """
+    if not files:
+        return
+    VideoFileDeletion.objects.bulk_create([
+        VideoFileDeletion(model=model_label, field=field_name, name=name)
+        for model_label, field_name, name in files
+    ], batch_size=BATCH_SIZE)
+    if delete_files_in_background():
+        transaction.on_commit(start_worker)
+
+
+def get_storage(model_label, field_name):
+    return apps.get_model(model_label)._meta.get_field(field_name).storage
+
+
+def delete_from_s3(storage, names):
+    errors = {}
+    for start in range(0, len(names), S3_MAX_KEYS):
+        keys = OrderedDict(
+            (storage._normalize_name(name), name) for name in names[start:start + S3_MAX_KEYS])
+        response = storage.bucket.delete_objects(Delete={
+            'Objects': [{'Key': key} for key in keys],
+            'Quiet': True,
+        })
+        for error in response.get('Errors', []):
+            errors[keys.get(error['Key'], error['Key'])] = error.get('Message', error.get('Code'))
+    return errors
+
+
+def delete_from_storage(storage, names):
+    """
+    Delete the files named ``names`` from ``storage``, with as few calls as
+    the storage allows. Returns a dict of the names of the files that
+    couldn't be deleted, to why not.
+
+    Storages can delete many files at once by defining
+    ``delete_many(names)``, which returns the same. Storages from
+    django-storages using boto3 for S3 are deleted from in bulk already.
+    """
+    delete_many = getattr(storage, 'delete_many', None)
+    if delete_many is not None:
+        return delete_many(names) or {}
+
+    bucket = getattr(storage, 'bucket', None)
+    if hasattr(bucket, 'delete_objects') and hasattr(storage, '_normalize_name'):
+        return delete_from_s3(storage, names)
+
+    errors = {}
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception as e:
+            errors[name] = e
+    return errors
+
+
+def claim_deletions():
+    """
+    Claim a batch of the deletions that are due, so that other workers
+    leave them alone while they are worked on.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        due = VideoFileDeletion.objects.filter(next_attempt_at__lte=now).order_by('next_attempt_at', 'pk')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        deletions = list(due[:BATCH_SIZE])
+        VideoFileDeletion.objects.filter(pk__in=[deletion.pk for deletion in deletions]).update(
+            next_attempt_at=now + CLAIM_TIMEOUT)
+    return deletions
+
+
+def get_retry_delay(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def get_names_in_use(names):
+    """
+    Which of ``names`` are the file, thumbnail or transcode of a video,
+    looked up with one query. Storage can give a name out again once its
+    file is gone, or a file can be saved again under the same name before
+    the old one is deleted.
+    """
+    videos = Video._base_manager.filter(
+        Q(file__in=names) | Q(thumbnail__in=names)).order_by().values_list('file', 'thumbnail')
+    transcodes = VideoTranscode._base_manager.filter(
+        file__in=names).order_by().values_list('file', 'file')
+    in_use = set()
+    for file_name, thumbnail_name in videos.union(transcodes, all=True):
+        in_use.update([file_name, thumbnail_name])
+    return in_use.intersection(names)
+
+
+def delete_batch(deletions):
+    """
+    Delete the files of ``deletions`` from storage, then forget those that
+    were deleted and put off those that weren't. Returns how many of each
+    there were. Files still in use are forgotten without being deleted.
+    """
+    in_use = get_names_in_use(set(deletion.name for deletion in deletions))
+    if in_use:
+        VideoFileDeletion.objects.filter(pk__in=[
+            deletion.pk for deletion in deletions if deletion.name in in_use]).delete()
+        for name in sorted(in_use):
+            logger.info("Not deleting %s, as it is in use again", name)
+
+    by_storage = OrderedDict()
+    for deletion in deletions:
+        if deletion.name not in in_use:
+            by_storage.setdefault((deletion.model, deletion.field), []).append(deletion)
+
+    deleted = []
+    failed = []
+    for (model_label, field_name), batch in by_storage.items():
+        names = [deletion.name for deletion in batch]
+        try:
+            errors = delete_from_storage(get_storage(model_label, field_name), names)
+        except Exception as e:
+            errors = dict((name, e) for name in names)
+        for deletion in batch:
+            if deletion.name in errors:
+                deletion.last_error = str(errors[deletion.name])
+                failed.append(deletion)
+            else:
+                deleted.append(deletion.pk)
+
+    VideoFileDeletion.objects.filter(pk__in=deleted).delete()
+    now = timezone.now()
+    for deletion in failed:
+        logger.warning("Could not delete %s: %s", deletion.name, deletion.last_error)
+        deletion.attempts += 1
+        deletion.next_attempt_at = now + get_retry_delay(deletion.attempts)
+        deletion.save(update_fields=['attempts', 'last_error', 'next_attempt_at'])
+    return len(deleted), len(failed)
+
+
+def delete_files():
+    """
+    Delete every file that is due to be deleted, a batch at a time. Returns
+    how many files were deleted, and how many are to be tried again later.
+    """
+    deleted = failed = 0
+    while True:
+        deletions = claim_deletions()
+        if not deletions:
+            return deleted, failed
+        batch_deleted, batch_failed = delete_batch(deletions)
+        deleted += batch_deleted
+        failed += batch_failed
+
+
+class DeletionThread(threading.Thread):
+    def run(self):
+        global _worker
+        try:
+            while True:
+                try:
+                    delete_files()
+                except Exception:
+                    logger.exception("Error while deleting video files")
+                with _worker_lock:
+                    # Go round again if more files were queued meanwhile
+                    if not _wake.is_set():
+                        _worker = None
+                        return
+                    _wake.clear()
+        finally:
+            connection.close()
+
+
+def start_worker():
+    """Start deleting files in a thread, unless one is already doing so"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = DeletionThread()
+            _worker.start()
+        else:
+            _wake.set()
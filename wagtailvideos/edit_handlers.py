@@ -1,8 +1,37 @@
 from wagtail.admin.edit_handlers import BaseChooserPanel
 
+from .models import AbstractVideo
 from .widgets import AdminVideoChooser
 
 
+def is_unfetched_video(instance, field):
+    if not (field.is_relation and field.many_to_one):
+        return False
+    if not issubclass(field.related_model, AbstractVideo):
+        return False
+    return getattr(instance, field.attname) is not None and not field.is_cached(instance)
+
+
+def prefetch_chosen_videos(instance):
+    """
+    Fetch the videos for every video foreign key on ``instance`` in a single
+    query, and cache them on the instance as if they had been accessed.
+    """
+    fields = [
+        field for field in instance._meta.concrete_fields
+        if is_unfetched_video(instance, field)
+    ]
+    if not fields:
+        return
+
+    video_model = fields[0].related_model
+    videos = video_model.objects.in_bulk({getattr(instance, field.attname) for field in fields})
+    for field in fields:
+        video = videos.get(getattr(instance, field.attname))
+        if video is not None:
+            field.set_cached_value(instance, video)
+
+
 class VideoChooserPanel(BaseChooserPanel):
     model = None
     field_name = None
@@ -12,3 +41,12 @@ class VideoChooserPanel(BaseChooserPanel):
 
     def widget_overrides(self):
         return {self.field_name: AdminVideoChooser}
+
+    def get_chosen_item(self):
+        prefetch_chosen_videos(self.instance)
+        video = super(VideoChooserPanel, self).get_chosen_item()
+        # Let the widget render the video without fetching it again
+        widget = self.bound_field.field.widget
+        if video is not None and isinstance(widget, AdminVideoChooser):
+            widget.add_known_videos([video])
+        return video
@@ -1,4 +1,5 @@
 import datetime
+import json
 import logging
 import os
 import re
@@ -10,6 +11,10 @@ from django.core.files.base import ContentFile
 
 logger = logging.getLogger(__name__)
 
+# Temporary files and directories made by wagtailvideos start with this, so
+# that ``wagtailvideos_clean_up`` can recognise those left behind
+TEMP_PREFIX = 'wagtailvideo-'
+
 try:
     from shutil import which
 except ImportError:
@@ -41,6 +46,33 @@ def get_duration(file_path):
         return None
 
 
+def get_video_info(file_path):
+    """
+    Get the dimensions of the first video stream and the overall bitrate of
+    a video file. Values that could not be determined are ``None``.
+    """
+    if not installed():
+        raise RuntimeError('ffmpeg is not installed')
+
+    try:
+        probe = subprocess.check_output(
+            ['ffprobe', file_path, '-show_streams', '-show_format',
+             '-select_streams', 'v:0', '-of', 'json', '-v', 'quiet'],
+            stdin=DEVNULL(), stderr=DEVNULL())
+        probe = json.loads(probe.decode("utf-8"))
+    except (subprocess.CalledProcessError, ValueError):
+        logger.exception("Getting video info failed")
+        return {'width': None, 'height': None, 'bitrate': None}
+
+    streams = probe.get('streams') or [{}]
+    bit_rate = probe.get('format', {}).get('bit_rate')
+    return {
+        'width': streams[0].get('width'),
+        'height': streams[0].get('height'),
+        'bitrate': int(bit_rate) if bit_rate else None,
+    }
+
+
 def get_thumbnail(file_path):
     if not installed():
         raise RuntimeError('ffmpeg is not installed')
@@ -49,7 +81,7 @@ def get_thumbnail(file_path):
     thumb_name = '{}_thumb{}'.format(os.path.splitext(file_name)[0], '.jpg')
 
     try:
-        output_dir = tempfile.mkdtemp()
+        output_dir = tempfile.mkdtemp(prefix=TEMP_PREFIX)
         output_file = os.path.join(output_dir, thumb_name)
         try:
             subprocess.check_call([
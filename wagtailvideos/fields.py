@@ -5,12 +5,16 @@ from django.template.defaultfilters import filesizeformat
 from django.utils.translation import ugettext_lazy as _
 
 
+def get_max_upload_size():
+    return getattr(settings, 'WAGTAILVIDEOS_MAX_UPLOAD_SIZE', 1024 * 1024 * 1024)
+
+
 class WagtailVideoField(FileField):
     def __init__(self, *args, **kwargs):
         super(WagtailVideoField, self).__init__(*args, **kwargs)
 
         # Get max upload size from settings
-        self.max_upload_size = getattr(settings, 'WAGTAILVIDEOS_MAX_UPLOAD_SIZE', 1024 * 1024 * 1024)
+        self.max_upload_size = get_max_upload_size()
         max_upload_size_text = filesizeformat(self.max_upload_size)
 
         # Help text
@@ -35,7 +39,12 @@ class WagtailVideoField(FileField):
         ) % max_upload_size_text
 
     def check_video_file_format(self, f):
-        if not f.content_type.startswith('video'):
+        if hasattr(f, 'video_type'):
+            # Uploads received by VideoUploadHandler have been identified from
+            # their content, rather than the type claimed by the browser
+            if f.video_type is None:
+                raise ValidationError(self.error_messages['invalid_video_format'] % f.content_type)
+        elif not f.content_type.startswith('video'):
             raise ValidationError(self.error_messages['invalid_video_format'] % f.content_type)
 
     def check_video_file_size(self, f):
@@ -2,9 +2,12 @@ from django import forms
 from django.forms.models import modelform_factory
 from django.utils.translation import ugettext as _
 from enumchoicefield.forms import EnumField
+from taggit.forms import TagField
 from wagtail.admin import widgets
 from wagtail.admin.forms.collections import BaseCollectionMemberForm, collection_member_permission_formset_factory
+from wagtail.core.models import Collection
 
+from wagtailvideos import ffmpeg
 from wagtailvideos.fields import WagtailVideoField
 from wagtailvideos.models import MediaFormats, Video, VideoQuality
 from wagtailvideos.permissions import \
@@ -72,6 +75,69 @@ class VideoTranscodeAdminForm(forms.Form):
         self.video.do_transcode(media_format, quality)
 
 
+class VideoBulkActionForm(forms.Form):
+    DELETE = 'delete'
+    MOVE = 'move'
+    ADD_TAGS = 'add_tags'
+    TRANSCODE = 'transcode'
+
+    action = forms.ChoiceField(label=_("Action"), choices=[
+        (DELETE, _("Delete")),
+        (MOVE, _("Move to collection")),
+        (ADD_TAGS, _("Add tags")),
+        (TRANSCODE, _("Request transcodes")),
+    ])
+    videos = forms.ModelMultipleChoiceField(
+        queryset=Video.objects.none(), widget=forms.MultipleHiddenInput,
+        error_messages={'required': _("Select some videos first.")})
+    collection = forms.ModelChoiceField(
+        label=_("Collection"), queryset=Collection.objects.none(), required=False)
+    tags = TagField(label=_("Tags"), required=False)
+    media_format = EnumField(MediaFormats, label=_("Format"), required=False)
+    quality = EnumField(VideoQuality, label=_("Quality"), required=False, initial=VideoQuality.default)
+
+    # The permission needed on every selected video for each action
+    action_permissions = {
+        DELETE: 'delete',
+        MOVE: 'change',
+        ADD_TAGS: 'change',
+        TRANSCODE: 'change',
+    }
+
+    def __init__(self, user, *args, **kwargs):
+        super(VideoBulkActionForm, self).__init__(*args, **kwargs)
+        self.user = user
+        self.fields['videos'].queryset = video_permission_policy.instances_user_has_any_permission_for(
+            user, ['change', 'delete']).only('pk')
+        self.fields['collection'].queryset = video_permission_policy.collections_user_has_permission_for(
+            user, 'add')
+        if not ffmpeg.installed():
+            self.fields['action'].choices = [
+                choice for choice in self.fields['action'].choices if choice[0] != self.TRANSCODE]
+
+    def clean(self):
+        cleaned_data = super(VideoBulkActionForm, self).clean()
+        action = cleaned_data.get('action')
+        videos = cleaned_data.get('videos')
+        if not action or videos is None:
+            return cleaned_data
+
+        required = {
+            self.MOVE: ['collection'],
+            self.ADD_TAGS: ['tags'],
+            self.TRANSCODE: ['media_format', 'quality'],
+        }.get(action, [])
+        for name in required:
+            if not cleaned_data.get(name):
+                self.add_error(name, forms.Field.default_error_messages['required'])
+
+        permitted = video_permission_policy.instances_user_has_permission_for(
+            self.user, self.action_permissions[action]).filter(pk__in=videos.values('pk'))
+        if permitted.count() != videos.count():
+            self.add_error('videos', _("You don't have permission to do this to all of the selected videos."))
+        return cleaned_data
+
+
 GroupVideoPermissionFormSet = collection_member_permission_formset_factory(
     Video,
     [
@@ -0,0 +1,111 @@
+"""
+Search indexing for videos, coalesced and deferred to transaction commit.
+
+Saving a video can save it several times over, such as when the metadata is
+filled in, and views used to index it again once the tags were saved.
+Rather than index on each save, saved videos are noted and indexed together
+once the transaction commits, freshly fetched so their tags are current.
+Within ``batch_indexing()``, they are held until the block ends, so a view
+or an import indexes everything it saved in one go.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.db.transaction import on_commit
+from wagtail.search.backends import get_search_backends_with_name
+
+logger = logging.getLogger('wagtailvideos')
+
+# Batches hold at most this many videos before they are indexed, so a long
+# import keeps the index up to date as it goes
+BATCH_SIZE = 100
+
+_state = threading.local()
+
+
+def get_state():
+    if not hasattr(_state, 'pending'):
+        # Video IDs to index, by video model
+        _state.pending = {}
+        _state.saving = 0
+        _state.batching = 0
+    return _state
+
+
+@contextmanager
+def saving_video():
+    """
+    Mark a video save as in progress. Wagtail's own search signal handler
+    skips videos during a save, as they are indexed on commit instead.
+    Saves made while filling in the metadata of a video happen inside its
+    own save, so only the outermost save indexes it.
+    """
+    state = get_state()
+    state.saving += 1
+    try:
+        yield
+    finally:
+        state.saving -= 1
+
+
+def is_saving_video():
+    return get_state().saving > 0
+
+
+@contextmanager
+def batch_indexing():
+    """Index the videos saved inside the block together, when it ends"""
+    state = get_state()
+    state.batching += 1
+    try:
+        yield
+    finally:
+        state.batching -= 1
+        if not state.batching and state.pending:
+            on_commit(flush_pending)
+
+
+def index_on_commit(video):
+    """Add ``video`` to the search index once the transaction commits"""
+    index_ids_on_commit(type(video), [video.pk])
+
+
+def index_ids_on_commit(model, video_ids):
+    """
+    Add the videos with these IDs to the search index once the transaction
+    commits, such as after changing them with ``QuerySet.update()``
+    """
+    state = get_state()
+    pending = state.pending.setdefault(model, set())
+    pending.update(video_ids)
+    if not state.batching or len(pending) >= BATCH_SIZE:
+        on_commit(flush_pending)
+
+
+def flush_pending():
+    """
+    Index every video waiting to be indexed. Videos from a transaction that
+    was rolled back wait until the next flush, when they will be skipped if
+    they no longer exist.
+    """
+    state = get_state()
+    pending, state.pending = state.pending, {}
+    for model, video_ids in pending.items():
+        index_videos(model, video_ids)
+
+
+def index_videos(model, video_ids):
+    """Add the videos with these IDs to each search backend, in bulk"""
+    video_ids = list(video_ids)
+    for start in range(0, len(video_ids), BATCH_SIZE):
+        videos = list(model.get_indexed_objects().filter(
+            pk__in=video_ids[start:start + BATCH_SIZE]).prefetch_related('tags'))
+        if not videos:
+            continue
+        for backend_name, backend in get_search_backends_with_name(with_auto_update=True):
+            try:
+                backend.add_bulk(model, videos)
+            except Exception:
+                # Like Wagtail, don't let the search backend break saving
+                logger.exception("Exception raised while adding videos into the '%s' search backend", backend_name)
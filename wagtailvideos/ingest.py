@@ -0,0 +1,290 @@
+"""
+Importing video files from the local filesystem, outside of the admin.
+"""
+import csv
+import datetime
+import hashlib
+import io
+import json
+import logging
+import os
+import uuid
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from wagtail.core.models import Collection
+
+from wagtailvideos import ffmpeg
+from wagtailvideos.ffmpeg import TEMP_PREFIX
+from wagtailvideos.indexing import batch_indexing
+from wagtailvideos.models import Video
+from wagtailvideos.uploads import SNIFF_LENGTH, sniff_video_type
+
+# A file to import, and what to import it as. ``collection`` and ``tags``
+# may be ``None`` to use the defaults for the import.
+ImportEntry = namedtuple('ImportEntry', ['path', 'title', 'collection', 'tags'])
+
+logger = logging.getLogger('wagtailvideos')
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class IngestError(Exception):
+    pass
+
+
+def find_files(directory):
+    """
+    All the files in a directory and its subdirectories, skipping hidden
+    files, in a stable order.
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.'):
+                yield ImportEntry(os.path.join(root, name), None, None, None)
+
+
+def parse_tags(tags):
+    if tags is None or isinstance(tags, (list, tuple)):
+        return tags
+    return [tag.strip() for tag in tags.split(',') if tag.strip()]
+
+
+def read_manifest(path):
+    """
+    Read the files to import from a CSV or JSON manifest. Each entry has a
+    ``path``, relative to the manifest, and optionally a ``title``,
+    ``collection`` (an ID or a name) and ``tags`` (a list, or a comma
+    separated string).
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    if path.endswith('.json'):
+        with io.open(path, encoding='utf-8') as f:
+            rows = json.load(f)
+    elif path.endswith('.csv'):
+        with io.open(path, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+    else:
+        raise IngestError("Manifests must be .csv or .json files: {0}".format(path))
+
+    for row in rows:
+        if not row.get('path'):
+            raise IngestError("Manifest entry without a path: {0!r}".format(row))
+        yield ImportEntry(
+            os.path.join(base_dir, row['path']),
+            row.get('title') or None,
+            row.get('collection') or None,
+            parse_tags(row.get('tags') or None),
+        )
+
+
+def get_collection(value):
+    """Find a collection by its ID or name"""
+    if isinstance(value, Collection):
+        return value
+    try:
+        if str(value).isdigit():
+            return Collection.objects.get(id=value)
+        return Collection.objects.get(name=value)
+    except Collection.DoesNotExist:
+        raise IngestError("Collection {0!r} does not exist".format(value))
+
+
+def get_user(username):
+    User = get_user_model()
+    try:
+        return User.objects.get(**{User.USERNAME_FIELD: username})
+    except User.DoesNotExist:
+        raise IngestError("User {0} does not exist".format(username))
+
+
+def probe_file(path):
+    """
+    Work out everything needed to import a file without touching the
+    database: its SHA-256 and size, its container and, if ffmpeg is
+    installed, its duration and a thumbnail. This is slow for big files, and
+    is run in a process pool by the import command.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        video_type = sniff_video_type(f.read(SNIFF_LENGTH))
+        if video_type is None:
+            return {'path': path, 'video_type': None}
+        f.seek(0)
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+
+    result = {
+        'path': path,
+        'video_type': video_type,
+        'sha256': digest.hexdigest(),
+        'size': size,
+        'duration': None,
+        'thumbnail': None,
+    }
+    if ffmpeg.installed():
+        duration = ffmpeg.get_duration(path)
+        result['duration'] = duration.total_seconds() if duration is not None else None
+        thumbnail = ffmpeg.get_thumbnail(path)
+        if thumbnail is not None:
+            result['thumbnail'] = (thumbnail.name, thumbnail.read())
+    return result
+
+
+class LocalFile(File):
+    """
+    A file on the local disk that ``FileSystemStorage`` will move into
+    place, instead of copying it.
+    """
+    def __init__(self, path, name, sha256):
+        super(LocalFile, self).__init__(open(path, 'rb'), name=name)
+        self.local_path = path
+        self.sha256 = sha256
+
+    def temporary_file_path(self):
+        return self.local_path
+
+
+def link_file(path):
+    """
+    Make a hidden hard link to ``path`` next to it, for storage to move into
+    place while the file itself stays until the video is saved. Returns
+    ``None`` if the file system doesn't support hard links.
+    """
+    link_path = os.path.join(
+        os.path.dirname(path), '.{0}import-{1}'.format(TEMP_PREFIX, uuid.uuid4().hex))
+    try:
+        os.link(path, link_path)
+    except (AttributeError, OSError):
+        return None
+    return link_path
+
+
+def delete_stored_files(video):
+    """Delete the files of a video that could not be saved from storage"""
+    for field_file in [video.file, video.thumbnail]:
+        if not field_file or not field_file._committed:
+            continue
+        try:
+            field_file.storage.delete(field_file.name)
+        except Exception:
+            logger.exception("Could not delete %s", field_file.name)
+
+
+def import_video(entry, probe, collection, tags=None, move=False, user=None):
+    """
+    Create a ``Video`` for a file, using the results of ``probe_file``.
+    Returns ``None`` if a video with the same content already exists, so an
+    interrupted import can be run again.
+    """
+    if Video.objects.filter(file_hash=probe['sha256']).exists():
+        return None
+
+    link_path = link_file(entry.path) if move else None
+    if link_path is not None:
+        file = LocalFile(link_path, os.path.basename(entry.path), probe['sha256'])
+    else:
+        file = File(open(entry.path, 'rb'), name=os.path.basename(entry.path))
+        file.sha256 = probe['sha256']
+
+    video = Video(
+        title=entry.title or os.path.splitext(os.path.basename(entry.path))[0],
+        collection=get_collection(entry.collection) if entry.collection else collection,
+        uploaded_by_user=user,
+        file=file,
+    )
+    if probe['duration'] is not None:
+        video.duration = datetime.timedelta(seconds=probe['duration'])
+    if probe['thumbnail'] is not None:
+        video.thumbnail = ContentFile(probe['thumbnail'][1], probe['thumbnail'][0])
+
+    # The file has already been probed, so skip doing that again on save
+    video._from_signal = True
+    try:
+        # Index the video once its tags are set
+        with batch_indexing(), transaction.atomic():
+            video.save()
+            video.tags.set(*(entry.tags if entry.tags is not None else tags or []))
+    except Exception:
+        # The files were stored when the video was saved
+        delete_stored_files(video)
+        raise
+    finally:
+        file.close()
+        if link_path is not None and os.path.exists(link_path):
+            # The storage copied the file rather than moving it, or never
+            # got to it
+            os.remove(link_path)
+    del video._from_signal
+
+    if move:
+        os.remove(entry.path)
+
+    return video
+
+
+class WatchedFolder(object):
+    """
+    Finds the files in a directory that have finished being written. A file
+    is taken to be complete once its size and modification time have not
+    changed for ``settle_time`` seconds, which works for files written over
+    network shares, where there are no events saying when a file is closed.
+    """
+
+    def __init__(self, directory, settle_time):
+        self.directory = directory
+        self.settle_time = settle_time
+        # path: ((size, mtime), time first seen with that size and mtime)
+        self.pending = {}
+        # path: (size, mtime) of files that have been dealt with
+        self.ignored = {}
+
+    def get_state(self, path):
+        stat = os.stat(path)
+        return (stat.st_size, stat.st_mtime)
+
+    def directories(self):
+        for root, dirs, files in os.walk(self.directory):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            yield root
+
+    def scan(self, now):
+        """Return the paths of files that have become complete since the last scan"""
+        complete = []
+        seen = set()
+        for entry in find_files(self.directory):
+            try:
+                state = self.get_state(entry.path)
+            except OSError:
+                # Removed while scanning
+                continue
+            seen.add(entry.path)
+            if self.ignored.get(entry.path) == state:
+                continue
+
+            previous = self.pending.get(entry.path)
+            if previous is None or previous[0] != state:
+                self.pending[entry.path] = (state, now)
+            elif now - previous[1] >= self.settle_time:
+                del self.pending[entry.path]
+                complete.append(entry.path)
+
+        # Forget about files that have gone away
+        for files in [self.pending, self.ignored]:
+            for path in list(files):
+                if path not in seen:
+                    del files[path]
+        return complete
+
+    def ignore(self, path):
+        """Don't return a file from scan() again, unless it changes"""
+        try:
+            self.ignored[path] = self.get_state(path)
+        except OSError:
+            pass
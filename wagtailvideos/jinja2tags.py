@@ -3,11 +3,11 @@ from jinja2.ext import Extension
 from .models import Video
 
 
-def video(video, **attrs):
+def video(video, lazy=False, **attrs):
     if isinstance(video, Video):
-        defaults = {'preload': True, 'controls': True}
+        defaults = {'preload': 'metadata', 'controls': True}
         defaults.update(attrs)
-        return video.video_tag(attrs)
+        return video.video_tag(defaults, lazy=lazy)
     else:
         raise TypeError('Expected type {0}, received {1}.'.format(Video, type(video)))
 
@@ -0,0 +1,211 @@
+"""
+A cache on local disk of video files kept on remote storage.
+
+ffmpeg needs a local file to read. Getting the thumbnail and duration of a
+video, and each of its transcodes, used to download the whole original from
+remote storage into a temporary file of its own. Instead, originals are
+downloaded once into this cache and read from there by every stage.
+
+Files are cached under a key that only ever refers to the same content: the
+content hash of the video, or the name of a file whose name can never be
+reused (see ``wagtailvideos.storage``). Other files are not cached.
+
+Each cached file has a lock file next to it. Filling holds it exclusively,
+so a file that several threads or processes ask for at once is downloaded
+by one of them while the others wait. Readers hold it shared, so the file
+is not evicted while ffmpeg is reading it. Filled files are written under a
+temporary name and renamed into place, so a half written file is never
+read. Once the cache is bigger than ``WAGTAILVIDEOS_LOCAL_CACHE_SIZE``, the
+files used least recently are evicted.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import locks
+
+from wagtailvideos.ffmpeg import TEMP_PREFIX
+from wagtailvideos.storage import is_content_addressed, is_sharded_name
+
+DEFAULT_CACHE_SIZE = 10 * 1024 * 1024 * 1024
+
+LOCK_SUFFIX = '.lock'
+FILL_PREFIX = '.fill-'
+
+# Partly filled files not written to for this long were left behind by a
+# process that died
+STALE_FILL_AGE = 60 * 60
+
+
+def get_cache_dir():
+    return getattr(settings, 'WAGTAILVIDEOS_LOCAL_CACHE_DIR', None) or os.path.join(
+        tempfile.gettempdir(), TEMP_PREFIX + 'cache')
+
+
+def get_cache_size():
+    """
+    How many bytes of files to keep. ``None`` or ``0`` turns the cache off,
+    and files are downloaded afresh each time they are needed.
+    """
+    return getattr(settings, 'WAGTAILVIDEOS_LOCAL_CACHE_SIZE', DEFAULT_CACHE_SIZE)
+
+
+def get_cache_key(file):
+    """
+    The key to cache the field file ``file`` under, or ``None`` if it can't
+    be cached.
+    """
+    instance = file.instance
+    if file.field.name == 'file' and getattr(instance, 'file_hash', None):
+        file_size = getattr(instance, 'file_size', None)
+        if file_size is not None and file_size > get_cache_size():
+            # It would push everything else out
+            return None
+        return instance.file_hash
+    if is_content_addressed(file.name) or is_sharded_name(file.name):
+        return hashlib.sha256(file.name.encode('utf-8')).hexdigest()
+    return None
+
+
+def get_cache_path(key, ext):
+    return os.path.join(get_cache_dir(), key[:2], key + ext)
+
+
+def make_dirs(directory):
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+
+
+def is_current(lock_file, path):
+    """
+    Whether ``lock_file`` is still the lock file of the cached file at
+    ``path``, which eviction may have removed while it was being waited for
+    """
+    try:
+        return os.fstat(lock_file.fileno()).st_ino == os.stat(path + LOCK_SUFFIX).st_ino
+    except OSError:
+        return False
+
+
+def open_lock(path, flags):
+    """
+    Open and lock the lock file of the cached file at ``path``. Returns
+    ``None`` if ``flags`` include ``LOCK_NB`` and it is locked elsewhere.
+    """
+    while True:
+        lock_file = open(path + LOCK_SUFFIX, 'a')
+        try:
+            locks.lock(lock_file, flags)
+        except (IOError, OSError):
+            lock_file.close()
+            return None
+        if is_current(lock_file, path):
+            return lock_file
+        lock_file.close()
+        if flags & locks.LOCK_NB:
+            return None
+
+
+def fill(file, path):
+    fd, fill_path = tempfile.mkstemp(prefix=FILL_PREFIX, dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            try:
+                file.open('rb')
+                for chunk in file.chunks():
+                    tmp.write(chunk)
+            finally:
+                file.close()
+        os.rename(fill_path, path)
+    except Exception:
+        os.remove(fill_path)
+        raise
+
+
+def evict(max_size):
+    """
+    Remove the files used least recently until the cache holds no more than
+    ``max_size`` bytes. Files in use are kept.
+    """
+    now = time.time()
+    entries = []
+    total = 0
+    for root, directories, files in os.walk(get_cache_dir()):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if name.startswith(FILL_PREFIX):
+                if stat.st_mtime < now - STALE_FILL_AGE:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                continue
+            if name.endswith(LOCK_SUFFIX):
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    for mtime, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        lock_file = open_lock(path, locks.LOCK_EX | locks.LOCK_NB)
+        if lock_file is None:
+            continue
+        try:
+            os.remove(path)
+            os.remove(path + LOCK_SUFFIX)
+            total -= size
+        except OSError:
+            pass
+        finally:
+            lock_file.close()
+
+
+@contextmanager
+def cached_file(file, key):
+    """
+    The path of a local copy of the field file ``file``, downloading it into
+    the cache under ``key`` if it is not there yet. The copy is kept until
+    the block ends.
+    """
+    _, ext = os.path.splitext(file.name)
+    path = get_cache_path(key, ext)
+    make_dirs(os.path.dirname(path))
+
+    while True:
+        lock_file = open_lock(path, locks.LOCK_EX)
+        filled = False
+        try:
+            if os.path.exists(path):
+                # Used most recently
+                os.utime(path, None)
+            else:
+                fill(file, path)
+                filled = True
+            # Let others read it too
+            locks.lock(lock_file, locks.LOCK_SH)
+        except Exception:
+            lock_file.close()
+            raise
+        # The lock is let go of while it is changed to shared, so the file
+        # could have been evicted meanwhile
+        if os.path.exists(path) and is_current(lock_file, path):
+            break
+        lock_file.close()
+
+    try:
+        if filled:
+            evict(get_cache_size())
+        yield path
+    finally:
+        lock_file.close()
@@ -0,0 +1,200 @@
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch, Q, Sum
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from wagtailvideos import ffmpeg
+from wagtailvideos.ingest import IngestError, get_collection
+from wagtailvideos.models import (
+    MediaFormats, Video, VideoQuality, VideoTranscode, fill_metadata,
+    needs_metadata, transcode_video)
+
+logger = logging.getLogger('wagtailvideos')
+
+BATCH_SIZE = 500
+
+
+def parse_since(value):
+    """Parse a date or datetime from the command line"""
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(value)
+        since = datetime.datetime(date.year, date.month, date.day)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+class Command(BaseCommand):
+    help = (
+        "Create missing transcodes and fill in missing thumbnails, durations "
+        "and file sizes for all videos, several at a time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--transcode', nargs='+', default=[], metavar='FORMAT',
+            choices=[media_format.name for media_format in MediaFormats],
+            help="Create transcodes in these formats for videos that don't have them")
+        parser.add_argument(
+            '--quality', default=VideoQuality.default.name,
+            choices=[quality.name for quality in VideoQuality],
+            help="Quality of the transcodes to create")
+        parser.add_argument(
+            '--metadata', action='store_true',
+            help="Fill in missing thumbnails, durations and file sizes")
+        parser.add_argument(
+            '--collection', help="Only process videos in this collection (an ID or a name)")
+        parser.add_argument(
+            '--since', help="Only process videos created since this date or time")
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help="Number of videos to process at the same time")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="List what would be done, without doing it")
+
+    def handle(self, **options):
+        media_formats = [MediaFormats[name] for name in options['transcode']]
+        quality = VideoQuality[options['quality']]
+        if not media_formats and not options['metadata']:
+            raise CommandError("Nothing to do, give --transcode and/or --metadata")
+        if media_formats and not ffmpeg.installed() and not options['dry_run']:
+            raise CommandError("ffmpeg is not installed, so videos can not be transcoded")
+
+        videos = Video.objects.all()
+        if options['collection']:
+            try:
+                videos = videos.filter(collection=get_collection(options['collection']))
+            except IngestError as e:
+                raise CommandError(str(e))
+        if options['since']:
+            try:
+                videos = videos.filter(created_at__gte=parse_since(options['since']))
+            except ValueError:
+                raise CommandError("Could not understand --since {0}".format(options['since']))
+
+        # Find the videos with something to do in a single query
+        ready_transcodes = VideoTranscode.objects.filter(quality=quality, error_message='')
+        missing = Q()
+        for media_format in media_formats:
+            missing |= ~Q(id__in=ready_transcodes.filter(
+                media_format=media_format).values('video_id'))
+        if options['metadata']:
+            missing |= Q(file_size__isnull=True)
+            if ffmpeg.installed():
+                missing |= Q(duration__isnull=True) | Q(thumbnail__isnull=True) | Q(thumbnail='')
+        video_ids = list(videos.filter(missing).order_by('pk').values_list('pk', flat=True))
+
+        tasks = list(self.get_tasks(video_ids, media_formats, quality, options['metadata']))
+        if options['dry_run']:
+            for video, task in tasks:
+                self.stdout.write("Would {0} for {1} ({2})".format(
+                    self.describe(task), video.title, video.pk))
+            self.stdout.write("{0} tasks for {1} videos".format(len(tasks), len(video_ids)))
+            return
+
+        self.run_tasks(tasks, quality, options['workers'])
+
+    def get_tasks(self, video_ids, media_formats, quality, metadata):
+        """
+        Yield ``(video, task)`` for everything to be done, where ``task`` is
+        either a media format to transcode to or ``'metadata'``.
+        """
+        for i in range(0, len(video_ids), BATCH_SIZE):
+            videos = Video.objects.filter(pk__in=video_ids[i:i + BATCH_SIZE]).order_by('pk').prefetch_related(
+                Prefetch(
+                    'transcodes',
+                    queryset=VideoTranscode.objects.filter(quality=quality, error_message=''),
+                    to_attr='usable_transcodes'))
+            for video in videos:
+                if metadata and (video.file_size is None or ffmpeg.installed() and needs_metadata(video)):
+                    yield video, 'metadata'
+                existing = {transcode.media_format for transcode in video.usable_transcodes}
+                for media_format in media_formats:
+                    if media_format not in existing:
+                        yield video, media_format
+
+    def describe(self, task):
+        if task == 'metadata':
+            return "fill in metadata"
+        return "transcode to {0}".format(task.name)
+
+    def run_task(self, video, task, quality, threaded=False):
+        try:
+            # Tasks for the same video may run at the same time, so each
+            # works on an instance of its own
+            video = Video.objects.get(pk=video.pk)
+            if task == 'metadata':
+                fill_metadata(video)
+                video._from_signal = True
+                video.save(update_fields=['thumbnail', 'duration', 'file_size'])
+                del video._from_signal
+                return True
+            transcode = video.lock_transcode(task, quality)
+            if transcode is None:
+                # Being processed by something else
+                return False
+            transcode_video(transcode)
+            return not transcode.error_message
+        except Exception:
+            # Such as the video file being missing or unreadable. Carry on
+            # with the rest
+            logger.exception("Could not %s for video %s", self.describe(task), video.pk)
+            return False
+        finally:
+            if threaded:
+                connection.close()
+
+    def run_tasks(self, tasks, quality, workers):
+        started = time.time()
+        done = failed = 0
+        processed = set()
+
+        executor = None
+        if workers <= 1:
+            results = ((video, task, self.run_task(video, task, quality)) for video, task in tasks)
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            futures = [
+                (video, task, executor.submit(self.run_task, video, task, quality, threaded=True))
+                for video, task in tasks]
+            results = ((video, task, future.result()) for video, task, future in futures)
+
+        try:
+            for video, task, succeeded in results:
+                if succeeded:
+                    self.stdout.write("Did {0} for {1} ({2})".format(
+                        self.describe(task), video.title, video.pk))
+                    done += 1
+                else:
+                    self.stderr.write("Could not {0} for {1} ({2})".format(
+                        self.describe(task), video.title, video.pk))
+                    failed += 1
+                processed.add(video.pk)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        # The sizes filled in by the tasks are on their own instances
+        size = 0
+        processed_ids = sorted(processed)
+        for i in range(0, len(processed_ids), BATCH_SIZE):
+            size += Video.objects.filter(pk__in=processed_ids[i:i + BATCH_SIZE]).aggregate(
+                size=Sum('file_size'))['size'] or 0
+
+        elapsed = max(time.time() - started, 0.001)
+        self.stdout.write(
+            "{done} tasks done, {failed} failed, for {videos} videos in {elapsed:.1f}s "
+            "({rate:.1f} videos/minute, {throughput}/s)".format(
+                done=done, failed=failed, videos=len(processed), elapsed=elapsed,
+                rate=len(processed) * 60 / elapsed, throughput=filesizeformat(size / elapsed)))
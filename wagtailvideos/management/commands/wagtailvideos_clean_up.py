@@ -0,0 +1,55 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from wagtailvideos.cleanup import (
+    DEFAULT_MIN_AGE, batched, find_orphans, find_temp_files, get_orphan_size,
+    get_temp_file_size, remove_temp_file)
+from wagtailvideos.deletion import queue_file_deletions
+
+
+class Command(BaseCommand):
+    help = (
+        "Find files in the original_videos and video_transcodes folders of "
+        "storage that no video or transcode uses, and temporary files left "
+        "behind by wagtailvideos. Lists them, or deletes them with --delete."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete', action='store_true',
+            help="Delete the files found, rather than listing them")
+        parser.add_argument(
+            '--min-age', type=float, default=DEFAULT_MIN_AGE.total_seconds() / 3600, metavar='HOURS',
+            help="Leave files changed more recently than this alone, as they may still be in use")
+
+    def handle(self, **options):
+        min_age = datetime.timedelta(hours=options['min_age'])
+        delete = options['delete']
+        # Deleted files are listed only when asked for
+        list_files = not delete or options['verbosity'] > 1
+
+        count = size = 0
+        for orphans in batched(find_orphans(min_age)):
+            for orphan in orphans:
+                if list_files:
+                    self.stdout.write(orphan.name)
+                size += get_orphan_size(orphan)
+            count += len(orphans)
+            if delete:
+                queue_file_deletions([
+                    (orphan.model._meta.label, orphan.field, orphan.name) for orphan in orphans])
+        self.stdout.write("{0} {1} unused files in storage ({2})".format(
+            "Deleting" if delete else "Found", count, filesizeformat(size)))
+
+        count = size = 0
+        for path in find_temp_files(min_age):
+            if list_files:
+                self.stdout.write(path)
+            size += get_temp_file_size(path)
+            count += 1
+            if delete:
+                remove_temp_file(path)
+        self.stdout.write("{0} {1} temporary files ({2})".format(
+            "Deleted" if delete else "Found", count, filesizeformat(size)))
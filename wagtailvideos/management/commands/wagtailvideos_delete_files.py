@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from wagtailvideos.deletion import delete_files
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the files of deleted videos and transcodes from storage, "
+        "including those that failed before and are due to be tried again."
+    )
+
+    def handle(self, **options):
+        deleted, failed = delete_files()
+        self.stdout.write("Deleted {0} files, {1} to be tried again later".format(deleted, failed))
@@ -0,0 +1,111 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from wagtail.core.models import Collection
+
+from wagtailvideos.indexing import batch_indexing
+from wagtailvideos.ingest import (
+    IngestError, find_files, get_collection, get_user, import_video,
+    parse_tags, probe_file, read_manifest)
+
+
+class Command(BaseCommand):
+    help = (
+        "Import video files from a directory, or from a CSV or JSON manifest "
+        "listing the files with their titles, collections and tags. Files "
+        "that have already been imported are skipped, so an interrupted "
+        "import can be run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="A directory, or a .csv or .json manifest")
+        parser.add_argument(
+            '--collection',
+            help="ID or name of the collection for videos that don't have one in the manifest")
+        parser.add_argument(
+            '--tags', default='',
+            help="Comma separated tags for videos that don't have any in the manifest")
+        parser.add_argument(
+            '--user', help="Username to record as the uploader of the videos")
+        parser.add_argument(
+            '--move', action='store_true',
+            help="Move the files into storage instead of copying them")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Number of processes used to probe files (default: number of CPUs)")
+
+    def handle(self, source, **options):
+        try:
+            if os.path.isdir(source):
+                entries = list(find_files(source))
+            elif os.path.isfile(source):
+                entries = list(read_manifest(source))
+            else:
+                raise CommandError("{0} does not exist".format(source))
+
+            if options['collection']:
+                collection = get_collection(options['collection'])
+            else:
+                collection = Collection.get_first_root_node()
+            user = get_user(options['user']) if options['user'] else None
+        except IngestError as e:
+            raise CommandError(str(e))
+
+        tags = parse_tags(options['tags'])
+        counts = {'imported': 0, 'skipped': 0, 'failed': 0}
+
+        # Videos are indexed for searching a batch at a time
+        with batch_indexing():
+            for entry, probe in self.probe(entries, options['workers']):
+                if isinstance(probe, Exception):
+                    self.stderr.write("Failed to read {0}: {1}".format(entry.path, probe))
+                    counts['failed'] += 1
+                    continue
+                if probe['video_type'] is None:
+                    self.stderr.write("Not a video: {0}".format(entry.path))
+                    counts['failed'] += 1
+                    continue
+
+                try:
+                    video = import_video(
+                        entry, probe, collection, tags=tags, move=options['move'], user=user)
+                except Exception as e:
+                    self.stderr.write("Failed to import {0}: {1}".format(entry.path, e))
+                    counts['failed'] += 1
+                    continue
+
+                if video is None:
+                    self.stdout.write("Already imported: {0}".format(entry.path))
+                    counts['skipped'] += 1
+                else:
+                    self.stdout.write("Imported {0} as video {1}".format(entry.path, video.pk))
+                    counts['imported'] += 1
+
+        self.stdout.write(
+            "{imported} imported, {skipped} already imported, {failed} failed".format(**counts))
+
+    def probe(self, entries, workers):
+        """
+        Probe files in parallel, yielding each entry with its probe results
+        (or the exception raised) in order. Videos are still created one at a
+        time, in this process.
+        """
+        if workers <= 1:
+            for entry in entries:
+                yield entry, self.probe_entry(entry)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [(entry, executor.submit(probe_file, entry.path)) for entry in entries]
+            for entry, future in futures:
+                try:
+                    yield entry, future.result()
+                except Exception as e:
+                    yield entry, e
+
+    def probe_entry(self, entry):
+        try:
+            return probe_file(entry.path)
+        except Exception as e:
+            return e
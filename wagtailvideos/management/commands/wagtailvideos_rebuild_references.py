@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from wagtailvideos.references import rebuild_references
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the index of where videos are used up to date. It is kept up "
+        "to date as pages are saved, so this is only needed after installing "
+        "or upgrading, or after changing data without saving models."
+    )
+
+    def handle(self, **options):
+        added, removed = rebuild_references()
+        self.stdout.write("Added {0} and removed {1} video references".format(added, removed))
@@ -0,0 +1,167 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from wagtail.core.models import Collection
+
+from wagtailvideos import ffmpeg
+from wagtailvideos.ingest import (
+    ImportEntry, IngestError, WatchedFolder, get_collection, get_user,
+    import_video, parse_tags, probe_file)
+from wagtailvideos.models import MediaFormats, VideoQuality, transcode_video
+
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Watch a directory, and import each video file put in it once it has "
+        "finished being written. Files are moved into storage, which is a "
+        "rename if the directory is on the same filesystem as MEDIA_ROOT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="The directory to watch")
+        parser.add_argument(
+            '--collection', help="ID or name of the collection to add videos to")
+        parser.add_argument(
+            '--tags', default='', help="Comma separated tags to add to the videos")
+        parser.add_argument(
+            '--user', help="Username to record as the uploader of the videos")
+        parser.add_argument(
+            '--copy', action='store_true',
+            help="Copy files into storage and leave them in place, instead of moving them")
+        parser.add_argument(
+            '--transcode', nargs='+', default=[], metavar='FORMAT',
+            choices=[media_format.name for media_format in MediaFormats],
+            help="Create transcodes in these formats for each imported video")
+        parser.add_argument(
+            '--quality', default=VideoQuality.default.name,
+            choices=[quality.name for quality in VideoQuality],
+            help="Quality of the transcodes to create")
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Number of transcodes to run at the same time")
+        parser.add_argument(
+            '--settle', type=float, default=10,
+            help="Seconds a file's size must stay the same before it is imported")
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help="Seconds between scans of the directory")
+        parser.add_argument(
+            '--polling', action='store_true',
+            help="Only scan the directory, even if inotify is available")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Import the complete files that are already there, then stop")
+
+    def handle(self, directory, **options):
+        if not os.path.isdir(directory):
+            raise CommandError("{0} is not a directory".format(directory))
+
+        self.media_formats = [MediaFormats[name] for name in options['transcode']]
+        self.quality = VideoQuality[options['quality']]
+        if self.media_formats and not ffmpeg.installed():
+            raise CommandError("ffmpeg is not installed, so videos can not be transcoded")
+
+        try:
+            if options['collection']:
+                self.collection = get_collection(options['collection'])
+            else:
+                self.collection = Collection.get_first_root_node()
+            self.user = get_user(options['user']) if options['user'] else None
+        except IngestError as e:
+            raise CommandError(str(e))
+        self.tags = parse_tags(options['tags'])
+        self.move = not options['copy']
+
+        folder = WatchedFolder(directory, options['settle'])
+        self.executor = ThreadPoolExecutor(max_workers=max(options['workers'], 1))
+        notifier = None
+        if inotify_simple is not None and not options['polling']:
+            notifier = inotify_simple.INotify()
+
+        try:
+            if options['once']:
+                folder.scan(time.time())
+                time.sleep(options['settle'])
+                for path in folder.scan(time.time()):
+                    self.ingest(folder, path)
+                return
+
+            self.stdout.write("Watching {0} using {1}".format(
+                directory, 'inotify' if notifier is not None else 'polling'))
+            while True:
+                # The connection may have dropped or outlived CONN_MAX_AGE
+                # while waiting
+                close_old_connections()
+                for path in folder.scan(time.time()):
+                    self.ingest(folder, path)
+                timeout = options['interval']
+                if folder.pending:
+                    timeout = min(timeout, options['settle'])
+                self.wait(folder, notifier, timeout)
+        except KeyboardInterrupt:
+            self.stdout.write("Finishing transcodes in progress")
+        finally:
+            self.executor.shutdown()
+            if notifier is not None:
+                notifier.close()
+
+    def wait(self, folder, notifier, timeout):
+        """
+        Wait until the next scan. With inotify, a file being closed or moved
+        into the directory starts the next scan straight away.
+        """
+        if notifier is None:
+            time.sleep(timeout)
+            return
+
+        flags = inotify_simple.flags
+        for directory in folder.directories():
+            try:
+                notifier.add_watch(directory, flags.CREATE | flags.CLOSE_WRITE | flags.MOVED_TO)
+            except OSError:
+                # Removed since it was found
+                pass
+        notifier.read(timeout=int(timeout * 1000))
+
+    def ingest(self, folder, path):
+        entry = ImportEntry(path, None, None, None)
+        try:
+            probe = probe_file(path)
+            if probe['video_type'] is None:
+                self.stderr.write("Not a video: {0}".format(path))
+                folder.ignore(path)
+                return
+            video = import_video(
+                entry, probe, self.collection, tags=self.tags, move=self.move, user=self.user)
+        except (IngestError, IOError, OSError) as e:
+            self.stderr.write("Failed to import {0}: {1}".format(path, e))
+            folder.ignore(path)
+            return
+
+        if video is None:
+            self.stdout.write("Already imported: {0}".format(path))
+            folder.ignore(path)
+            return
+
+        self.stdout.write("Imported {0} as video {1}".format(path, video.pk))
+        if not self.move:
+            folder.ignore(path)
+
+        for media_format in self.media_formats:
+            transcode = video.lock_transcode(media_format, self.quality)
+            if transcode is not None:
+                self.executor.submit(self.transcode, transcode)
+
+    def transcode(self, transcode):
+        try:
+            transcode_video(transcode)
+        finally:
+            connection.close()
@@ -0,0 +1,33 @@
+# Generated by Django 2.0.13 on 2026-10-19 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailvideos', '0010_video_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='sources',
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='videotranscode',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='videotranscode',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='videotranscode',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
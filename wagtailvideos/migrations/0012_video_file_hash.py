@@ -0,0 +1,18 @@
+# Generated by Django 2.0.13 on 2026-10-19 05:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailvideos', '0011_video_sources'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+    ]
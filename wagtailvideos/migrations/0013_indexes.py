@@ -0,0 +1,48 @@
+# Generated by Django 2.0.13 on 2026-10-19 05:12
+
+from django.db import migrations, models
+
+READY_TRANSCODES_INDEX = 'wagtailvideos_ready_transcodes'
+
+# Transcodes that finished without errors are the ones looked up when
+# rendering videos. A partial index holds only those, on backends that
+# support it. Elsewhere the unique (video, media_format) index is used.
+READY_TRANSCODES_CONDITION = {
+    'postgresql': "NOT processing AND error_message = ''",
+    'sqlite': "processing = 0 AND error_message = ''",
+}
+
+
+def add_ready_transcodes_index(apps, schema_editor):
+    condition = READY_TRANSCODES_CONDITION.get(schema_editor.connection.vendor)
+    if condition is None:
+        return
+    VideoTranscode = apps.get_model('wagtailvideos', 'VideoTranscode')
+    schema_editor.execute('CREATE INDEX {0} ON {1} ({2}) WHERE {3}'.format(
+        schema_editor.quote_name(READY_TRANSCODES_INDEX),
+        schema_editor.quote_name(VideoTranscode._meta.db_table),
+        schema_editor.quote_name(VideoTranscode._meta.get_field('video').column),
+        condition))
+
+
+def remove_ready_transcodes_index(apps, schema_editor):
+    if schema_editor.connection.vendor not in READY_TRANSCODES_CONDITION:
+        return
+    # It may already be gone, as SQLite drops it when rebuilding the table
+    schema_editor.execute('DROP INDEX IF EXISTS {0}'.format(
+        schema_editor.quote_name(READY_TRANSCODES_INDEX)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailvideos', '0012_video_file_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['collection', '-created_at', '-id'], name='wagtailvideos_coll_created'),
+        ),
+        migrations.RunPython(add_ready_transcodes_index, remove_ready_transcodes_index),
+    ]
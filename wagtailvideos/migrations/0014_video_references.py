@@ -0,0 +1,46 @@
+# Generated by Django 2.0.13 on 2026-10-19 05:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('wagtailvideos', '0013_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoReference',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.ContentType')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='file_checked_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='file_missing',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='videoreference',
+            name='video',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='references', to='wagtailvideos.Video'),
+        ),
+        migrations.AddIndex(
+            model_name='videoreference',
+            index=models.Index(fields=['content_type', 'object_id'], name='wagtailvideos_ref_object'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='videoreference',
+            unique_together={('video', 'content_type', 'object_id')},
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.0.13 on 2026-10-19 05:33
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailvideos', '0015_videobulkjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoFileDeletion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100)),
+                ('field', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=255)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('next_attempt_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='videobulkjob',
+            name='action',
+            field=models.CharField(choices=[('transcode', 'Transcode')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 2.0.13 on 2026-10-19 05:38
+
+from importlib import import_module
+
+from django.db import migrations
+import wagtailvideos.models
+import wagtailvideos.storage
+
+indexes = import_module('wagtailvideos.migrations.0013_indexes')
+
+
+def recreate_ready_transcodes_index(apps, schema_editor):
+    # SQLite drops it when altering a field rebuilds the table
+    indexes.remove_ready_transcodes_index(apps, schema_editor)
+    indexes.add_ready_transcodes_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wagtailvideos', '0016_videofiledeletion'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_ready_transcodes_index),
+        migrations.AlterField(
+            model_name='video',
+            name='file',
+            field=wagtailvideos.storage.VideoFileField(upload_to=wagtailvideos.models.get_upload_to, verbose_name='file'),
+        ),
+        migrations.AlterField(
+            model_name='video',
+            name='thumbnail',
+            field=wagtailvideos.storage.VideoImageField(blank=True, null=True, upload_to=wagtailvideos.models.get_upload_to),
+        ),
+        migrations.AlterField(
+            model_name='videotranscode',
+            name='file',
+            field=wagtailvideos.storage.VideoFileField(blank=True, null=True, upload_to=wagtailvideos.models.get_upload_to, verbose_name='file'),
+        ),
+        migrations.RunPython(recreate_ready_transcodes_index, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,4 @@
+import json
 import logging
 import mimetypes
 import os
@@ -9,25 +10,32 @@ import threading
 from contextlib import contextmanager
 
 from django.conf import settings
-from django.core.exceptions import SuspiciousFileOperation
+from django.contrib.contenttypes.models import ContentType
 from django.core.files.base import ContentFile
 from django.core.files.temp import NamedTemporaryFile
 from django.db import models
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch.dispatcher import receiver
 from django.forms.utils import flatatt
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
+from django.utils.html import escape, format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 from enumchoicefield import ChoiceEnum, EnumChoiceField
 from taggit.managers import TaggableManager
-from wagtail.admin.utils import get_object_usage
-from wagtail.core.models import CollectionMember
+from taggit.models import Tag, TaggedItem
+from wagtail.core.models import CollectionMember, Page
 from wagtail.search import index
 from wagtail.search.queryset import SearchableQuerySetMixin
 
-from wagtailvideos import ffmpeg
+from wagtailvideos import ffmpeg, indexing, local_cache
+from wagtailvideos.cache import (
+    clear_popular_tags, get_video_tag_cache, get_video_tag_cache_key,
+    get_video_tag_cache_timeout)
+from wagtailvideos.storage import (
+    VideoFileField, VideoImageField, get_content_hash, get_upload_path)
 
 logger = logging.getLogger(__name__)
 
@@ -63,9 +71,29 @@ class MediaFormats(ChoiceEnum):
                 VideoQuality.highest: '9'
             }[quality]
 
+    def get_mime_type(self):
+        # The mp4 transcode copies the source audio stream, so its codecs
+        # are not known up front
+        return {
+            MediaFormats.webm: 'video/webm; codecs="vp8, vorbis"',
+            MediaFormats.mp4: 'video/mp4',
+            MediaFormats.ogg: 'video/ogg; codecs="theora, vorbis"',
+        }[self]
+
 
 class VideoQuerySet(SearchableQuerySetMixin, models.QuerySet):
-    pass
+    def with_sources(self):
+        """
+        Prefetch the transcodes that are ready for playback. ``video_tag``
+        normally reads the ``sources`` snapshot, but videos saved before the
+        snapshot existed fall back to the transcodes, and this makes that
+        fallback cost one query in total instead of one query per video.
+        """
+        Transcode = self.model.get_transcode_model()
+        return self.prefetch_related(models.Prefetch(
+            'transcodes',
+            queryset=Transcode.objects.filter(processing=False, error_message=''),
+            to_attr='ready_transcodes'))
 
 
 def get_upload_to(instance, filename):
@@ -76,9 +104,9 @@ def get_upload_to(instance, filename):
 @python_2_unicode_compatible
 class AbstractVideo(CollectionMember, index.Indexed, models.Model):
     title = models.CharField(max_length=255, verbose_name=_('title'))
-    file = models.FileField(
+    file = VideoFileField(
         verbose_name=_('file'), upload_to=get_upload_to)
-    thumbnail = models.ImageField(upload_to=get_upload_to, null=True, blank=True)
+    thumbnail = VideoImageField(upload_to=get_upload_to, null=True, blank=True)
     created_at = models.DateTimeField(verbose_name=_('created at'), auto_now_add=True, db_index=True)
     duration = models.DurationField(blank=True, null=True)
     uploaded_by_user = models.ForeignKey(
@@ -89,6 +117,15 @@ class AbstractVideo(CollectionMember, index.Indexed, models.Model):
     tags = TaggableManager(help_text=None, blank=True, verbose_name=_('tags'))
 
     file_size = models.PositiveIntegerField(null=True, editable=False)
+    file_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+
+    # What storage said about the file when it was last asked, so the admin
+    # doesn't have to ask again on every view. See refresh_file_info()
+    file_missing = models.BooleanField(default=False, editable=False)
+    file_checked_at = models.DateTimeField(null=True, editable=False)
+
+    # JSON snapshot of the ready transcodes, maintained by update_sources()
+    sources = models.TextField(null=True, editable=False)
 
     objects = VideoQuerySet.as_manager()
 
@@ -98,6 +135,7 @@ class AbstractVideo(CollectionMember, index.Indexed, models.Model):
             index.SearchField('name', partial_match=True, boost=10),
         ]),
         index.FilterField('uploaded_by_user'),
+        index.FilterField('id'),
     ]
 
     def __init__(self, *args, **kwargs):
@@ -116,25 +154,39 @@ class AbstractVideo(CollectionMember, index.Indexed, models.Model):
 
         return self.file_size
 
+    def refresh_file_info(self):
+        """
+        Ask storage whether the file exists and how big it is, and keep the
+        answers on the video. Storage isn't asked again until this is called.
+        """
+        storage = self.file.storage
+        self.file_missing = not self.file.name or not storage.exists(self.file.name)
+        if self.file_missing:
+            self.file_size = None
+        else:
+            self.file_size = storage.size(self.file.name)
+        self.file_checked_at = timezone.now()
+        # Updated directly, as nothing else about the video has changed
+        type(self).objects.filter(pk=self.pk).update(
+            file_missing=self.file_missing, file_size=self.file_size,
+            file_checked_at=self.file_checked_at)
+
     def get_upload_to(self, filename):
         folder_name = 'original_videos'
-        filename = self.file.field.storage.get_valid_name(filename)
         max_length = self._meta.get_field('file').max_length
-
-        # Truncate filename so it fits in the 100 character limit
-        # https://code.djangoproject.com/ticket/9893
-        file_path = os.path.join(folder_name, filename)
-        too_long = len(file_path) - max_length
-        if too_long > 0:
-            head, ext = os.path.splitext(filename)
-            if too_long > len(head) + 1:
-                raise SuspiciousFileOperation('File name can not be shortened to a safe length')
-            filename = head[:-too_long] + ext
-            file_path = os.path.join(folder_name, filename)
-        return os.path.join(folder_name, filename)
+        return get_upload_path(self, folder_name, filename, max_length)
 
     def get_usage(self):
-        return get_object_usage(self)
+        """The pages using this video, from the reference index"""
+        return Page.objects.filter(pk__in=self.references.filter(
+            content_type=ContentType.objects.get_for_model(Page)).values('object_id'))
+
+    def get_usage_count(self):
+        """
+        The number of pages and other objects using this video, from the
+        reference index kept by ``wagtailvideos.references``.
+        """
+        return self.references.count()
 
     @property
     def usage_url(self):
@@ -152,7 +204,27 @@ class AbstractVideo(CollectionMember, index.Indexed, models.Model):
         return self.title
 
     def save(self, **kwargs):
-        super(AbstractVideo, self).save(**kwargs)
+        if self.pk is None and self.sources is None:
+            # A new video has no transcodes yet
+            self.sources = '[]'
+        if self.file and not self.file._committed:
+            # Uploads received by VideoUploadHandler were hashed and sized
+            # as they arrived, so this doesn't read them again
+            self.file_hash = get_content_hash(self.file.file)
+            self.file_size = self.file.size
+            self.file_missing = False
+            self.file_checked_at = timezone.now()
+        with indexing.saving_video():
+            super(AbstractVideo, self).save(**kwargs)
+        if not indexing.is_saving_video():
+            indexing.index_on_commit(self)
+
+    def get_indexed_instance(self):
+        # Saved videos are indexed together once the transaction commits,
+        # by wagtailvideos.indexing, rather than by Wagtail on every save
+        if indexing.is_saving_video():
+            return None
+        return super(AbstractVideo, self).get_indexed_instance()
 
     @property
     def url(self):
@@ -183,38 +255,139 @@ class AbstractVideo(CollectionMember, index.Indexed, models.Model):
         except Transcode.DoesNotExist:
             return self.do_transcode(media_format)
 
-    def video_tag(self, attrs=None):
+    def get_ready_transcodes(self):
+        """
+        Transcodes that have finished processing without errors. Uses the
+        data prefetched by ``VideoQuerySet.with_sources`` or a plain
+        ``prefetch_related('transcodes')`` when available.
+        """
+        if hasattr(self, 'ready_transcodes'):
+            return self.ready_transcodes
+        prefetched = getattr(self, '_prefetched_objects_cache', {})
+        if 'transcodes' in prefetched:
+            return [transcode for transcode in prefetched['transcodes']
+                    if not transcode.processing and not transcode.error_message]
+        return self.transcodes.exclude(processing=True).filter(error_message__exact='')
+
+    def update_sources(self):
+        """
+        Rebuild the snapshot of ready transcodes stored in ``sources``. Called
+        whenever a transcode is saved or deleted.
+        """
+        transcodes = self.transcodes.filter(processing=False, error_message='')
+        self.sources = json.dumps([transcode.get_source() for transcode in transcodes])
+        type(self).objects.filter(pk=self.pk).update(sources=self.sources)
+
+    def get_sources(self):
+        """
+        Return the playable sources for this video, transcodes first and the
+        original file last. Each source is a dict with the ``url``, the
+        ``type`` (a MIME type, with codecs where known) and the ``width``,
+        ``height`` and ``bitrate`` where known.
+
+        This reads the ``sources`` snapshot and so needs no queries, except
+        for videos saved before the snapshot existed, which have it filled
+        in on first use.
+        """
+        if self.sources is None:
+            self.sources = json.dumps([
+                transcode.get_source() for transcode in self.get_ready_transcodes()])
+            type(self).objects.filter(pk=self.pk).update(sources=self.sources)
+
+        storage = self._meta.get_field('file').storage
+        sources = []
+        for source in json.loads(self.sources):
+            source['url'] = storage.url(source.pop('name'))
+            sources.append(source)
+        sources.append({
+            'url': self.url,
+            'type': mimetypes.guess_type(self.file.name)[0],
+            'width': None,
+            'height': None,
+            'bitrate': None,
+        })
+        return sources
+
+    def video_tag(self, attrs=None, lazy=False):
+        """
+        Render a ``<video>`` element with all playable sources. With
+        ``lazy=True`` only the poster and a play button are rendered, and
+        ``wagtailvideos/js/lazy-video.js`` swaps in the real element when it
+        scrolls into view or is clicked.
+        """
         if attrs is None:
             attrs = {}
-        else:
-            attrs = attrs.copy()
+
+        cache = get_video_tag_cache()
+        if cache is None:
+            return self.render_video_tag(attrs, lazy=lazy)
+
+        if self.sources is None:
+            # Fill in the snapshot first so the cache key is stable
+            self.get_sources()
+        key = get_video_tag_cache_key(self, attrs, lazy)
+        html = cache.get(key)
+        if html is None:
+            html = self.render_video_tag(attrs, lazy=lazy)
+            cache.set(key, html, get_video_tag_cache_timeout())
+        return mark_safe(html)
+
+    def render_video_tag(self, attrs, lazy=False):
+        attrs = attrs.copy()
         if self.thumbnail:
             attrs['poster'] = self.thumbnail.url
 
-        transcodes = self.transcodes.exclude(processing=True).filter(error_message__exact='')
-        sources = []
-        for transcode in transcodes:
-            sources.append("<source src='{0}' type='video/{1}' >".format(transcode.url, transcode.media_format.name))
+        # A bare boolean preload attribute means "auto" to browsers, and
+        # leaving it out lets the browser pick, so spell both out
+        if attrs.get('preload') is True:
+            attrs['preload'] = 'auto'
+        elif attrs.get('preload') is False:
+            attrs['preload'] = 'none'
 
-        mime = mimetypes.MimeTypes()
-        sources.append("<source src='{0}' type='{1}'>"
-                       .format(self.url, mime.guess_type(self.url)[0]))
+        sources = []
+        for source in self.get_sources():
+            sources.append(format_html("<source src='{0}' type='{1}'>", source['url'], source['type']))
 
         sources.append("<p>Sorry, your browser doesn't support playback for this video</p>")
-        return mark_safe(
-            "<video {0}>\n{1}\n</video>".format(flatatt(attrs), "\n".join(sources)))
+        video = "<video {0}>\n{1}\n</video>".format(flatatt(attrs), "\n".join(sources))
+        if not lazy:
+            return mark_safe(video)
 
-    def do_transcode(self, media_format, quality):
+        poster = ''
+        if self.thumbnail:
+            poster = format_html(
+                "<img class='wagtailvideos-lazy-poster' src='{0}' alt=''{1}{2}>",
+                attrs['poster'],
+                format_html(" width='{0}'", attrs['width']) if attrs.get('width') else '',
+                format_html(" height='{0}'", attrs['height']) if attrs.get('height') else '')
+        return mark_safe(
+            "<div class='wagtailvideos-lazy' data-wagtailvideos-lazy>\n"
+            "<template>{0}</template>\n{1}\n"
+            "<button type='button' class='wagtailvideos-lazy-play'>{2}</button>\n"
+            "</div>".format(video, poster, escape(_("Play video"))))
+
+    def lock_transcode(self, media_format, quality):
+        """
+        Get the transcode for ``media_format``, marked as processing so that
+        nothing else starts on it. Returns ``None`` if it is already being
+        processed.
+        """
         transcode, created = self.transcodes.get_or_create(
             media_format=media_format,
         )
-        if transcode.processing is False:
-            transcode.processing = True
-            transcode.error_messages = ''
-            transcode.quality = quality
-            # Lock the transcode model
-            transcode.save(update_fields=['processing', 'error_message',
-                                          'quality'])
+        if transcode.processing is not False:
+            return None
+        transcode.processing = True
+        transcode.error_message = ''
+        transcode.quality = quality
+        # Lock the transcode model
+        transcode.save(update_fields=['processing', 'error_message',
+                                      'quality'])
+        return transcode
+
+    def do_transcode(self, media_format, quality):
+        transcode = self.lock_transcode(media_format, quality)
+        if transcode is not None:
             TranscodingThread(transcode).start()
         else:
             pass  # TODO Queue?
@@ -233,26 +406,34 @@ class Video(AbstractVideo):
         'tags',
     )
 
+    class Meta(AbstractVideo.Meta):
+        indexes = [
+            # Listing a collection, newest first, paged on (created_at, id)
+            models.Index(fields=['collection', '-created_at', '-id'],
+                         name='wagtailvideos_coll_created'),
+        ]
 
-class TranscodingThread(threading.Thread):
-    def __init__(self, transcode, **kwargs):
-        super(TranscodingThread, self).__init__(**kwargs)
-        self.transcode = transcode
 
-    def run(self):
-        video = self.transcode.video
-        media_format = self.transcode.media_format
-        input_file = video.file.path
-        output_dir = tempfile.mkdtemp()
-        transcode_name = "{0}.{1}".format(
-            video.filename(include_ext=False),
-            media_format.name)
-
-        output_file = os.path.join(output_dir, transcode_name)
-        FNULL = open(os.devnull, 'r')
-        quality_param = media_format.get_quality_param(self.transcode.quality)
-        args = ['ffmpeg', '-hide_banner', '-i', input_file]
-        try:
+def transcode_video(transcode):
+    """
+    Create the file for a transcode that has been locked with
+    ``lock_transcode``, waiting for ffmpeg to finish.
+    """
+    video = transcode.video
+    media_format = transcode.media_format
+    output_dir = tempfile.mkdtemp(prefix=ffmpeg.TEMP_PREFIX)
+    transcode_name = "{0}.{1}".format(
+        video.filename(include_ext=False),
+        media_format.name)
+
+    output_file = os.path.join(output_dir, transcode_name)
+    # Transcoding again replaces the file from last time
+    previous_file = transcode.file
+    FNULL = open(os.devnull, 'r')
+    quality_param = media_format.get_quality_param(transcode.quality)
+    try:
+        with get_local_file(video.file) as input_file:
+            args = ['ffmpeg', '-hide_banner', '-i', input_file]
             if media_format is MediaFormats.ogg:
                 subprocess.check_output(args + [
                     '-codec:v', 'libtheora',
@@ -276,16 +457,32 @@ class TranscodingThread(threading.Thread):
                     '-codec:a', 'libvorbis',
                     output_file,
                 ], stdin=FNULL, stderr=subprocess.STDOUT)
-            self.transcode.file = ContentFile(
-                open(output_file, 'rb').read(), transcode_name)
-            self.transcode.error_message = ''
-        except subprocess.CalledProcessError as error:
-            self.transcode.error_message = error.output
+        info = ffmpeg.get_video_info(output_file)
+        transcode.width = info['width']
+        transcode.height = info['height']
+        transcode.bitrate = info['bitrate']
+        transcode.file = ContentFile(
+            open(output_file, 'rb').read(), transcode_name)
+        transcode.error_message = ''
+    except subprocess.CalledProcessError as error:
+        transcode.error_message = error.output
+
+    finally:
+        FNULL.close()
+        transcode.processing = False
+        transcode.save()
+        if previous_file.name != transcode.file.name:
+            delete_field_file(previous_file)
+        shutil.rmtree(output_dir, ignore_errors=True)
 
-        finally:
-            self.transcode.processing = False
-            self.transcode.save()
-            shutil.rmtree(output_dir, ignore_errors=True)
+
+class TranscodingThread(threading.Thread):
+    def __init__(self, transcode, **kwargs):
+        super(TranscodingThread, self).__init__(**kwargs)
+        self.transcode = transcode
+
+    def run(self):
+        transcode_video(self.transcode)
 
 
 @contextmanager
@@ -294,28 +491,103 @@ def get_local_file(file):
     Get a local version of the file, downloading it from the remote storage if
     required. The returned value should be used as a context manager to
     ensure any temporary files are cleaned up afterwards.
+
+    Files that can be cached are kept in ``wagtailvideos.local_cache``, so
+    that they are downloaded once, rather than for each use.
     """
     try:
-        with open(file.path):
-            yield file.path
+        path = file.path
     except NotImplementedError:
-        _, ext = os.path.splitext(file.name)
-        with NamedTemporaryFile(prefix='wagtailvideo-', suffix=ext) as tmp:
-            try:
-                file.open('rb')
-                for chunk in file.chunks():
-                    tmp.write(chunk)
-            finally:
-                file.close()
-            tmp.flush()
-            yield tmp.name
+        path = None
+    if path is not None:
+        with open(path):
+            yield path
+        return
+
+    key = local_cache.get_cache_key(file) if local_cache.get_cache_size() else None
+    if key is not None:
+        with local_cache.cached_file(file, key) as path:
+            yield path
+        return
+
+    _, ext = os.path.splitext(file.name)
+    with NamedTemporaryFile(prefix=ffmpeg.TEMP_PREFIX, suffix=ext) as tmp:
+        try:
+            file.open('rb')
+            for chunk in file.chunks():
+                tmp.write(chunk)
+        finally:
+            file.close()
+        tmp.flush()
+        yield tmp.name
+
+
+def needs_metadata(video):
+    return not video.thumbnail or video.duration is None or video.file_size is None
+
+
+def fill_metadata(video, refresh=False):
+    """
+    Fill in the thumbnail, duration and file size of a video from its file,
+    without saving it. Values that are already there are kept, unless
+    ``refresh`` is set. The thumbnail and duration need ffmpeg.
+    """
+    missing = refresh or not video.thumbnail or video.duration is None
+    if missing and ffmpeg.installed():
+        with get_local_file(video.file) as file_path:
+            if refresh or not video.thumbnail:
+                video.thumbnail = ffmpeg.get_thumbnail(file_path)
+
+            if refresh or video.duration is None:
+                video.duration = ffmpeg.get_duration(file_path)
+
+    video.file_size = video.file.size
+
+
+_deleted_files = threading.local()
+
+
+@contextmanager
+def collect_deleted_files():
+    """
+    Collect the files of videos and transcodes deleted inside the block,
+    rather than queueing them for deletion one at a time as each is
+    deleted. Yields a list of ``(model label, field name, file name)`` to be
+    passed to ``wagtailvideos.deletion.queue_file_deletions``. Meant for
+    deleting videos, so the sources of the videos of deleted transcodes
+    aren't updated either.
+    """
+    _deleted_files.files = files = []
+    try:
+        yield files
+    finally:
+        del _deleted_files.files
+
+
+def is_collecting_deleted_files():
+    return hasattr(_deleted_files, 'files')
+
+
+def delete_field_file(field_file):
+    """
+    Delete the file of ``field_file`` from storage in the background, once
+    the transaction commits. See ``wagtailvideos.deletion``.
+    """
+    if not field_file.name:
+        return
+    file = (field_file.instance._meta.label, field_file.field.name, field_file.name)
+    if is_collecting_deleted_files():
+        _deleted_files.files.append(file)
+    else:
+        from wagtailvideos.deletion import queue_file_deletions
+        queue_file_deletions([file])
 
 
 # Delete files when model is deleted
 @receiver(pre_delete, sender=Video)
 def video_delete(sender, instance, **kwargs):
-    instance.thumbnail.delete(False)
-    instance.file.delete(False)
+    delete_field_file(instance.thumbnail)
+    delete_field_file(instance.file)
 
 
 # Fields that need the actual video file to create
@@ -328,16 +600,7 @@ def video_saved(sender, instance, **kwargs):
         return
 
     has_changed = instance._initial_file is not instance.file
-    filled_out = instance.thumbnail is not None and instance.duration is not None
-    if has_changed or not filled_out:
-        with get_local_file(instance.file) as file_path:
-            if has_changed or instance.thumbnail is None:
-                instance.thumbnail = ffmpeg.get_thumbnail(file_path)
-
-            if has_changed or instance.duration is None:
-                instance.duration = ffmpeg.get_duration(file_path)
-
-    instance.file_size = instance.file.size
+    fill_metadata(instance, refresh=has_changed)
     instance._from_signal = True
     instance.save()
     del instance._from_signal
@@ -347,18 +610,30 @@ class AbstractVideoTranscode(models.Model):
     media_format = EnumChoiceField(MediaFormats)
     quality = EnumChoiceField(VideoQuality, default=VideoQuality.default)
     processing = models.BooleanField(default=False)
-    file = models.FileField(null=True, blank=True, verbose_name=_('file'),
-                            upload_to=get_upload_to)
+    file = VideoFileField(null=True, blank=True, verbose_name=_('file'),
+                          upload_to=get_upload_to)
     error_message = models.TextField(blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    bitrate = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     @property
     def url(self):
         return self.file.url
 
+    def get_source(self):
+        return {
+            'name': self.file.name,
+            'type': self.media_format.get_mime_type(),
+            'width': self.width,
+            'height': self.height,
+            'bitrate': self.bitrate,
+        }
+
     def get_upload_to(self, filename):
         folder_name = 'video_transcodes'
-        filename = self.file.field.storage.get_valid_name(filename)
-        return os.path.join(folder_name, filename)
+        max_length = self._meta.get_field('file').max_length
+        return get_upload_path(self, folder_name, filename, max_length)
 
     class Meta:
         abstract = True
@@ -373,7 +648,106 @@ class VideoTranscode(AbstractVideoTranscode):
         )
 
 
+class VideoReference(models.Model):
+    """
+    A use of a video by another object, such as a page with a video chooser
+    panel. Kept up to date by ``wagtailvideos.references`` as those objects
+    are saved, so the usage of a video can be looked up without scanning
+    every model that can refer to videos.
+    """
+    video = models.ForeignKey(Video, related_name='references', on_delete=models.CASCADE)
+    content_type = models.ForeignKey(ContentType, related_name='+', on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = (
+            ('video', 'content_type', 'object_id')
+        )
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='wagtailvideos_ref_object'),
+        ]
+
+
+class VideoBulkJob(models.Model):
+    """
+    The work on files left over from a bulk action in the admin, such as
+    transcoding the selected videos. Done in the background by
+    ``wagtailvideos.bulk.run_job``, which keeps the counts up to date.
+    """
+    TRANSCODE = 'transcode'
+    ACTION_CHOICES = (
+        (TRANSCODE, _('Transcode')),
+    )
+
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    # JSON list of the IDs of the transcodes to process
+    items = models.TextField(editable=False)
+    total = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, editable=False,
+        related_name='+', on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, editable=False)
+
+    def get_items(self):
+        return json.loads(self.items)
+
+    @property
+    def is_finished(self):
+        return self.finished_at is not None
+
+    @property
+    def percent_complete(self):
+        if not self.total:
+            return 100
+        return (self.done + self.failed) * 100 // self.total
+
+
+class VideoFileDeletion(models.Model):
+    """
+    A file to delete from storage, left behind by a deleted video or
+    transcode. Recorded in the same transaction as the deletion, and
+    deleted from storage afterwards by ``wagtailvideos.deletion``.
+    """
+    model = models.CharField(max_length=100)
+    field = models.CharField(max_length=100)
+    name = models.CharField(max_length=255)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
 # Delete files when model is deleted
 @receiver(pre_delete, sender=VideoTranscode)
 def transcode_delete(sender, instance, **kwargs):
-    instance.file.delete(False)
+    delete_field_file(instance.file)
+
+
+# Keep the sources snapshot on the video up to date
+@receiver(post_save, sender=VideoTranscode)
+@receiver(post_delete, sender=VideoTranscode)
+def transcode_changed(sender, instance, **kwargs):
+    if is_collecting_deleted_files():
+        # The video is being deleted too
+        return
+    Video(pk=instance.video_id).update_sources()
+
+
+# Recount the popular tags in the admin when tags on videos change
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def tagged_item_changed(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Video).pk:
+        clear_popular_tags(Video)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    clear_popular_tags(Video)
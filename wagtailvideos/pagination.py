@@ -0,0 +1,178 @@
+"""
+Keyset pagination for video listings. Rather than skipping ``OFFSET`` rows,
+each page starts after the ``(created_at, id)`` of the last video on the
+previous page, so deep pages are as fast as the first one.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.dateparse import parse_datetime
+
+# Estimates below this are replaced by an exact count, which is cheap then
+EXACT_COUNT_BELOW = 1000
+
+# The fields the video listings render. ``file`` is read by ``Video.__init__``
+LISTING_FIELDS = ['id', 'title', 'file', 'thumbnail', 'created_at']
+
+
+def encode_cursor(video):
+    value = '{0}|{1}'.format(video.created_at.isoformat(), video.pk)
+    return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` from a cursor, or ``None`` if it is invalid"""
+    try:
+        cursor = cursor.encode('ascii')
+        cursor += b'=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(cursor).decode('utf-8').split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (TypeError, ValueError, UnicodeError):
+        return None
+    if created_at is None:
+        return None
+    return (created_at, pk)
+
+
+def estimate_count(queryset):
+    """
+    The query planner's estimate of the number of rows in ``queryset``, or
+    ``None`` if the database can't estimate it.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if not isinstance(plan, list):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_count(queryset):
+    """
+    Count the videos in ``queryset``, according to
+    ``WAGTAILVIDEOS_COUNT_MODE``:
+
+    ``'exact'``
+        ``COUNT(*)``, the default
+    ``'estimated'``
+        the query planner's estimate on PostgreSQL, for large tables where
+        counting is slow
+    ``None``
+        don't count
+
+    Returns ``(count, is_estimate)``.
+    """
+    mode = getattr(settings, 'WAGTAILVIDEOS_COUNT_MODE', 'exact')
+    if mode is None:
+        return None, False
+    if mode == 'estimated':
+        estimate = estimate_count(queryset)
+        if estimate is not None and estimate >= EXACT_COUNT_BELOW:
+            return estimate, True
+    return queryset.count(), False
+
+
+class KeysetPage(object):
+    """
+    A page of videos, with cursors for the pages either side of it. Can be
+    used in templates much like a ``django.core.paginator.Page``.
+    """
+
+    def __init__(self, object_list, has_previous, has_next, count=None, count_is_estimate=False,
+                 params=None):
+        self.object_list = object_list
+        self.params = params if params is not None else QueryDict()
+        self._has_previous = has_previous
+        self._has_next = has_next
+        self.count = count
+        self.count_is_estimate = count_is_estimate
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+
+    @property
+    def previous_page_query(self):
+        """The query string for the previous page, keeping other parameters"""
+        return self.get_page_query('before', self.previous_cursor)
+
+    @property
+    def next_page_query(self):
+        """The query string for the next page, keeping other parameters"""
+        return self.get_page_query('after', self.next_cursor)
+
+    def get_page_query(self, key, cursor):
+        params = self.params.copy()
+        for param in ['after', 'before', 'p']:
+            params.pop(param, None)
+        params[key] = cursor
+        return params.urlencode()
+
+
+def paginate_by_keyset(request, queryset, per_page=20, count=True):
+    """
+    Get the page of ``queryset`` that the ``after`` or ``before`` parameter
+    of the request asks for, newest videos first. Without either, this is
+    the first page. Pass ``count=False`` to leave the page's ``count`` out.
+    """
+    queryset = queryset.order_by('-created_at', '-pk')
+    after = decode_cursor(request.GET.get('after', ''))
+    before = decode_cursor(request.GET.get('before', '')) if after is None else None
+
+    if after is not None:
+        created_at, pk = after
+        videos = list(queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+        )[:per_page + 1])
+        has_previous, has_next = True, len(videos) > per_page
+        videos = videos[:per_page]
+    elif before is not None:
+        created_at, pk = before
+        videos = list(queryset.filter(
+            Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+        ).reverse()[:per_page + 1])
+        has_previous, has_next = len(videos) > per_page, True
+        videos = list(reversed(videos[:per_page]))
+    else:
+        videos = list(queryset[:per_page + 1])
+        has_previous, has_next = False, len(videos) > per_page
+        videos = videos[:per_page]
+
+    if count:
+        count, count_is_estimate = get_count(queryset)
+    else:
+        count, count_is_estimate = None, False
+    return KeysetPage(videos, has_previous, has_next, count, count_is_estimate, params=request.GET)
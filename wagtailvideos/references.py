@@ -0,0 +1,293 @@
+"""
+Keeps the ``VideoReference`` index of where videos are used up to date.
+
+Videos are used through foreign keys and through ``VideoChooserBlock``\\s in
+StreamFields. These can be on a page, on an inline child object with a
+``ParentalKey`` to a page, or on any other model such as a snippet. Each
+reference is recorded against the page, or against the object itself for
+other models. When an object with one of these fields is saved or deleted,
+the videos used by its page or by the object are found again. This
+includes subclasses of those models, which inherit the fields.
+"""
+import sys
+from collections import namedtuple
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+from django.utils.text import capfirst
+from modelcluster.fields import ParentalKey
+from wagtail.core.blocks import ListBlock, StreamBlock, StructBlock
+from wagtail.core.fields import StreamField
+from wagtail.core.models import Page
+
+from wagtailvideos.blocks import VideoChooserBlock
+from wagtailvideos.models import Video, VideoReference
+
+BATCH_SIZE = 500
+
+# The migration that adds the reference index
+REFERENCES_MIGRATION = '0014_video_references'
+
+# A field that can refer to videos. ``owner_field`` is the ``ParentalKey``
+# to the page on page child objects, and ``None`` when the model itself is
+# the owner of its references
+ReferenceSource = namedtuple('ReferenceSource', ['model', 'field', 'owner_field'])
+
+# An object using a video, for listing on the usage page
+Usage = namedtuple('Usage', ['object', 'is_page', 'edit_url', 'type_name'])
+
+_sources = None
+
+
+def block_uses_videos(block):
+    if isinstance(block, VideoChooserBlock):
+        return True
+    if isinstance(block, (StreamBlock, StructBlock)):
+        return any(block_uses_videos(child) for child in block.child_blocks.values())
+    if isinstance(block, ListBlock):
+        return block_uses_videos(block.child_block)
+    return False
+
+
+def find_block_video_ids(block, value):
+    """The IDs of the videos in the raw JSON-ish ``value`` of ``block``"""
+    if not value:
+        return
+    if isinstance(block, VideoChooserBlock):
+        if isinstance(value, int):
+            yield value
+    elif isinstance(block, StreamBlock):
+        for item in value:
+            child = block.child_blocks.get(item.get('type'))
+            if child is not None:
+                for video_id in find_block_video_ids(child, item.get('value')):
+                    yield video_id
+    elif isinstance(block, StructBlock):
+        for name, child in block.child_blocks.items():
+            for video_id in find_block_video_ids(child, value.get(name)):
+                yield video_id
+    elif isinstance(block, ListBlock):
+        for item in value:
+            for video_id in find_block_video_ids(block.child_block, item):
+                yield video_id
+
+
+def get_owner_field(model):
+    """The ``ParentalKey`` to a page on ``model``, if it has one"""
+    for field in model._meta.fields:
+        if isinstance(field, ParentalKey) and issubclass(field.remote_field.model, Page):
+            return field
+    return None
+
+
+def get_reference_sources():
+    """Every field that can refer to videos, as ``ReferenceSource``\\s"""
+    global _sources
+    if _sources is not None:
+        return _sources
+
+    sources = []
+    for relation in Video._meta.get_fields(include_hidden=True):
+        if not ((relation.one_to_many or relation.one_to_one) and relation.auto_created):
+            continue
+        model = relation.related_model
+        # Transcodes and references belong to the video, they don't use it
+        if model._meta.app_label == Video._meta.app_label:
+            continue
+        sources.append(ReferenceSource(model, relation.field, get_owner_field(model)))
+
+    for model in apps.get_models():
+        for field in model._meta.local_fields:
+            if isinstance(field, StreamField) and block_uses_videos(field.stream_block):
+                sources.append(ReferenceSource(model, field, get_owner_field(model)))
+
+    _sources = sources
+    return sources
+
+
+def get_owner_model(source):
+    if source.owner_field is not None or issubclass(source.model, Page):
+        return Page
+    return source.model
+
+
+def get_owner_attname(source):
+    return 'pk' if source.owner_field is None else source.owner_field.attname
+
+
+def get_source_video_ids(source, objects):
+    """``(owner_id, video_id)`` pairs for the videos used in ``objects``"""
+    owner_attname = get_owner_attname(source)
+    if isinstance(source.field, StreamField):
+        rows = objects.values_list(owner_attname, source.field.attname)
+        for owner_id, value in rows.iterator():
+            # Lazily loaded stream values give back their raw data unchanged
+            prep_value = source.field.stream_block.get_prep_value(value)
+            for video_id in find_block_video_ids(source.field.stream_block, prep_value):
+                yield owner_id, video_id
+    else:
+        rows = objects.filter(**{source.field.attname + '__isnull': False})
+        for owner_id, video_id in rows.values_list(owner_attname, source.field.attname).iterator():
+            yield owner_id, video_id
+
+
+def find_references(owner_model, owner_id):
+    """The IDs of the videos used by one page, or by one other object"""
+    video_ids = set()
+    for source in get_reference_sources():
+        if get_owner_model(source) is not owner_model:
+            continue
+        objects = source.model._base_manager.filter(**{get_owner_attname(source): owner_id})
+        video_ids.update(video_id for _, video_id in get_source_video_ids(source, objects))
+    return video_ids
+
+
+def set_references(content_type, object_id, video_ids):
+    """Record that an object uses exactly the videos in ``video_ids``"""
+    references = VideoReference.objects.filter(content_type=content_type, object_id=object_id)
+    existing = set(references.values_list('video_id', flat=True))
+    new_ids = video_ids - existing
+    if new_ids:
+        # Stream data can still refer to videos that have been deleted
+        new_ids = set(Video.objects.filter(pk__in=new_ids).values_list('pk', flat=True))
+    video_ids = (video_ids & existing) | new_ids
+
+    removed = existing - video_ids
+    if removed:
+        references.filter(video_id__in=removed).delete()
+
+    added = [
+        VideoReference(video_id=video_id, content_type=content_type, object_id=object_id)
+        for video_id in video_ids - existing]
+    if added:
+        try:
+            with transaction.atomic():
+                VideoReference.objects.bulk_create(added)
+        except IntegrityError:
+            # Another save of the same object got there first
+            for reference in added:
+                VideoReference.objects.get_or_create(
+                    video_id=reference.video_id, content_type=content_type, object_id=object_id)
+
+
+def update_references(owner_model, owner_id):
+    set_references(
+        ContentType.objects.get_for_model(owner_model), owner_id,
+        find_references(owner_model, owner_id))
+
+
+def find_all_references():
+    """Every ``(content_type_id, object_id, video_id)`` of an object using a video"""
+    video_ids = set(Video.objects.values_list('pk', flat=True).iterator())
+    found = set()
+    for source in get_reference_sources():
+        content_type = ContentType.objects.get_for_model(get_owner_model(source))
+        found.update(
+            (content_type.pk, owner_id, video_id)
+            for owner_id, video_id in get_source_video_ids(source, source.model._base_manager.all())
+            if video_id in video_ids)
+    return found
+
+
+def rebuild_references():
+    """
+    Bring the whole reference index up to date, such as after installing or
+    upgrading. Returns the number of references added and removed.
+    """
+    found = find_all_references()
+    existing = {
+        (content_type_id, object_id, video_id): pk
+        for pk, content_type_id, object_id, video_id in VideoReference.objects.values_list(
+            'pk', 'content_type_id', 'object_id', 'video_id').iterator()}
+
+    stale = [pk for reference, pk in existing.items() if reference not in found]
+    for start in range(0, len(stale), BATCH_SIZE):
+        VideoReference.objects.filter(pk__in=stale[start:start + BATCH_SIZE]).delete()
+
+    VideoReference.objects.bulk_create([
+        VideoReference(content_type_id=content_type_id, object_id=object_id, video_id=video_id)
+        for content_type_id, object_id, video_id in found
+        if (content_type_id, object_id, video_id) not in existing
+    ], batch_size=BATCH_SIZE)
+    return len(found) - (len(existing) - len(stale)), len(stale)
+
+
+def build_references_after_upgrade(sender, plan=None, using=None, verbosity=1, stdout=sys.stdout, **kwargs):
+    """
+    Build the index for existing content when ``migrate`` creates it, once
+    every app has been migrated. A data migration could only see the
+    historical models, which don't have the StreamField blocks to look in.
+    """
+    created = any(
+        migration.app_label == 'wagtailvideos' and migration.name == REFERENCES_MIGRATION and not backwards
+        for migration, backwards in plan or [])
+    if not created or not Video.objects.using(using).exists():
+        return
+    added, removed = rebuild_references()
+    if verbosity >= 1:
+        stdout.write("Added {0} video references for existing content\n".format(added))
+
+
+def get_edit_url(obj):
+    if isinstance(obj, Page):
+        return reverse('wagtailadmin_pages:edit', args=(obj.pk,))
+    if apps.is_installed('wagtail.snippets'):
+        from wagtail.snippets.models import get_snippet_models
+        if type(obj) in get_snippet_models():
+            return reverse('wagtailsnippets:edit', args=(
+                obj._meta.app_label, obj._meta.model_name, obj.pk))
+    return None
+
+
+def get_usages(references):
+    """
+    The objects referred to by ``references``, as ``Usage``\\s in the same
+    order, with one query per type of object.
+    """
+    references = list(references)
+    ids_by_model = {}
+    for reference in references:
+        model = reference.content_type.model_class()
+        if model is not None:
+            ids_by_model.setdefault(model, set()).add(reference.object_id)
+
+    objects = {}
+    for model, ids in ids_by_model.items():
+        queryset = model._default_manager.filter(pk__in=ids)
+        if model is Page:
+            queryset = queryset.select_related('content_type')
+        for obj in queryset:
+            objects[(model, obj.pk)] = obj
+
+    usages = []
+    for reference in references:
+        obj = objects.get((reference.content_type.model_class(), reference.object_id))
+        if obj is not None:
+            usages.append(Usage(
+                obj, isinstance(obj, Page), get_edit_url(obj), capfirst(obj._meta.verbose_name)))
+    return usages
+
+
+def object_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    owners = set()
+    for source in get_reference_sources():
+        # Signals are only sent for the class that was saved, which can be
+        # a subclass of the model with the field
+        if not issubclass(sender, source.model):
+            continue
+        owner_id = instance.pk if source.owner_field is None else getattr(
+            instance, source.owner_field.attname)
+        if owner_id is not None:
+            owners.add((get_owner_model(source), owner_id))
+    for owner_model, owner_id in owners:
+        update_references(owner_model, owner_id)
+
+
+def connect_signals():
+    post_save.connect(object_changed, dispatch_uid='wagtailvideos_references')
+    post_delete.connect(object_changed, dispatch_uid='wagtailvideos_references')
@@ -0,0 +1,8 @@
+from django.conf.urls import url
+
+from wagtailvideos.views import serve
+
+urlpatterns = [
+    url(r'^(\d+)/$', serve.serve, name='wagtailvideos_serve'),
+    url(r'^(\d+)/(\w+)/$', serve.serve, name='wagtailvideos_serve_transcode'),
+]
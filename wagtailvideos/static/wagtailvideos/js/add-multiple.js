@@ -10,9 +10,38 @@ $(function() {
         e.preventDefault();
     });
 
+    // Identifies a file across attempts to upload it, so that an interrupted
+    // chunked upload can resume where it stopped
+    function uploadId(file) {
+        return [file.name, file.size, file.lastModified].join(':');
+    }
+
+    // Ask the server how much of a file it already has, then (re)submit it
+    function resumeUpload(data) {
+        if (!window.fileupload_opts.chunk_size) {
+            return data.submit();
+        }
+        $.getJSON(window.fileupload_opts.offset_url, {upload_id: uploadId(data.files[0])}, function(result) {
+            data.uploadedBytes = result.offset;
+            data.data = null;
+            data.submit();
+        }).fail(function() {
+            data.submit();
+        });
+    }
+
+    var maxRetries = 5;
+    var retryDelay = 1000;
+
     $('#fileupload').fileupload({
         dataType: 'html',
-        sequentialUploads: true,
+        limitConcurrentUploads: window.fileupload_opts.concurrent_uploads,
+        maxChunkSize: window.fileupload_opts.chunk_size || undefined,
+        formData: function(form) {
+            var formData = form.serializeArray();
+            formData.push({name: 'upload_id', value: uploadId(this.files[0])});
+            return formData;
+        },
         dropZone: $('.drop-zone'),
         acceptFileTypes: window.fileupload_opts.accepted_file_types,
         maxFileSize: window.fileupload_opts.max_file_size,
@@ -42,7 +71,7 @@ $(function() {
                 if ((that._trigger('added', e, data) !== false) &&
                         (options.autoUpload || data.autoUpload) &&
                         data.autoUpload !== false) {
-                    data.submit()
+                    resumeUpload(data);
                 }
             }).fail(function() {
                 if (data.files.error) {
@@ -104,11 +133,38 @@ $(function() {
 
         fail: function(e, data) {
             var itemElement = $(data.context);
+            var retries = itemElement.data('retries') || 0;
+
+            // The server is busy with our other uploads, so try again when
+            // it says to. This doesn't count as a failed attempt.
+            if (data.jqXHR && data.jqXHR.status === 429) {
+                var retryAfter = parseInt(data.jqXHR.getResponseHeader('Retry-After'), 10) || 5;
+                itemElement.data('retrying', true);
+                setTimeout(function() {
+                    itemElement.data('retrying', false);
+                    resumeUpload(data);
+                }, retryAfter * 1000);
+                return;
+            }
+
+            // Resume interrupted chunked uploads after a short wait
+            if (window.fileupload_opts.chunk_size && data.errorThrown !== 'abort' && retries < maxRetries) {
+                itemElement.data('retries', retries + 1).data('retrying', true);
+                setTimeout(function() {
+                    itemElement.data('retrying', false);
+                    resumeUpload(data);
+                }, retryDelay * (retries + 1));
+                return;
+            }
+
             itemElement.addClass('upload-failure');
         },
 
         always: function(e, data) {
             var itemElement = $(data.context);
+            if (itemElement.data('retrying')) {
+                return;
+            }
             itemElement.removeClass('upload-uploading').addClass('upload-complete');
         }
     });
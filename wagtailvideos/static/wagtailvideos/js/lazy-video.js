@@ -0,0 +1,50 @@
+(function() {
+    // Swap the placeholders rendered by {% video ... lazy %} for the real
+    // <video> element, either when they scroll into view or when clicked.
+    function load(container, play) {
+        if (!container.parentNode) {
+            return;
+        }
+        var template = container.querySelector('template');
+        var content = document.importNode(template.content, true);
+        var video = content.querySelector('video');
+        container.parentNode.replaceChild(content, container);
+        if (play && video) {
+            video.play();
+        }
+    }
+
+    function init() {
+        var containers = document.querySelectorAll('[data-wagtailvideos-lazy]');
+        var observer = null;
+
+        if ('IntersectionObserver' in window) {
+            observer = new IntersectionObserver(function(entries) {
+                entries.forEach(function(entry) {
+                    if (entry.isIntersecting) {
+                        observer.unobserve(entry.target);
+                        load(entry.target, false);
+                    }
+                });
+            }, {rootMargin: '200px'});
+        }
+
+        Array.prototype.forEach.call(containers, function(container) {
+            container.querySelector('.wagtailvideos-lazy-play').addEventListener('click', function() {
+                if (observer) {
+                    observer.unobserve(container);
+                }
+                load(container, true);
+            });
+            if (observer) {
+                observer.observe(container);
+            }
+        });
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
@@ -26,3 +26,67 @@ function createVideoChooser(id) {
         chooserElement.addClass('blank');
     });
 }
+
+/* Renders pages of videos from the chooser API into the chooser modal.
+Only the latest request counts, so a slow response for an earlier keystroke
+never replaces the results for a later one. */
+function VideoChooserResults(container, options) {
+    var request = null;
+
+    function truncate(text, length) {
+        return text.length > length ? text.substr(0, length - 1) + '…' : text;
+    }
+
+    function pageLink(url, className, text) {
+        return $('<a href="#"></a>').addClass('icon ' + className).attr('data-url', url).text(text);
+    }
+
+    function render(data) {
+        container.empty();
+        if (!data.items.length) {
+            container.append($('<h2></h2>').text(options.noResultsText));
+            return;
+        }
+
+        var list = $('<ul class="listing horiz images chooser"></ul>');
+        $.each(data.items, function(i, video) {
+            var thumbnail = $('<img width="165" height="165" class="show-transparency">');
+            if (video.thumbnail) {
+                thumbnail.attr('src', video.thumbnail);
+            }
+            $('<li></li>').append(
+                $('<a class="image-choice"></a>')
+                    .attr('href', options.chosenUrl.replace(/\/0\/$/, '/' + video.id + '/'))
+                    .append($('<div class="image"></div>').append(thumbnail))
+                    .append($('<h3></h3>').text(truncate(video.title, 60)))
+            ).appendTo(list);
+        });
+        container.append(list);
+
+        var pagination = $('<div class="pagination"><ul><li class="prev"></li><li class="next"></li></ul></div>');
+        if (data.previous) {
+            pagination.find('.prev').append(pageLink(data.previous, 'icon-arrow-left', options.previousText));
+        }
+        if (data.next) {
+            pagination.find('.next').append(pageLink(data.next, 'icon-arrow-right-after', options.nextText));
+        }
+        container.append(pagination);
+    }
+
+    this.load = function(url, params) {
+        if (request) {
+            request.abort();
+        }
+        var thisRequest = request = $.ajax({url: url, data: params, dataType: 'json'});
+        thisRequest.done(function(data) {
+            render(data);
+            if (options.onLoad) {
+                options.onLoad(container);
+            }
+        }).always(function() {
+            if (request === thisRequest) {
+                request = null;
+            }
+        });
+    };
+}
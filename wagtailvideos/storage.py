@@ -0,0 +1,182 @@
+import hashlib
+import os.path
+import re
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.db.models.fields.files import FieldFile, ImageFieldFile
+
+# Names produced by get_upload_path when content addressing is enabled:
+# 'some_video.0123456789ab.mp4'
+CONTENT_HASH_LENGTH = 12
+CONTENT_ADDRESSED_RE = re.compile(r'\.[0-9a-f]{%d}(\.[^./]*)?$' % CONTENT_HASH_LENGTH)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Names produced by get_upload_path when sharded paths are enabled:
+# 'original_videos/3f/a9/some_video.3fa9c01d22b87e61.mp4'. The first four
+# characters of the random token name the two directories it is stored in
+SHARD_TOKEN_LENGTH = 16
+SHARDED_NAME_RE = re.compile(
+    r'(^|/)([0-9a-f]{2})/([0-9a-f]{2})/[^/]*\.\2\3[0-9a-f]{%d}(\.[^/]*)?$' % (SHARD_TOKEN_LENGTH - 4))
+
+
+def content_addressed_names_enabled():
+    return getattr(settings, 'WAGTAILVIDEOS_CONTENT_ADDRESSED_NAMES', False)
+
+
+def sharded_paths_enabled():
+    return getattr(settings, 'WAGTAILVIDEOS_SHARDED_PATHS', False)
+
+
+def get_content_hash(file):
+    """
+    Return the SHA-256 hex digest of a file's content. Files that already
+    know their digest (such as uploads hashed as they arrived) are not read
+    again.
+    """
+    sha256 = getattr(file, 'sha256', None)
+    if sha256:
+        return sha256
+
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    sha256 = digest.hexdigest()
+    try:
+        # Remember it for the next caller
+        file.sha256 = sha256
+    except AttributeError:
+        pass
+    return sha256
+
+
+def get_uncommitted_file(instance, filename):
+    """
+    Find the not yet saved file that is being stored under ``filename``, as
+    an upload_to callable only gets the instance and the file name.
+    """
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            field_file = getattr(instance, field.attname)
+            if field_file and not field_file._committed and field_file.name == filename:
+                return field_file.file
+    return None
+
+
+def get_upload_path(instance, folder_name, filename, max_length):
+    """
+    Build the storage path for a new file. With
+    ``WAGTAILVIDEOS_CONTENT_ADDRESSED_NAMES`` enabled, a hash of the content
+    is added before the extension, so that a stored path never refers to
+    different content and can be cached forever.
+
+    With ``WAGTAILVIDEOS_SHARDED_PATHS`` enabled, a random token is added
+    too, and the file is stored two directories down, named after the start
+    of the token, so that no one directory holds more than a small share of
+    the files. The token makes the name unique, so storage is not asked
+    whether it is taken (see ``save_file``).
+
+    The file name is truncated to fit ``max_length``, keeping the extension,
+    the token and the content hash.
+    """
+    content = None
+    if content_addressed_names_enabled():
+        content = get_uncommitted_file(instance, filename)
+
+    storage = instance._meta.get_field('file').storage
+    filename = storage.get_valid_name(filename)
+    head, ext = os.path.splitext(filename)
+    if content is not None:
+        ext = '.{0}{1}'.format(get_content_hash(content)[:CONTENT_HASH_LENGTH], ext)
+    if sharded_paths_enabled():
+        token = uuid.uuid4().hex[:SHARD_TOKEN_LENGTH]
+        folder_name = os.path.join(folder_name, token[:2], token[2:4])
+        ext = '.{0}{1}'.format(token, ext)
+
+    # Truncate filename so it fits in the 100 character limit
+    # https://code.djangoproject.com/ticket/9893
+    file_path = os.path.join(folder_name, head + ext)
+    too_long = len(file_path) - max_length
+    if too_long > 0:
+        if too_long > len(head) + 1:
+            raise SuspiciousFileOperation('File name can not be shortened to a safe length')
+        file_path = os.path.join(folder_name, head[:-too_long] + ext)
+    return file_path
+
+
+def is_sharded_name(name):
+    return SHARDED_NAME_RE.search(name) is not None
+
+
+def save_file(storage, name, content, max_length=None):
+    """
+    Save ``content`` to ``storage`` as ``name``, like ``storage.save``.
+    Names made unique by get_upload_path are saved to a ``FileSystemStorage``
+    as they are, rather than checking that they are free first, which is
+    slow in very large directories. Its ``_save`` still picks another name
+    if the file exists after all. Other storages are saved to with
+    ``storage.save``, as it isn't known what their ``_save`` does with a
+    name that is taken. (django-storages' S3 storage doesn't ask S3 whether
+    a name is taken unless ``AWS_S3_FILE_OVERWRITE`` is off.)
+    """
+    if not is_sharded_name(name) or not isinstance(storage, FileSystemStorage):
+        return storage.save(name, content, max_length=max_length)
+    if not hasattr(content, 'chunks'):
+        content = File(content, name)
+    return storage._save(name, content)
+
+
+class UniqueNameFieldFileMixin(object):
+    def save(self, name, content, save=True):
+        name = self.field.generate_filename(self.instance, name)
+        self.name = save_file(self.storage, name, content, max_length=self.field.max_length)
+        setattr(self.instance, self.field.name, self.name)
+        self._committed = True
+
+        # Save the object because it has changed, unless save is False
+        if save:
+            self.instance.save()
+    save.alters_data = True
+
+
+class VideoFieldFile(UniqueNameFieldFileMixin, FieldFile):
+    pass
+
+
+class VideoImageFieldFile(UniqueNameFieldFileMixin, ImageFieldFile):
+    pass
+
+
+class VideoFileField(models.FileField):
+    attr_class = VideoFieldFile
+
+
+class VideoImageField(models.ImageField):
+    attr_class = VideoImageFieldFile
+
+
+def is_content_addressed(name):
+    """
+    Whether ``name`` was given a content hash by get_upload_path. Any name
+    can end in what looks like a hash, so only names stored while content
+    addressing is enabled are taken to have one.
+    """
+    return content_addressed_names_enabled() and CONTENT_ADDRESSED_RE.search(name) is not None
+
+
+def get_cache_control(name):
+    """
+    The ``Cache-Control`` header value suited to a stored file: content
+    addressed files never change, so they can be cached for a long time.
+    Returns ``None`` for other files. The value can be changed with
+    ``WAGTAILVIDEOS_IMMUTABLE_CACHE_CONTROL``, and is useful for configuring
+    the headers a CDN or remote storage sends too.
+    """
+    if not is_content_addressed(name):
+        return None
+    return getattr(settings, 'WAGTAILVIDEOS_IMMUTABLE_CACHE_CONTROL', IMMUTABLE_CACHE_CONTROL)
@@ -1,6 +1,6 @@
 {% load i18n %}
 function(modal) {
-    var searchUrl = $('form.video-search', modal.body).attr('action');
+    var apiUrl = '{% url "wagtailvideos:chooser_api" %}';
 
     /* currentTag stores the tag currently being filtered on, so that we can
     preserve this when paginating */
@@ -14,20 +14,32 @@ function(modal) {
 
         $('.pagination a', context).click(function() {
             var page = this.getAttribute("data-page");
-            setPage(page);
+            if (this.hasAttribute("data-url")) {
+                results.load(this.getAttribute("data-url"));
+            } else if (page) {
+                setPage({p: page});
+            } else if (this.hasAttribute("data-after")) {
+                setPage({after: this.getAttribute("data-after")});
+            } else {
+                setPage({before: this.getAttribute("data-before")});
+            }
             return false;
         });
     }
 
+    {% trans "Previous" as previous_text %}
+    {% trans "Next" as next_text %}
+    {% trans "Sorry, no videos match" as no_results_text %}
+    var results = new VideoChooserResults($('#image-results', modal.body), {
+        chosenUrl: '{% url "wagtailvideos:video_chosen" 0 %}',
+        previousText: '{{ previous_text|escapejs }}',
+        nextText: '{{ next_text|escapejs }}',
+        noResultsText: '{{ no_results_text|escapejs }}',
+        onLoad: ajaxifyLinks
+    });
+
     function fetchResults(requestData) {
-        $.ajax({
-            url: searchUrl,
-            data: requestData,
-            success: function(data, status) {
-                $('#image-results').html(data);
-                ajaxifyLinks($('#image-results'));
-            }
-        });
+        results.load(apiUrl, requestData);
     }
 
     function search() {
@@ -41,8 +53,7 @@ function(modal) {
         return false;
     }
 
-    function setPage(page) {
-        params = {p: page};
+    function setPage(params) {
         if ($('#id_q').val().length){
             params['q'] = $('#id_q').val();
         }
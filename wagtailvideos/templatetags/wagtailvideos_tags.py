@@ -2,6 +2,8 @@ from django import template
 
 register = template.Library()
 # {% video self.intro_video extra_att extra_att %}
+# {% video self.intro_video lazy extra_att %} renders a click/scroll to load facade
+# {% video self.intro_video lazy=use_facade %} does so if use_facade is true
 
 
 @register.tag(name="video")
@@ -25,7 +27,10 @@ def video(parser, token):
 class VideoNode(template.Node):
     def __init__(self, video, attrs={}):
         self.video = template.Variable(video)
-        self.attrs = attrs
+        self.attrs = attrs.copy()
+        lazy = self.attrs.pop('lazy', None)
+        # A bare ``lazy`` turns it on, ``lazy=value`` depends on the value
+        self.lazy = template.Variable(lazy) if lazy else lazy is not None
 
     def render(self, context):
         video = self.video.resolve(context)
@@ -33,4 +38,7 @@ class VideoNode(template.Node):
         if not video:
             raise template.TemplateSyntaxError("video tag requires a Video object as the first parameter")
 
-        return video.video_tag(self.attrs)
+        lazy = self.lazy
+        if isinstance(lazy, template.Variable):
+            lazy = bool(lazy.resolve(context))
+        return video.video_tag(self.attrs, lazy=lazy)
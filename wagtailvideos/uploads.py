@@ -0,0 +1,318 @@
+import hashlib
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files import locks
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from wagtailvideos.fields import get_max_upload_size
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+# How long a browser is asked to wait before retrying a refused upload
+UPLOAD_RETRY_AFTER = 5
+
+# Upload slots expire in case a worker dies without releasing its slot
+UPLOAD_SLOT_TIMEOUT = 60 * 60
+
+# How much of the start of a file is looked at to identify its container
+SNIFF_LENGTH = 4096
+
+# Brands of ISO base media files that are QuickTime or 3GPP rather than MP4
+FTYP_BRANDS = {
+    b'qt  ': 'video/quicktime',
+    b'3gp': 'video/3gpp',
+    b'3g2': 'video/3gpp2',
+}
+
+# Top level atoms that old QuickTime files may start with instead of 'ftyp'
+QUICKTIME_ATOMS = (b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot')
+
+
+def get_chunk_size():
+    """
+    Size of the chunks the multiple upload view sends files in. ``None``
+    sends each file in a single request.
+    """
+    return getattr(settings, 'WAGTAILVIDEOS_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+
+
+def get_concurrent_uploads():
+    """
+    How many files the multiple upload view sends at the same time.
+    """
+    return getattr(settings, 'WAGTAILVIDEOS_CONCURRENT_UPLOADS', 3)
+
+
+def get_max_uploads_per_user():
+    """
+    How many upload requests from one user the server handles at the same
+    time. ``None`` removes the limit.
+    """
+    return getattr(settings, 'WAGTAILVIDEOS_MAX_UPLOADS_PER_USER', get_concurrent_uploads())
+
+
+def get_chunked_upload_dir():
+    """
+    Where partial uploads are assembled. Must be shared by all web servers
+    that may receive chunks of the same upload.
+    """
+    return getattr(
+        settings, 'WAGTAILVIDEOS_CHUNKED_UPLOAD_DIR',
+        settings.FILE_UPLOAD_TEMP_DIR or tempfile.gettempdir())
+
+
+def parse_content_range(header):
+    """
+    Parse a ``Content-Range`` request header, as sent with each chunk, into
+    ``(start, end, total)``. Returns ``None`` if it is missing or invalid.
+    """
+    match = CONTENT_RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    start, end, total = (int(value) for value in match.groups())
+    if start > end or end >= total:
+        return None
+    return (start, end, total)
+
+
+def sniff_video_type(header):
+    """
+    Identify a video container from the first bytes of a file. Returns the
+    MIME type of the container, or ``None`` if it isn't a known one.
+    """
+    if header[4:8] == b'ftyp':
+        brand = header[8:12]
+        for prefix, mime_type in FTYP_BRANDS.items():
+            if brand.startswith(prefix):
+                return mime_type
+        return 'video/mp4'
+    if header[4:8] in QUICKTIME_ATOMS:
+        return 'video/quicktime'
+    if header.startswith(b'\x1a\x45\xdf\xa3'):
+        # EBML, with a DocType of either webm or matroska
+        return 'video/webm' if b'webm' in header[:64] else 'video/x-matroska'
+    if header.startswith(b'OggS'):
+        return 'video/ogg'
+    if header.startswith(b'RIFF') and header[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    if header.startswith(b'FLV'):
+        return 'video/x-flv'
+    if header.startswith(b'\x30\x26\xb2\x75\x8e\x66\xcf\x11'):
+        return 'video/x-ms-asf'
+    if header.startswith((b'\x00\x00\x01\xba', b'\x00\x00\x01\xb3')):
+        return 'video/mpeg'
+    if header[0:1] == b'G' and header[188:189] == b'G':
+        # MPEG transport stream packets are 188 bytes, each starting with G
+        return 'video/mp2t'
+    return None
+
+
+class ChunkOffsetError(Exception):
+    def __init__(self, offset):
+        super(ChunkOffsetError, self).__init__('Expected a chunk starting at {0}'.format(offset))
+        self.offset = offset
+
+
+class ChunkedUpload(object):
+    """
+    A file being uploaded in chunks. Chunks are appended to a file on disk as
+    they arrive, so an interrupted upload can carry on from the last chunk
+    that was received, and the file is never held in memory.
+
+    Uploads are identified by the uploading user and an ID chosen by the
+    browser, which stays the same when an upload of the same file resumes.
+    """
+
+    def __init__(self, user, upload_id):
+        key = hashlib.sha1('{0}:{1}'.format(user.pk, upload_id).encode('utf-8')).hexdigest()
+        self.path = os.path.join(get_chunked_upload_dir(), 'wagtailvideo-upload-{0}'.format(key))
+
+    @property
+    def offset(self):
+        """The number of bytes received so far"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, chunk, start):
+        """
+        Append the content of the uploaded file ``chunk``, which must start
+        where the previous chunk ended.
+        """
+        offset = self.offset
+        if start != offset:
+            raise ChunkOffsetError(offset)
+        with open(self.path, 'ab') as f:
+            # A retried chunk can arrive while the first try is still being
+            # written, so check again once nothing else can write
+            locks.lock(f, locks.LOCK_EX)
+            try:
+                offset = os.fstat(f.fileno()).st_size
+                if start != offset:
+                    raise ChunkOffsetError(offset)
+                for data in chunk.chunks():
+                    f.write(data)
+            finally:
+                locks.unlock(f)
+
+    def get_file(self, name, content_type):
+        """The assembled upload, for validating and saving like any other"""
+        f = UploadedFile(
+            open(self.path, 'rb'), name=name, content_type=content_type, size=self.offset)
+        f.video_type = sniff_video_type(f.read(SNIFF_LENGTH))
+        f.seek(0)
+        return f
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class UploadSlotUnavailable(Exception):
+    pass
+
+
+@contextmanager
+def upload_slot(user):
+    """
+    Hold one of the user's upload slots while handling an upload, raising
+    ``UploadSlotUnavailable`` if they are all taken. This stops one user's
+    batch from occupying every web worker.
+
+    The count is kept in the cache named by ``WAGTAILVIDEOS_UPLOAD_LIMIT_CACHE``
+    (``'default'`` by default), which must be shared between web servers and
+    support atomic increments for the limit to be exact.
+    """
+    limit = get_max_uploads_per_user()
+    if limit is None:
+        yield
+        return
+
+    cache = caches[getattr(settings, 'WAGTAILVIDEOS_UPLOAD_LIMIT_CACHE', 'default')]
+    key = 'wagtailvideos:uploads:{0}'.format(user.pk)
+    cache.add(key, 0, UPLOAD_SLOT_TIMEOUT)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expired since it was added
+        cache.add(key, 1, UPLOAD_SLOT_TIMEOUT)
+        count = 1
+
+    try:
+        if count > limit:
+            raise UploadSlotUnavailable
+        yield
+    finally:
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+
+
+class VideoUploadHandler(TemporaryFileUploadHandler):
+    """
+    Streams uploaded videos to a temporary file, while working out their
+    SHA-256 digest and size and identifying the container from the first few
+    KB. As soon as an upload turns out to be too big or not a video, the rest
+    of it is no longer written to disk or hashed. ``WagtailVideoField`` then
+    rejects it using what was found here.
+
+    Only files in ``field_names`` are inspected. For the chunks of a chunked
+    upload, only the first chunk is identified, and nothing is hashed.
+    """
+
+    def __init__(self, request=None, field_names=('file',)):
+        super(VideoUploadHandler, self).__init__(request)
+        self.field_names = field_names
+        self.content_range = None
+        if request is not None:
+            self.content_range = parse_content_range(request.META.get('HTTP_CONTENT_RANGE'))
+
+    def new_file(self, field_name, *args, **kwargs):
+        super(VideoUploadHandler, self).new_file(field_name, *args, **kwargs)
+        self.inspect = field_name in self.field_names
+        self.partial = self.content_range is not None
+        self.sniff = self.inspect and (not self.partial or self.content_range[0] == 0)
+        self.header = b''
+        self.video_type = None
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.rejected = False
+
+    def reject(self):
+        # Free the disk space used so far, the file is going to be refused
+        self.rejected = True
+        self.file.seek(0)
+        self.file.truncate()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.inspect:
+            return super(VideoUploadHandler, self).receive_data_chunk(raw_data, start)
+
+        self.size += len(raw_data)
+        if self.rejected:
+            return None
+
+        max_upload_size = get_max_upload_size()
+        if not self.partial and max_upload_size is not None and self.size > max_upload_size:
+            self.reject()
+            return None
+
+        if self.sniff and len(self.header) < SNIFF_LENGTH:
+            self.header += raw_data[:SNIFF_LENGTH - len(self.header)]
+            if len(self.header) == SNIFF_LENGTH and not self.identify():
+                return None
+
+        if not self.partial:
+            self.sha256.update(raw_data)
+        return super(VideoUploadHandler, self).receive_data_chunk(raw_data, start)
+
+    def identify(self):
+        self.video_type = sniff_video_type(self.header)
+        if self.video_type is None:
+            self.reject()
+            return False
+        return True
+
+    def file_complete(self, file_size):
+        if self.inspect and self.sniff and not self.rejected and len(self.header) < SNIFF_LENGTH:
+            # A file shorter than SNIFF_LENGTH
+            self.identify()
+
+        f = super(VideoUploadHandler, self).file_complete(file_size)
+        if self.inspect:
+            f.size = self.size
+            if self.sniff:
+                f.video_type = self.video_type
+            if not self.partial and not self.rejected:
+                f.sha256 = self.sha256.hexdigest()
+        return f
+
+
+def video_upload_handler(*field_names):
+    """
+    Use ``VideoUploadHandler`` for the files in ``field_names`` uploaded to a
+    view. Upload handlers have to be changed before the CSRF check reads the
+    request body, so the check is done by this decorator.
+    """
+    def decorator(view_func):
+        protected_view = csrf_protect(view_func)
+
+        @csrf_exempt
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            request.upload_handlers = [VideoUploadHandler(request, field_names=field_names)]
+            return protected_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,6 +1,6 @@
 from django.conf.urls import url
 
-from wagtailvideos.views import chooser, multiple, videos
+from wagtailvideos.views import bulk, chooser, multiple, videos
 
 app_name = 'wagtailvideos'
 urlpatterns = [
@@ -8,15 +8,21 @@ urlpatterns = [
     url(r'^(\d+)/$', videos.edit, name='edit'),
     url(r'^(\d+)/delete/$', videos.delete, name='delete'),
     url(r'^(\d+)/create_transcode/$', videos.create_transcode, name='create_transcode'),
+    url(r'^(\d+)/refresh_file_info/$', videos.refresh_file_info, name='refresh_file_info'),
 
     url(r'^add/$', videos.add, name='add'),
     url(r'^usage/(\d+)/$', videos.usage, name='video_usage'),
 
+    url(r'^bulk/$', bulk.bulk_action, name='bulk_action'),
+    url(r'^bulk/(\d+)/$', bulk.bulk_job, name='bulk_job'),
+
     url(r'^multiple/add/$', multiple.add, name='add_multiple'),
+    url(r'^multiple/add/offset/$', multiple.upload_offset, name='add_multiple_offset'),
     url(r'^multiple/(\d+)/$', multiple.edit, name='edit_multiple'),
     url(r'^multiple/(\d+)/delete/$', multiple.delete, name='delete_multiple'),
 
     url(r'^chooser/$', chooser.chooser, name='chooser'),
+    url(r'^chooser/api/$', chooser.chooser_api, name='chooser_api'),
     url(r'^chooser/(\d+)/$', chooser.video_chosen, name='video_chosen'),
     url(r'^chooser/upload/$', chooser.chooser_upload, name='chooser_upload'),
 ]
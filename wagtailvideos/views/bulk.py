@@ -0,0 +1,72 @@
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.translation import ugettext as _
+from django.utils.translation import ungettext
+from django.views.decorators.http import require_POST
+from wagtail.admin import messages
+from wagtail.admin.utils import PermissionPolicyChecker
+
+from wagtailvideos import bulk
+from wagtailvideos.forms import VideoBulkActionForm
+from wagtailvideos.models import VideoBulkJob
+from wagtailvideos.permissions import permission_policy
+
+permission_checker = PermissionPolicyChecker(permission_policy)
+
+
+@require_POST
+@permission_checker.require_any('change', 'delete')
+def bulk_action(request):
+    form = VideoBulkActionForm(request.user, request.POST, prefix='bulk')
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+        return redirect('wagtailvideos:index')
+
+    action = form.cleaned_data['action']
+    videos = form.cleaned_data['videos']
+    count = videos.count()
+
+    if action == form.DELETE:
+        if 'confirm' not in request.POST:
+            return render(request, 'wagtailvideos/videos/confirm_bulk_delete.html', {
+                'form': form,
+                'count': count,
+            })
+        bulk.delete_videos(videos)
+        messages.success(request, ungettext(
+            "One video deleted.", "{0} videos deleted.", count).format(count))
+    elif action == form.MOVE:
+        collection = form.cleaned_data['collection']
+        bulk.move_videos(videos, collection)
+        messages.success(request, ungettext(
+            "One video moved to '{1}'.", "{0} videos moved to '{1}'.", count).format(count, collection.name))
+    elif action == form.ADD_TAGS:
+        bulk.add_tags(videos, form.cleaned_data['tags'])
+        messages.success(request, ungettext(
+            "Tags added to one video.", "Tags added to {0} videos.", count).format(count))
+    elif action == form.TRANSCODE:
+        job = bulk.request_transcodes(
+            videos, form.cleaned_data['media_format'], form.cleaned_data['quality'], request.user)
+        if job is not None:
+            return redirect('wagtailvideos:bulk_job', job.pk)
+        messages.warning(request, _("The selected videos are already being transcoded."))
+    return redirect('wagtailvideos:index')
+
+
+@permission_checker.require_any('change', 'delete')
+def bulk_job(request, job_id):
+    job = get_object_or_404(VideoBulkJob, id=job_id)
+
+    if request.is_ajax():
+        return JsonResponse({
+            'total': job.total,
+            'done': job.done,
+            'failed': job.failed,
+            'finished': job.is_finished,
+        })
+
+    return render(request, 'wagtailvideos/videos/bulk_job.html', {
+        'job': job,
+    })
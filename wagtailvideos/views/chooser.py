@@ -1,20 +1,29 @@
+import hashlib
 import json
 
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
 from wagtail.admin.forms.search import SearchForm
 from wagtail.admin.modal_workflow import render_modal_workflow
-from wagtail.admin.utils import PermissionPolicyChecker, popular_tags_for_model
+from wagtail.admin.utils import PermissionPolicyChecker
 from wagtail.core.models import Collection
-from wagtail.search import index as search_index
+from wagtail.search.backends import get_search_backend
 from wagtail.utils.pagination import paginate
 
+from wagtailvideos.cache import get_popular_tags
 from wagtailvideos.forms import get_video_form
 from wagtailvideos.models import Video
+from wagtailvideos.pagination import LISTING_FIELDS, paginate_by_keyset
 from wagtailvideos.permissions import permission_policy
+from wagtailvideos.uploads import video_upload_handler
 
 permission_checker = PermissionPolicyChecker(permission_policy)
 
+CHOOSER_API_PAGE_SIZE = 12
+
 
 def get_video_json(video):
     """
@@ -39,10 +48,7 @@ def chooser(request):
     videos = Video.objects.order_by('-created_at')
 
     q = None
-    if (
-        'q' in request.GET or 'p' in request.GET or 'tag' in request.GET or
-        'collection_id' in request.GET
-    ):
+    if any(param in request.GET for param in ['q', 'p', 'tag', 'collection_id', 'after', 'before']):
         # this request is triggered from search, pagination or 'popular tags';
         # we will just render the results.html fragment
         collection_id = request.GET.get('collection_id')
@@ -63,7 +69,10 @@ def chooser(request):
                 videos = videos.filter(tags__name=tag_name)
 
         # Pagination
-        paginator, videos = paginate(request, videos, per_page=12)
+        if is_searching:
+            paginator, videos = paginate(request, videos, per_page=12)
+        else:
+            videos = paginate_by_keyset(request, videos.only(*LISTING_FIELDS), per_page=12)
 
         return render(request, "wagtailvideos/chooser/results.html", {
             'videos': videos,
@@ -73,11 +82,12 @@ def chooser(request):
     else:
         searchform = SearchForm()
 
+        # Only offer a choice when there's more than the root collection
         collections = Collection.objects.all()
-        if len(collections) < 2:
+        if collections.count() < 2:
             collections = None
 
-        paginator, videos = paginate(request, videos, per_page=12)
+        videos = paginate_by_keyset(request, videos.only(*LISTING_FIELDS), per_page=12)
 
     return render_modal_workflow(request, 'wagtailvideos/chooser/chooser.html', 'wagtailvideos/chooser/chooser.js', {
         'videos': videos,
@@ -85,11 +95,101 @@ def chooser(request):
         'searchform': searchform,
         'is_searching': False,
         'query_string': q,
-        'popular_tags': popular_tags_for_model(Video),
+        'popular_tags': get_popular_tags(Video),
         'collections': collections,
     })
 
 
+def autocomplete_videos(videos, query):
+    """
+    Match videos on the start of words in their titles, using the
+    ``partial_match`` title search field. Backends without an autocomplete
+    API get an ordinary partial match search on the title.
+    """
+    backend = get_search_backend()
+    if hasattr(backend, 'autocomplete'):
+        try:
+            return backend.autocomplete(query, videos, fields=['title'])
+        except NotImplementedError:
+            pass
+    return backend.search(query, videos, fields=['title'], partial_match=True)
+
+
+def get_video_api_json(video):
+    return {
+        'id': video.id,
+        'title': video.title,
+        'thumbnail': video.thumbnail.url if video.thumbnail else None,
+        'duration': video.duration.total_seconds() if video.duration else None,
+    }
+
+
+@require_safe
+def chooser_api(request):
+    """
+    Videos for the chooser as JSON, for searching as you type. Browsing is
+    paged with cursors, newest first. Search results are ordered by
+    relevance and paged by number. Responses have an ETag, so repeated
+    requests for an unchanged page get an empty ``304 Not Modified``.
+    """
+    videos = Video.objects.only(*LISTING_FIELDS + ['duration'])
+
+    collection_id = request.GET.get('collection_id')
+    if collection_id:
+        try:
+            videos = videos.filter(collection=int(collection_id))
+        except ValueError:
+            pass
+
+    tag_name = request.GET.get('tag')
+    params = request.GET.copy()
+    query = request.GET.get('q', '').strip()
+    if query:
+        if tag_name:
+            # Search backends can't filter on tags, only on the videos' IDs
+            videos = videos.filter(pk__in=Video.objects.filter(
+                tags__name=tag_name).values_list('pk', flat=True))
+        try:
+            page_number = max(int(request.GET.get('p', 1)), 1)
+        except ValueError:
+            page_number = 1
+        start = (page_number - 1) * CHOOSER_API_PAGE_SIZE
+        results = list(autocomplete_videos(videos, query)[start:start + CHOOSER_API_PAGE_SIZE + 1])
+        items = results[:CHOOSER_API_PAGE_SIZE]
+
+        previous_query = next_query = None
+        if page_number > 1:
+            params['p'] = page_number - 1
+            previous_query = params.urlencode()
+        if len(results) > CHOOSER_API_PAGE_SIZE:
+            params['p'] = page_number + 1
+            next_query = params.urlencode()
+    else:
+        if tag_name:
+            videos = videos.filter(tags__name=tag_name)
+        page = paginate_by_keyset(request, videos, per_page=CHOOSER_API_PAGE_SIZE, count=False)
+        items = page.object_list
+        previous_query = page.previous_page_query if page.has_previous() else None
+        next_query = page.next_page_query if page.has_next() else None
+
+    path = request.path
+    data = {
+        'items': [get_video_api_json(video) for video in items],
+        'previous': path + '?' + previous_query if previous_query is not None else None,
+        'next': path + '?' + next_query if next_query is not None else None,
+    }
+    content = json.dumps(data)
+    etag = '"{0}"'.format(hashlib.md5(content.encode('utf-8')).hexdigest())
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    # Only cached by the browser, which checks it is still current each time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 def video_chosen(request, video_id):
     video = get_object_or_404(Video, id=video_id)
 
@@ -99,6 +199,7 @@ def video_chosen(request, video_id):
     )
 
 
+@video_upload_handler('file')
 @permission_checker.require('add')
 def chooser_upload(request):
     VideoForm = get_video_form(Video)
@@ -113,9 +214,6 @@ def chooser_upload(request):
             video.uploaded_by_user = request.user
             video.save()
 
-            # Reindex the video to make sure all tags are indexed
-            search_index.insert_or_update_object(video)
-
             return render_modal_workflow(
                 request, None, 'wagtailvideos/chooser/video_chosen.js',
                 {'video_json': get_video_json(video)}
@@ -123,8 +221,7 @@ def chooser_upload(request):
     else:
         form = VideoForm()
 
-    videos = Video.objects.order_by('title')
-    paginator, videos = paginate(request, videos, per_page=12)
+    videos = paginate_by_keyset(request, Video.objects.only(*LISTING_FIELDS), per_page=12)
 
     return render_modal_workflow(
         request, 'wagtailvideos/chooser/chooser.html', 'wagtailvideos/chooser/chooser.js',
@@ -1,15 +1,24 @@
+from functools import wraps
+
+from django.core.exceptions import ValidationError
 from django.http import HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, render
+from django.template.defaultfilters import filesizeformat
 from django.template.loader import render_to_string
 from django.utils.encoding import force_text
+from django.utils.translation import ugettext as _
 from django.views.decorators.http import require_POST
 from django.views.decorators.vary import vary_on_headers
 from wagtail.admin.utils import PermissionPolicyChecker
-from wagtail.search.backends import get_search_backends
 
 from wagtailvideos.forms import get_video_form
+from wagtailvideos.indexing import batch_indexing
 from wagtailvideos.models import Video
 from wagtailvideos.permissions import permission_policy
+from wagtailvideos.uploads import (
+    UPLOAD_RETRY_AFTER, ChunkedUpload, ChunkOffsetError, UploadSlotUnavailable,
+    get_chunk_size, get_concurrent_uploads, parse_content_range, upload_slot,
+    video_upload_handler)
 
 permission_checker = PermissionPolicyChecker(permission_policy)
 
@@ -28,6 +37,124 @@ def get_video_edit_form(VideoModel):
     return VideoEditForm
 
 
+def add_video(request, VideoForm, uploaded_file):
+    # Build a form for validation
+    form = VideoForm({
+        'title': uploaded_file.name,
+        'collection': request.POST.get('collection'),
+    }, {
+        'file': uploaded_file,
+    })
+    if form.is_valid():
+        # Save
+        video = form.save(commit=False)
+        video.uploaded_by_user = request.user
+        video.save()
+
+        # Success! Send back an edit form
+        return JsonResponse({
+            'success': True,
+            'video_id': int(video.id),
+            'form': render_to_string('wagtailvideos/multiple/edit_form.html', {
+                'video': video,
+                'form': get_video_edit_form(Video)(
+                    instance=video, prefix='video-%d' % video.id),
+            }, request=request),
+        })
+    else:
+        # Validation error
+        return JsonResponse({
+            'success': False,
+
+            # https://github.com/django/django/blob/stable/1.6.x/django/forms/util.py#L45
+            'error_message': '\n'.join(['\n'.join([force_text(i) for i in v]) for k, v in form.errors.items()]),
+        })
+
+
+def add_upload(request, VideoForm):
+    if not request.FILES:
+        return HttpResponseBadRequest("Must upload a file")
+
+    uploaded_file = request.FILES['files[]']
+    chunked_upload = None
+    content_range = request.META.get('HTTP_CONTENT_RANGE')
+    if content_range:
+        # Part of a file uploaded in chunks
+        content_range = parse_content_range(content_range)
+        if content_range is None or not request.POST.get('upload_id'):
+            return HttpResponseBadRequest("Invalid chunked upload")
+        start, end, total = content_range
+
+        file_field = VideoForm.base_fields['file']
+        if file_field.max_upload_size is not None and total > file_field.max_upload_size:
+            return JsonResponse({
+                'success': False,
+                'error_message': file_field.error_messages['file_too_large'] % filesizeformat(total),
+            })
+
+        if start == 0:
+            # Don't wait for the rest of a file that isn't a video
+            try:
+                file_field.check_video_file_format(uploaded_file)
+            except ValidationError as e:
+                return JsonResponse({'success': False, 'error_message': '\n'.join(e.messages)})
+
+        if uploaded_file.size != end - start + 1:
+            # Cut short on the way, so appending it would corrupt the file
+            return HttpResponseBadRequest("Chunk does not match its Content-Range")
+
+        chunked_upload = ChunkedUpload(request.user, request.POST['upload_id'])
+        try:
+            chunked_upload.append(uploaded_file, start)
+        except ChunkOffsetError as e:
+            # The browser should carry on from the offset we have
+            return JsonResponse({'success': False, 'offset': e.offset}, status=409)
+
+        if end + 1 < total:
+            return JsonResponse({'success': True, 'offset': chunked_upload.offset})
+
+        if chunked_upload.offset != total:
+            chunked_upload.delete()
+            return HttpResponseBadRequest("Upload does not match its Content-Range")
+
+        # That was the last chunk, so carry on with the complete file
+        uploaded_file = chunked_upload.get_file(uploaded_file.name, uploaded_file.content_type)
+
+    try:
+        return add_video(request, VideoForm, uploaded_file)
+    finally:
+        if chunked_upload is not None:
+            uploaded_file.close()
+            chunked_upload.delete()
+
+
+def limit_concurrent_uploads(view_func):
+    """
+    Hold one of the user's upload slots while an upload is handled, and
+    refuse the upload straight away if they are all taken. This has to wrap
+    the view before anything reads the request body, so that a refused
+    upload is not received first.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return view_func(request, *args, **kwargs)
+        try:
+            with upload_slot(request.user):
+                return view_func(request, *args, **kwargs)
+        except UploadSlotUnavailable:
+            # Too many uploads from this user are already in progress
+            response = JsonResponse({
+                'success': False,
+                'error_message': _("Too many uploads in progress, please wait."),
+            }, status=429)
+            response['Retry-After'] = str(UPLOAD_RETRY_AFTER)
+            return response
+    return wrapper
+
+
+@limit_concurrent_uploads
+@video_upload_handler('files[]')
 @vary_on_headers('X-Requested-With')
 def add(request):
     VideoForm = get_video_form(Video)
@@ -43,44 +170,13 @@ def add(request):
         if not request.is_ajax():
             return HttpResponseBadRequest("Cannot POST to this view without AJAX")
 
-        if not request.FILES:
-            return HttpResponseBadRequest("Must upload a file")
-
-        # Build a form for validation
-        form = VideoForm({
-            'title': request.FILES['files[]'].name,
-            'collection': request.POST.get('collection'),
-        }, {
-            'file': request.FILES['files[]'],
-        })
-        if form.is_valid():
-            # Save
-            video = form.save(commit=False)
-            video.uploaded_by_user = request.user
-            video.save()
-
-            # Success! Send back an edit form
-            return JsonResponse({
-                'success': True,
-                'video_id': int(video.id),
-                'form': render_to_string('wagtailvideos/multiple/edit_form.html', {
-                    'video': video,
-                    'form': get_video_edit_form(Video)(
-                        instance=video, prefix='video-%d' % video.id),
-                }, request=request),
-            })
-        else:
-            # Validation error
-            return JsonResponse({
-                'success': False,
-
-                # https://github.com/django/django/blob/stable/1.6.x/django/forms/util.py#L45
-                'error_message': '\n'.join(['\n'.join([force_text(i) for i in v]) for k, v in form.errors.items()]),
-            })
+        return add_upload(request, VideoForm)
     else:
         form = VideoForm()
 
     return render(request, 'wagtailvideos/multiple/add.html', {
+        'chunk_size': get_chunk_size(),
+        'concurrent_uploads': get_concurrent_uploads(),
         'max_filesize': form.fields['file'].max_upload_size,
         'help_text': form.fields['file'].help_text,
         'error_max_file_size': form.fields['file'].error_messages['file_too_large_unknown_size'],
@@ -89,6 +185,17 @@ def add(request):
     })
 
 
+def upload_offset(request):
+    """
+    How much of a chunked upload has been received, so that the browser can
+    resume an interrupted upload from there.
+    """
+    upload_id = request.GET.get('upload_id')
+    if not upload_id:
+        return HttpResponseBadRequest("Must give an upload_id")
+    return JsonResponse({'offset': ChunkedUpload(request.user, upload_id).offset})
+
+
 @require_POST
 def edit(request, video_id, callback=None):
     VideoForm = get_video_edit_form(Video)
@@ -103,11 +210,9 @@ def edit(request, video_id, callback=None):
     )
 
     if form.is_valid():
-        form.save()
-
-        # Reindex the image to make sure all tags are indexed
-        for backend in get_search_backends():
-            backend.add(video)
+        # Index the video once its tags are saved
+        with batch_indexing():
+            form.save()
 
         return JsonResponse({
             'success': True,
@@ -0,0 +1,182 @@
+import hashlib
+import mimetypes
+import re
+from calendar import timegm
+
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from wagtail.core.models import BaseViewRestriction
+
+from wagtailvideos.models import MediaFormats, Video
+from wagtailvideos.storage import get_cache_control
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def check_view_restrictions(restrictions, request):
+    """
+    Deny access to videos in collections with view restrictions that the
+    request does not satisfy. Password restrictions are accepted once the
+    visitor has entered the password, e.g. through the documents app.
+    """
+    login_types = [BaseViewRestriction.LOGIN, BaseViewRestriction.GROUPS]
+    for restriction in restrictions:
+        if not restriction.accept_request(request):
+            if restriction.restriction_type in login_types and not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path())
+            raise PermissionDenied
+
+
+def parse_range_header(header, size):
+    """
+    Parse a ``Range`` header into an inclusive ``(start, end)`` byte range.
+    Returns ``None`` if the header is missing or not a single byte range, in
+    which case the whole file is served. Raises ``ValueError`` if the range
+    can not be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # A suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError('Empty suffix range')
+        return (max(size - length, 0), size - 1)
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        raise ValueError('Range not satisfiable')
+    return (start, end)
+
+
+def file_iterator(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def get_offload_response(file):
+    """
+    Hand the transfer of ``file`` to the web server, as configured by
+    ``WAGTAILVIDEOS_SERVE_METHOD``. Returns ``None`` to stream it from Django.
+    """
+    method = getattr(settings, 'WAGTAILVIDEOS_SERVE_METHOD', None)
+    if method is None:
+        return None
+
+    response = HttpResponse()
+    if method == 'x-sendfile':
+        response['X-Sendfile'] = file.path
+    elif method == 'x-accel-redirect':
+        prefix = getattr(settings, 'WAGTAILVIDEOS_SERVE_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + filepath_to_uri(file.name)
+    else:
+        raise ImproperlyConfigured(
+            "WAGTAILVIDEOS_SERVE_METHOD must be 'x-sendfile', 'x-accel-redirect' or None")
+    return response
+
+
+def serve_file(request, file, public=True):
+    """
+    Serve a stored file with support for conditional and byte range
+    requests, so that browsers can seek without downloading from the start.
+    Files that are not ``public`` are never marked as cacheable by shared
+    caches.
+    """
+    storage = file.storage
+    try:
+        size = file.size
+        try:
+            modified = timegm(storage.get_modified_time(file.name).utctimetuple())
+        except NotImplementedError:
+            modified = None
+    except (IOError, OSError):
+        # The file is missing from storage
+        raise Http404
+
+    etag = '"{0}"'.format(hashlib.md5('{0}:{1}:{2}'.format(
+        file.name, size, modified).encode('utf-8')).hexdigest())
+
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is None:
+        response = get_offload_response(file)
+
+    if response is None:
+        if_range = request.META.get('HTTP_IF_RANGE')
+        byte_range = None
+        if not if_range or if_range == etag or (
+                modified is not None and parse_http_date_safe(if_range) == modified):
+            try:
+                byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */{0}'.format(size)
+                return response
+
+        if byte_range is None:
+            start, end = 0, size - 1
+            response = StreamingHttpResponse(file_iterator(storage.open(file.name, 'rb'), 0, size))
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                file_iterator(storage.open(file.name, 'rb'), start, end - start + 1), status=206)
+            response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(start, end, size)
+        response['Content-Length'] = str(end - start + 1)
+
+    response['Content-Type'] = mimetypes.guess_type(file.name)[0] or 'application/octet-stream'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified)
+    cache_control = get_cache_control(file.name)
+    if cache_control and public:
+        response['Cache-Control'] = cache_control
+    elif not public:
+        response['Cache-Control'] = 'private'
+    return response
+
+
+@require_safe
+def serve(request, video_id, media_format=None):
+    video = get_object_or_404(Video, id=video_id)
+
+    restrictions = list(video.collection.get_view_restrictions())
+    response = check_view_restrictions(restrictions, request)
+    if response is not None:
+        return response
+
+    if media_format is None:
+        file = video.file
+    else:
+        try:
+            media_format = MediaFormats[media_format]
+        except KeyError:
+            raise Http404
+        transcode = get_object_or_404(
+            video.transcodes, media_format=media_format, processing=False, error_message='')
+        file = transcode.file
+
+    if not file:
+        raise Http404
+    return serve_file(request, file, public=not restrictions)
@@ -2,18 +2,24 @@ from django.http import HttpResponseNotAllowed
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse
 from django.utils.translation import ugettext as _
+from django.views.decorators.http import require_POST
 from django.views.decorators.vary import vary_on_headers
 from wagtail.admin import messages
 from wagtail.admin.forms.search import SearchForm
-from wagtail.admin.utils import PermissionPolicyChecker, popular_tags_for_model
+from wagtail.admin.utils import PermissionPolicyChecker
 from wagtail.core.models import Collection
-from wagtail.search.backends import get_search_backends
 from wagtail.utils.pagination import paginate
 
 from wagtailvideos import ffmpeg
-from wagtailvideos.forms import VideoTranscodeAdminForm, get_video_form
-from wagtailvideos.models import Video
+from wagtailvideos.cache import get_popular_tags
+from wagtailvideos.forms import (
+    VideoBulkActionForm, VideoTranscodeAdminForm, get_video_form)
+from wagtailvideos.indexing import batch_indexing
+from wagtailvideos.models import Video, delete_field_file
+from wagtailvideos.pagination import LISTING_FIELDS, paginate_by_keyset
 from wagtailvideos.permissions import permission_policy
+from wagtailvideos.references import get_usages
+from wagtailvideos.uploads import video_upload_handler
 
 permission_checker = PermissionPolicyChecker(permission_policy)
 
@@ -45,29 +51,43 @@ def index(request):
         except (ValueError, Collection.DoesNotExist):
             pass
 
-    paginator, videos = paginate(request, videos)
+    # Search results are ordered by relevance, so can't be paged by keyset
+    if query_string:
+        paginator, videos = paginate(request, videos)
+    else:
+        videos = paginate_by_keyset(request, videos.only(*LISTING_FIELDS))
+
+    bulk_form = VideoBulkActionForm(request.user, prefix='bulk')
 
     # Create response
     if request.is_ajax():
         response = render(request, 'wagtailvideos/videos/results.html', {
-            'vidoes': videos,
+            'videos': videos,
             'query_string': query_string,
             'is_searching': bool(query_string),
+            'bulk_form': bulk_form,
         })
         return response
     else:
+        collections = Collection.objects.all()
+        if collections.count() < 2:
+            collections = None
+
         response = render(request, 'wagtailvideos/videos/index.html', {
             'videos': videos,
             'query_string': query_string,
             'is_searching': bool(query_string),
 
             'search_form': form,
-            'popular_tags': popular_tags_for_model(Video),
+            'popular_tags': get_popular_tags(Video),
             'current_collection': current_collection,
+            'collections': collections,
+            'bulk_form': bulk_form,
         })
         return response
 
 
+@video_upload_handler('file')
 @permission_checker.require('change')
 def edit(request, video_id):
     VideoForm = get_video_form(Video)
@@ -81,17 +101,15 @@ def edit(request, video_id):
                 # if providing a new video file, delete the old one and all renditions.
                 # NB Doing this via original_file.delete() clears the file field,
                 # which definitely isn't what we want...
-                original_file.storage.delete(original_file.name)
+                delete_field_file(original_file)
 
                 # Set new video file size
                 video.file_size = video.file.size
 
-            video = form.save()
-            video.save()
-
-            # Reindex the image to make sure all tags are indexed
-            for backend in get_search_backends():
-                backend.add(video)
+            # Index the video once its tags are saved
+            with batch_indexing():
+                video = form.save()
+                video.save()
 
             messages.success(request, _("Video '{0}' updated.").format(video.title), buttons=[
                 messages.button(reverse('wagtailvideos:edit', args=(video.id,)), _('Edit again'))
@@ -102,7 +120,10 @@ def edit(request, video_id):
     else:
         form = VideoForm(instance=video)
 
-    if not video._meta.get_field('file').storage.exists(video.file.name):
+    if video.file_checked_at is None:
+        video.refresh_file_info()
+
+    if video.file_missing:
         # Give error if image file doesn't exist
         messages.error(request, _(
             "The source video file could not be found. Please change the source or delete the video."
@@ -113,7 +134,7 @@ def edit(request, video_id):
     return render(request, "wagtailvideos/videos/edit.html", {
         'video': video,
         'form': form,
-        'filesize': video.get_file_size(),
+        'filesize': video.file_size,
         'can_transcode': ffmpeg.installed(),
         'transcodes': video.transcodes.all(),
         'transcode_form': VideoTranscodeAdminForm(video=video),
@@ -121,6 +142,16 @@ def edit(request, video_id):
     })
 
 
+@require_POST
+@permission_checker.require('change')
+def refresh_file_info(request, video_id):
+    video = get_object_or_404(Video, id=video_id)
+    video.refresh_file_info()
+    if not video.file_missing:
+        messages.success(request, _("File details for '{0}' refreshed.").format(video.title))
+    return redirect('wagtailvideos:edit', video.id)
+
+
 def create_transcode(request, video_id):
     if request.method != 'POST':
         return HttpResponseNotAllowed(['POST'])
@@ -146,6 +177,7 @@ def delete(request, video_id):
     })
 
 
+@video_upload_handler('file')
 @permission_checker.require('add')
 def add(request):
     VideoForm = get_video_form(Video)
@@ -159,10 +191,6 @@ def add(request):
             video.file_size = video.file.size
             video.save()
 
-            # Success! Send back an edit form
-            for backend in get_search_backends():
-                backend.add(video)
-
             messages.success(request, _("Video '{0}' added.").format(video.title), buttons=[
                 messages.button(reverse('wagtailvideos:edit', args=(video.id,)), _('Edit'))
             ])
@@ -180,9 +208,11 @@ def add(request):
 def usage(request, image_id):
     image = get_object_or_404(Video, id=image_id)
 
-    paginator, used_by = paginate(request, image.get_usage())
+    references = image.references.select_related('content_type').order_by('content_type', 'object_id')
+    paginator, used_by = paginate(request, references)
 
     return render(request, "wagtailvideos/videos/usage.html", {
         'image': image,
-        'used_by': used_by
+        'used_by': used_by,
+        'usages': get_usages(used_by),
     })
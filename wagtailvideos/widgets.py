@@ -1,3 +1,4 @@
+import copy
 import json
 
 from django.template.loader import render_to_string
@@ -15,6 +16,28 @@ class AdminVideoChooser(AdminChooser):
     def __init__(self, **kwargs):
         super(AdminVideoChooser, self).__init__(**kwargs)
         self.video_model = Video
+        self.known_videos = {}
+
+    def __deepcopy__(self, memo):
+        # Each form gets its own copy of the widget, which must not share
+        # videos remembered by another form
+        obj = super(AdminVideoChooser, self).__deepcopy__(memo)
+        obj.known_videos = copy.copy(self.known_videos)
+        return obj
+
+    def add_known_videos(self, videos):
+        """
+        Remember videos that have already been fetched, so that rendering the
+        widget for one of their IDs does not query for the video again.
+        """
+        for video in videos:
+            if video is not None:
+                self.known_videos[str(video.pk)] = video
+
+    def get_instance_and_id(self, model_class, value):
+        if value is not None and not isinstance(value, model_class) and str(value) in self.known_videos:
+            return (self.known_videos[str(value)], value)
+        return super(AdminVideoChooser, self).get_instance_and_id(model_class, value)
 
     def render_html(self, name, value, attrs):
         instance, value = self.get_instance_and_id(self.video_model, value)